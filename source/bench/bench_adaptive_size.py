@@ -0,0 +1,105 @@
+"""
+Adaptive model input size under CPU contention: fixed ai.input_size versus ai.adaptive_size.
+
+The same clip (a local video file, or a synthetic one) is tracked frame by frame, with the
+PTZ computed on the PC (LocalPTZ) and fed back to the tracker as in source/pc/main.py.
+During the middle third of the run --contention busy-loop processes compete for the CPU.
+The budget defaults to 1.2x the uncontended inference time at the fixed size, so the fixed
+size meets it before and after the contention but not during it.
+Reported per mode and phase: inference ms p50 / p95, share of frames within the budget,
+and the mean input size used.
+
+    python3 source/bench/bench_adaptive_size.py --model models/yolo26n.pt --source clip.mp4
+    python3 source/bench/bench_adaptive_size.py --frames 240 --contention 2 --sizes 1280 960 640 480
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import harness
+import mocks
+from bench_detect_every import read_frames
+
+def spin(stop):
+    while not stop.is_set():
+        pass
+
+def run(config, frames, pc, contention, fps):
+    tracker = pc.yolo_tracker.YOLOTracker(config)
+    tracker.warmup()
+    local_ptz = pc.local_ptz.LocalPTZ(config)
+    stop = multiprocessing.Event()
+    workers = []
+    third = len(frames) // 3
+    samples = []
+    for i, image in enumerate(frames):
+        if i == third:
+            workers = [multiprocessing.Process(target=spin, args=(stop,), daemon=True) for _ in range(contention)]
+            for w in workers:
+                w.start()
+        elif i == 2 * third:
+            stop.set()
+            for w in workers:
+                w.join()
+        size = tracker.sizer.size if tracker.sizer.enabled else tracker.input_size
+        start = time.perf_counter()
+        result = tracker.track(image, stamp=(i, i / fps))
+        inference_ms = (time.perf_counter() - start) * 1000
+        detections = pc.payload_codec.Detections.from_boxes(result.boxes)
+        tracker.set_roi(None, local_ptz.update(None, detections, {"seq": i, "capture_ts": time.time()}))
+        samples.append((min(i // third, 2) if third else 0, inference_ms, size))
+    return samples, tracker.sizer.changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="override ai.model_path")
+    parser.add_argument("--source", help="video file (default: synthetic clip)")
+    parser.add_argument("--frames", type=int, default=180)
+    parser.add_argument("--input-size", type=int, default=1280, help="fixed ai.input_size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1280, 960, 640, 480])
+    parser.add_argument("--budget-ms", type=float, help="default: 1.2x the uncontended fixed-size time")
+    parser.add_argument("--contention", type=int, default=os.cpu_count(), help="busy processes")
+    parser.add_argument("--fps", type=float, default=30.0)
+    args = parser.parse_args()
+
+    mocks.install()
+    pc = harness.load_side("pc", "yolo_tracker", "local_ptz", "payload_codec")
+    ai = {"input_size": args.input_size, **({"model_path": args.model} if args.model else {})}
+    config = harness.load_config({"ai": ai})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source or harness.write_video(harness.SyntheticVideo(people=3), os.path.join(tmp, "clip.mp4"), args.frames)
+        frames = read_frames(source, args.frames)
+
+    budget = args.budget_ms
+    if not budget:
+        tracker = pc.yolo_tracker.YOLOTracker(config)
+        tracker.warmup()
+        times = []
+        for i, image in enumerate(frames[:10]):
+            start = time.perf_counter()
+            tracker.track(image, stamp=(i, i / args.fps))
+            times.append((time.perf_counter() - start) * 1000)
+        budget = 1.2 * float(np.median(times))
+    adaptive = dict(ai, adaptive_size={"enabled": True, "sizes": args.sizes, "budget_ms": budget})
+
+    print(f"{len(frames)} frames, budget {budget:.1f} ms, {args.contention} busy process(es) in the middle third")
+    print(f"{'mode':<10}{'phase':<12}{'p50 ms':>8}{'p95 ms':>8}{'in budget':>11}{'mean size':>11}")
+    for mode, cfg in (("fixed", config), ("adaptive", harness.load_config({"ai": adaptive}))):
+        samples, changes = run(cfg, frames, pc, args.contention, args.fps)
+        for phase, name in enumerate(("before", "contended", "after")):
+            ms = np.array([m for p, m, _ in samples if p == phase])
+            sizes = [s for p, _, s in samples if p == phase]
+            if not len(ms):
+                continue
+            print(f"{mode:<10}{name:<12}{np.percentile(ms, 50):>8.1f}{np.percentile(ms, 95):>8.1f}"
+                  f"{np.mean(ms <= budget) * 100:>10.0f}%{np.mean(sizes):>11.0f}")
+        if mode == "adaptive":
+            print(f"adaptive: {changes} size changes")
+
+if __name__ == "__main__":
+    main()
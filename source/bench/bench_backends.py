@@ -0,0 +1,130 @@
+"""
+CPU inference backends: PyTorch versus ONNX Runtime and OpenVINO at each precision.
+
+Every backend/precision combination is loaded through source/pc/model_backends.py (exported
+and cached on first use, so the first run of a combination also reports the export time) and
+runs person detection on the same frames of a local clip (or the synthetic clip) at
+ai.input_size. Reported per combination: fps after a warm-up call, and mAP50 / mAP50-95 of
+its detections against the PyTorch FP32 detections (conf >= --ref-conf) as reference, so the
+accuracy column shows what the conversion costs rather than the model's own accuracy.
+
+    python3 source/bench/bench_backends.py --source clip.mp4 --frames 200
+    python3 source/bench/bench_backends.py --combos torch:fp32 openvino:fp16 openvino:int8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import harness
+
+COMBOS = ["torch:fp32", "onnx:fp32", "onnx:int8", "openvino:fp32", "openvino:fp16", "openvino:int8"]
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+def iou_matrix(a, b):
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = lambda r: (r[:, 2] - r[:, 0]) * (r[:, 3] - r[:, 1])
+    return inter / (area(a)[:, None] + area(b)[None, :] - inter + 1e-9)
+
+def read_frames(path, count):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, image = cap.read()
+        if not ok:
+            break
+        frames.append(image)
+    cap.release()
+    return frames
+
+def average_precision(reference, detections, threshold):
+    """COCO-style 101-point AP of detections (boxes, scores) against reference boxes per frame."""
+    total = sum(len(r) for r in reference)
+    if not total:
+        return float("nan")
+    scores, hits = [], []
+    for ref, (boxes, conf) in zip(reference, detections):
+        order = np.argsort(-conf)
+        iou = iou_matrix(boxes[order], ref)
+        taken = np.zeros(len(ref), bool)
+        for row, score in zip(iou, conf[order]):
+            row = np.where(taken, 0.0, row)
+            j = int(row.argmax()) if len(row) else -1
+            hit = j >= 0 and row[j] >= threshold
+            if hit:
+                taken[j] = True
+            scores.append(score)
+            hits.append(hit)
+    if not hits:
+        return 0.0
+    hits = np.asarray(hits)[np.argsort(-np.asarray(scores), kind="stable")]
+    tp = np.cumsum(hits)
+    recall = tp / total
+    precision = tp / np.arange(1, len(hits) + 1)
+    # Precision envelope, sampled at 101 recall points
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    idx = np.searchsorted(recall, np.linspace(0, 1, 101), side="left")
+    return float(np.mean([precision[i] if i < len(precision) else 0.0 for i in idx]))
+
+def detect(model, frames, imgsz, conf):
+    model.predict(frames[0], imgsz=imgsz, conf=conf, classes=[0], verbose=False)
+    results = []
+    start = time.perf_counter()
+    for image in frames:
+        boxes = model.predict(image, imgsz=imgsz, conf=conf, classes=[0], verbose=False)[0].boxes
+        results.append((boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy()))
+    return results, len(frames) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="local video file (default: synthetic clip)")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--model", help="override ai.model_path")
+    parser.add_argument("--input-size", type=int, help="override ai.input_size")
+    parser.add_argument("--cache-dir", help="override ai.cache_dir")
+    parser.add_argument("--combos", nargs="+", default=COMBOS, help="backend:precision pairs")
+    parser.add_argument("--ref-conf", type=float, default=0.5, help="confidence of the reference detections")
+    args = parser.parse_args()
+
+    pc = harness.load_side("pc", "model_backends")
+    overrides = {k: v for k, v in (("model_path", args.model), ("input_size", args.input_size),
+                                   ("cache_dir", args.cache_dir)) if v}
+    config = harness.load_config({"ai": overrides})
+    imgsz = config['ai']['input_size']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source
+        if not source:
+            video = harness.SyntheticVideo(*config['video']['resolution'])
+            source = harness.write_video(video, os.path.join(tmp, "clip.mp4"), args.frames)
+        frames = read_frames(source, args.frames)
+    print(f"{len(frames)} frames from {args.source or 'synthetic clip'}, input size {imgsz}, model {config['ai']['model_path']}")
+
+    reference = None
+    print(f"{'backend':<10}{'precision':<11}{'load s':>8}{'fps':>8}{'mAP50':>8}{'mAP50-95':>10}")
+    for combo in ["torch:fp32"] + [c for c in args.combos if c != "torch:fp32"]:
+        backend, _, precision = combo.partition(":")
+        combo_config = dict(config, ai=dict(config['ai'], backend=backend, precision=precision or "fp32"))
+        start = time.perf_counter()
+        model = pc.model_backends.load_model(combo_config)
+        load_s = time.perf_counter() - start
+        detections, fps = detect(model, frames, imgsz, conf=0.001)
+        if reference is None:
+            reference = [boxes[conf >= args.ref_conf] for boxes, conf in detections]
+        ap = [average_precision(reference, detections, t) for t in IOU_THRESHOLDS]
+        if combo in args.combos:
+            print(f"{backend:<10}{precision:<11}{load_s:>8.1f}{fps:>8.1f}{ap[0]:>8.3f}{np.mean(ap):>10.3f}")
+    if not sum(len(r) for r in reference):
+        print(f"(no reference detections at conf >= {args.ref_conf}: mAP is undefined, lower --ref-conf)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Adaptive bitrate against a throttled local link, with a fake encoder (no camera, no picamera2).
+
+The fake encoder emits H.264-shaped access units (SPS/PPS + IDR every keyframe interval,
+otherwise one slice) sized from the current bitrate, each stamped with its encode time.
+One viewer reads through a token bucket whose rate follows a schedule (good link, congested
+link, recovery). Fixed and adaptive bitrate run on the same schedule; per phase the frame
+latency at the viewer (p50/p95), the mean encoder bitrate and the resolution are reported.
+
+    python3 source/bench/bench_bitrate.py --phases 3.0:6 0.6:20 3.0:20
+"""
+import argparse
+import socket
+import threading
+import time
+
+import numpy as np
+
+import harness
+
+class FakeEncoderSource:
+    """Source interface of h264_source with frames sized by the configured bitrate."""
+
+    def __init__(self, config):
+        video = config['video']
+        self.fps = video.get('fps', 30)
+        self.params = {"bitrate": video.get('bitrate', 1000000), "resolution": list(video['resolution']),
+                       "keyframe_interval": video.get('keyframe_interval', 30)}
+        self.running = False
+        self.thread = None
+        self.history = []
+
+    def start(self, sink):
+        self.running = True
+        self.thread = threading.Thread(target=self.encode_loop, args=(sink,), daemon=True)
+        self.thread.start()
+
+    def reconfigure(self, params):
+        self.params = dict(params)
+
+    def frame(self, index, keyframe_index):
+        params = self.params
+        size = params["bitrate"] / 8 / self.fps
+        stamp = f"{time.time():.6f}".encode()
+        if keyframe_index == 0:
+            # IDR frames are a few times larger than P frames
+            size *= 4
+            headers = b"\x00\x00\x00\x01\x67" + b"\xaa" * 8 + b"\x00\x00\x00\x01\x68" + b"\xaa" * 4
+            return headers + b"\x00\x00\x00\x01\x65" + stamp + b"\xaa" * max(0, int(size) - len(stamp))
+        return b"\x00\x00\x00\x01\x41" + stamp + b"\xaa" * max(0, int(size) - len(stamp))
+
+    def encode_loop(self, sink):
+        period = 1.0 / self.fps
+        next_due = time.monotonic()
+        index = since_keyframe = 0
+        last_params = None
+        while self.running:
+            wait = next_due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_due += period
+            if self.params is not last_params:
+                # Encoder restart after a reconfigure starts on a keyframe
+                since_keyframe = 0
+                last_params = self.params
+            sink(self.frame(index, since_keyframe))
+            self.history.append((time.time(), self.params["bitrate"], tuple(self.params["resolution"])))
+            since_keyframe = (since_keyframe + 1) % self.params["keyframe_interval"]
+            index += 1
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+def throttled_viewer(port, schedule, latencies, stop):
+    """Read at the scheduled link rate and record the latency of every complete frame."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 32768)
+    sock.connect(("127.0.0.1", port))
+    sock.settimeout(0.2)
+    buffer = b""
+    start = time.time()
+    tokens, last = 0.0, start
+    try:
+        while not stop.is_set():
+            now = time.time()
+            rate = next((r for end, r in schedule if now - start < end), schedule[-1][1])
+            tokens = min(tokens + (now - last) * rate / 8, 16384)
+            last = now
+            if tokens < 4096:
+                time.sleep(0.005)
+                continue
+            try:
+                data = sock.recv(int(tokens))
+            except socket.timeout:
+                continue
+            if not data:
+                latencies.append((time.time() - start, None))
+                return
+            tokens -= len(data)
+            buffer += data
+            parts = buffer.split(b"\x00\x00\x00\x01")
+            buffer = b"\x00\x00\x00\x01" + parts[-1]
+            received = time.time()
+            for nal in parts[:-1]:
+                if nal and nal[0] & 0x1F in (1, 5):
+                    stamp = nal[1:].split(b"\xaa", 1)[0]
+                    latencies.append((received - start, (received - float(stamp)) * 1000))
+    finally:
+        sock.close()
+
+def run(config, schedule, rpi):
+    source = FakeEncoderSource(config)
+    stream = rpi.camera_stream.CameraStream(config, source=source)
+    stream.start()
+    stop = threading.Event()
+    latencies = []
+    viewer = threading.Thread(target=throttled_viewer, args=(stream.port, schedule, latencies, stop))
+    t0 = time.time()
+    viewer.start()
+    time.sleep(schedule[-1][0])
+    stop.set()
+    viewer.join()
+    stream.stop()
+    return latencies, [(t - t0, b, r) for t, b, r in source.history], stream.dropped_clients
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phases", nargs="+", default=["3.0:6", "0.6:20", "3.0:20"],
+                        help="link rate in Mbps and duration in s per phase")
+    parser.add_argument("--bitrate", type=int, default=2000000, help="starting (fixed) bitrate")
+    args = parser.parse_args()
+
+    schedule, end = [], 0.0
+    for phase in args.phases:
+        mbps, seconds = (float(v) for v in phase.split(":"))
+        end += seconds
+        schedule.append((end, mbps * 1e6))
+
+    rpi = harness.load_side("rpi", "camera_stream")
+    video = {"host": "127.0.0.1", "port": 0, "bitrate": args.bitrate, "send_buffer": 65536, "send_timeout": 5.0}
+    adaptive = {"interval_s": 0.5, "resolution_hold_s": 3.0, "up_after": 2}
+    print(f"{'mode':<10}{'phase':<16}{'p50 ms':>9}{'p95 ms':>9}{'frames':>8}{'Mbps':>7}  resolution")
+    for mode in ("fixed", "adaptive"):
+        base = harness.load_config()
+        config = harness.load_config({"video": dict(video, adaptive=dict(base['video'].get('adaptive', {}), enabled=mode == "adaptive", **adaptive))})
+        latencies, history, dropped = run(config, schedule, rpi)
+        start = 0.0
+        for end, rate in schedule:
+            lat = [l for t, l in latencies if start <= t < end and l is not None]
+            enc = [(b, r) for t, b, r in history if start <= t < end]
+            p50, p95 = (np.percentile(lat, 50), np.percentile(lat, 95)) if lat else (float("nan"),) * 2
+            mbps = np.mean([b for b, _ in enc]) / 1e6 if enc else float("nan")
+            resolutions = sorted({f"{r[0]}x{r[1]}" for _, r in enc})
+            label = f"{rate / 1e6:.1f} Mbps link"
+            print(f"{mode:<10}{label:<16}{p50:>9.0f}{p95:>9.0f}{len(lat):>8}{mbps:>7.2f}  {', '.join(resolutions)}")
+            start = end
+        if dropped or any(l is None for _, l in latencies):
+            print(f"{mode:<10}viewer dropped by the server")
+
+if __name__ == "__main__":
+    main()
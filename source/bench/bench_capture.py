@@ -0,0 +1,77 @@
+"""
+Frame age with a slow consumer: lock-step decoding vs the latest-frame-wins FrameGrabber.
+
+A local TCP server replays a synthetic H.264 stream at 30 fps (like the RPi CameraStream)
+while a consumer emulating YOLO inference takes --inference-ms per frame. Frame age is
+the time between the server sending a frame and the consumer starting to process it.
+
+    python3 source/bench/bench_capture.py --seconds 10 --inference-ms 60
+    python3 source/bench/bench_capture.py --source clip.mp4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import harness
+
+def lockstep(url, count, inference_ms):
+    cap = cv2.VideoCapture(url)
+    for seq in range(count):
+        ok, _ = cap.read()
+        if not ok:
+            break
+        yield seq, time.time()
+        time.sleep(inference_ms / 1000)
+    cap.release()
+
+def grabbed(frame_grabber, url, count, inference_ms):
+    grabber = frame_grabber.FrameGrabber(url)
+    grabber.start()
+    for frame in grabber:
+        yield frame["seq"], time.time()
+        time.sleep(inference_ms / 1000)
+        if frame["seq"] >= count - 1:
+            break
+    grabber.stop()
+    print(f"  grabber captured={grabber.captured} dropped={grabber.dropped}")
+
+def report(name, samples, fps, start_time):
+    ages = np.array([(t - (start_time() + seq / fps)) * 1000 for seq, t in samples])
+    if not len(ages):
+        print(f"{name:<10} no frames")
+        return
+    print(f"{name:<10} processed={len(ages):>4}  age mean={ages.mean():7.1f} ms  "
+          f"p95={np.percentile(ages, 95):7.1f} ms  last={ages[-1]:7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--inference-ms", type=float, default=60)
+    parser.add_argument("--source", help="local video file to use instead of the synthetic TCP stream")
+    args = parser.parse_args()
+
+    pc = harness.load_side("pc", "frame_grabber")
+
+    if args.source:
+        # Local file: the grabber paces it at native fps, so only the drop count is meaningful
+        samples = list(grabbed(pc.frame_grabber, args.source, 10 ** 9, args.inference_ms))
+        print(f"processed {len(samples)} frames from {args.source}")
+        return
+
+    video = harness.SyntheticVideo()
+    count = int(args.seconds * video.fps)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = harness.encode_h264(video, os.path.join(tmp, "clip.h264"), count)
+        for name, run in [("lockstep", lambda url: lockstep(url, count, args.inference_ms)),
+                          ("grabber", lambda url: grabbed(pc.frame_grabber, url, count, args.inference_ms))]:
+            server = harness.H264FileServer(path, fps=video.fps, frames=count)
+            samples = list(run(server.url))
+            report(name, samples, video.fps, lambda: server.start_time)
+            server.close()
+
+if __name__ == "__main__":
+    main()
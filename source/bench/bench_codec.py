@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the inference payload codecs.
+
+Compares the original per-box JSON path of publish_inference / json.loads with the
+vectorized JSON and packed binary codecs (source/pc/payload_codec.py) for 1, 10 and
+100 detections: encode cost (including extraction from Ultralytics Boxes), decode
+cost and bytes on the wire.
+
+    python3 source/bench/bench_codec.py --repeat 2000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+import harness
+
+def make_boxes(n, rng):
+    xy = rng.uniform(0, 1000, (n, 2))
+    wh = rng.uniform(20, 300, (n, 2))
+    data = np.hstack([xy, xy + wh, np.arange(1, n + 1)[:, None], rng.uniform(0.5, 1, (n, 1)), np.zeros((n, 1))])
+    try:
+        import torch
+        from ultralytics.engine.results import Boxes
+        return Boxes(torch.as_tensor(data, dtype=torch.float32), (720, 1280))
+    except ImportError:
+        return harness.SyntheticBoxes(data[:, :4], data[:, 5], data[:, 6], data[:, 4])
+
+def legacy_encode(boxes, payload):
+    # The original publish_inference loop
+    serializable_detections = []
+    for i in range(len(boxes)):
+        box = boxes[i]
+        detection = {
+            "box": box.xyxy[0].tolist(),
+            "conf": float(box.conf[0]),
+            "cls": int(box.cls[0]),
+        }
+        if box.id is not None:
+            detection["id"] = int(box.id[0])
+        serializable_detections.append(detection)
+    message = dict(payload, detections=serializable_detections)
+    return json.dumps(message).encode()
+
+def legacy_decode(data):
+    return json.loads(data.decode())
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    codec = harness.load_side("pc", "payload_codec").payload_codec
+    rng = np.random.default_rng(0)
+    meta = {"seq": 1234, "capture_ts": time.time(), "sent_ts": time.time()}
+
+    print(f"{'detections':>10} {'codec':>8} {'encode us':>10} {'decode us':>10} {'bytes':>7}")
+    for n in (1, 10, 100):
+        boxes = make_boxes(n, rng)
+        rows = [("legacy", lambda: legacy_encode(boxes, meta), legacy_decode)]
+        for c in (codec.JSONCodec(), codec.BinaryCodec()):
+            rows.append((c.name,
+                         lambda c=c: c.encode(dict(meta, detections=codec.Detections.from_boxes(boxes))),
+                         c.decode))
+        for name, encode, decode in rows:
+            data = encode()
+            enc_us = timeit(encode, args.repeat)
+            dec_us = timeit(lambda: decode(data), args.repeat)
+            print(f"{n:>10} {name:>8} {enc_us:>10.1f} {dec_us:>10.1f} {len(data):>7}")
+
+if __name__ == "__main__":
+    main()
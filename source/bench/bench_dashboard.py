@@ -0,0 +1,92 @@
+"""
+Dashboard composition cost: the original per-frame path of pc/main.py (result.plot(),
+np.zeros placeholder, full-panel copies for the header, np.hstack) versus the
+preallocated Dashboard compositor (source/pc/dashboard.py).
+
+Reports ms/frame, heap bytes allocated per frame (tracemalloc peak, NumPy and OpenCV
+buffers included) and the equivalent number of full 1280x720 frames.
+
+    python3 source/bench/bench_dashboard.py --frames 300
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import harness
+
+def legacy_render(result, ptz_state):
+    full_frame = result.plot()
+    H, W = full_frame.shape[:2]
+    target_ratio = 9 / 16
+    ptz_W = int(H * target_ratio)
+    ptz_view = np.zeros((H, ptz_W, 3), dtype=np.uint8)
+    cv2.putText(ptz_view, "WAITING", (ptz_W//10, H//2), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (100, 100, 100), 2)
+    x, y, w, h = ptz_state['x'], ptz_state['y'], ptz_state['w'], ptz_state['h']
+    x1, y1 = max(0, int(x)), max(0, int(y))
+    x2, y2 = min(W, int(x + w)), min(H, int(y + h))
+    cv2.rectangle(full_frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
+    label = "PTZ VIEWPORT"
+    (lw, lh), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+    cv2.rectangle(full_frame, (x1 - 1, y1 - lh - 12), (x1 + lw + 10, y1), (0, 0, 255), -1)
+    cv2.putText(full_frame, label, (x1 + 4, y1 - 7), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+    crop = result.orig_img[y1:y2, x1:x2]
+    if crop.size > 0:
+        ptz_view = cv2.resize(crop, (ptz_W, H))
+    for img, label in [(full_frame, "SYSTEM VIEW"), (ptz_view, "PTZ VIEW")]:
+        cur_H, cur_W = img.shape[:2]
+        overlay = img.copy()
+        cv2.rectangle(overlay, (0, 0), (cur_W, 40), (0, 0, 0), -1)
+        cv2.addWeighted(overlay, 0.5, img, 0.5, 0, img)
+        cv2.putText(img, label, (15, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return np.hstack((full_frame, ptz_view))
+
+def measure(name, render, inputs, frame_bytes):
+    render(*inputs[0])
+    tracemalloc.start()
+    total_alloc = 0
+    elapsed = 0.0
+    for args in inputs:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        out = render(*args)
+        elapsed += time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        total_alloc += peak - before
+        del out
+    tracemalloc.stop()
+    n = len(inputs)
+    per_frame = total_alloc / n
+    print(f"{name:<10} {elapsed / n * 1000:8.2f} ms/frame  {per_frame / 1e6:8.2f} MB/frame  "
+          f"({per_frame / frame_bytes:4.1f} full frames)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--people", type=int, default=5)
+    args = parser.parse_args()
+
+    pc = harness.load_side("pc", "dashboard", "payload_codec")
+    video = harness.SyntheticVideo(people=args.people)
+    inputs_legacy, inputs_new = [], []
+    for i in range(min(args.frames, 60)):
+        img, gt = video.frame(i)
+        result = harness.synthetic_result(img, gt)
+        x1, y1, x2, y2, _ = gt[0]
+        ptz = {"x": int(x1), "y": int(y1), "w": int((y2 - y1) * 9 / 16), "h": int(y2 - y1)}
+        inputs_legacy.append((result, ptz))
+        inputs_new.append((img, pc.payload_codec.Detections.from_boxes(result.boxes), ptz))
+    repeat = max(1, args.frames // len(inputs_legacy))
+    inputs_legacy *= repeat
+    inputs_new *= repeat
+
+    frame_bytes = video.width * video.height * 3
+    dashboard = pc.dashboard.Dashboard(video.width, video.height)
+    measure("legacy", legacy_render, inputs_legacy, frame_bytes)
+    measure("dashboard", dashboard.compose, inputs_new, frame_bytes)
+
+if __name__ == "__main__":
+    main()
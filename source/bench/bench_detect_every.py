@@ -0,0 +1,132 @@
+"""
+Detect-every-N with optical-flow propagation versus detection on every frame.
+
+The same frames (a local video file, or a synthetic clip) are tracked once with the model on
+every frame (reference) and then with detect-every-N for each N, plus the adaptive mode at a
+simulated source fps. Reported per run: fps, share of frames that ran the model, and IoU
+drift: the mean IoU between each reference box and its best match, overall and by number of
+frames since the last detection.
+
+--flow-only skips the model: the synthetic clip's ground-truth boxes are the detections,
+which isolates the drift of the flow tracker itself.
+
+    python3 source/bench/bench_detect_every.py --source clip.mp4 --frames 300 --n 2 3 5
+    python3 source/bench/bench_detect_every.py --flow-only --n 2 5 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import harness
+
+def iou_matrix(a, b):
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = lambda r: (r[:, 2] - r[:, 0]) * (r[:, 3] - r[:, 1])
+    return inter / (area(a)[:, None] + area(b)[None, :] - inter + 1e-9)
+
+def read_frames(path, count):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, image = cap.read()
+        if not ok:
+            break
+        frames.append(image)
+    cap.release()
+    return frames
+
+def drift(reference, boxes, ages):
+    """Mean best-match IoU of the reference boxes, overall and per frames-since-detection."""
+    by_age = {}
+    for ref, test, age in zip(reference, boxes, ages):
+        if not len(ref):
+            continue
+        best = iou_matrix(ref, test).max(axis=1) if len(test) else np.zeros(len(ref))
+        by_age.setdefault(age, []).extend(best.tolist())
+    overall = [v for values in by_age.values() for v in values]
+    return (np.mean(overall) if overall else float("nan")), {a: np.mean(v) for a, v in sorted(by_age.items())}
+
+def run_tracker(config, frames, pc, fps):
+    tracker = pc.yolo_tracker.YOLOTracker(config)
+    # Warm-up outside the timed loop, then start from clean tracker state
+    tracker.track(frames[0])
+    tracker.trackers.clear()
+    tracker.schedules.clear()
+    boxes, ages = [], []
+    detections = 0
+    start = time.perf_counter()
+    for i, image in enumerate(frames):
+        result = tracker.track(image, stamp=(i, i / fps))
+        detected = tracker.last_detected[None]
+        detections += detected
+        boxes.append(result.boxes.xyxy.cpu().numpy())
+        ages.append(tracker.schedules[None]["since_detect"])
+    return boxes, ages, len(frames) / (time.perf_counter() - start), detections
+
+def run_flow_only(frames, gt, n, pc):
+    flow = pc.flow_tracker.FlowPropagator()
+    boxes, ages = [], []
+    start = time.perf_counter()
+    for i, image in enumerate(frames):
+        if i % n == 0:
+            flow.reset(image, gt[i])
+            boxes.append(gt[i])
+        else:
+            boxes.append(flow.propagate(image)[0])
+        ages.append(i % n)
+    return boxes, ages, len(frames) / (time.perf_counter() - start), (len(frames) + n - 1) // n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="local video file (default: synthetic clip)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--model", help="override ai.model_path")
+    parser.add_argument("--n", type=int, nargs="+", default=[2, 3, 5])
+    parser.add_argument("--fps", type=float, default=30, help="simulated source fps for the adaptive run")
+    parser.add_argument("--max-interval", type=int, default=5, help="upper bound of N in the adaptive run")
+    parser.add_argument("--flow-only", action="store_true", help="ground-truth detections, no model")
+    args = parser.parse_args()
+
+    pc = harness.load_side("pc", "yolo_tracker", "flow_tracker")
+    video = harness.SyntheticVideo()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source or harness.write_video(video, os.path.join(tmp, "clip.mp4"), args.frames)
+        frames = read_frames(source, args.frames)
+
+    print(f"{'mode':<12}{'fps':>8}{'detected':>10}{'mean IoU':>10}  IoU by frames since detection")
+    if args.flow_only:
+        gt = [video.boxes(i)[:, :4] for i in range(len(frames))]
+        for n in args.n:
+            boxes, ages, fps, detections = run_flow_only(frames, gt, n, pc)
+            mean, by_age = drift(gt, boxes, ages)
+            print(f"{'N=' + str(n):<12}{fps:>8.1f}{detections / len(frames):>10.0%}{mean:>10.3f}  "
+                  + " ".join(f"{a}:{v:.2f}" for a, v in by_age.items()))
+        return
+
+    overrides = {"ai": {"detect_every": {"enabled": False}}}
+    if args.model:
+        overrides["ai"]["model_path"] = args.model
+    config = harness.load_config(overrides)
+
+    reference, ages, fps, detections = run_tracker(config, frames, pc, args.fps)
+    print(f"{'every frame':<12}{fps:>8.1f}{detections / len(frames):>10.0%}{1.0:>10.3f}")
+    runs = [(f"N={n}", n, n) for n in args.n] + [("adaptive", 1, args.max_interval)]
+    for label, low, high in runs:
+        config['ai'] = dict(config['ai'], detect_every={"enabled": True, "min_interval": low, "max_interval": high})
+        boxes, ages, fps, detections = run_tracker(config, frames, pc, args.fps)
+        mean, by_age = drift(reference, boxes, ages)
+        print(f"{label:<12}{fps:>8.1f}{detections / len(frames):>10.0%}{mean:>10.3f}  "
+              + " ".join(f"{a}:{v:.2f}" for a, v in by_age.items()))
+
+if __name__ == "__main__":
+    main()
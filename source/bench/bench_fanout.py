@@ -0,0 +1,112 @@
+"""
+RPi CameraStream fan-out with a file-backed H.264 source (no picamera2 needed).
+
+One encode is broadcast to several local viewers:
+  * steady:  connects first and decodes everything
+  * late:    joins mid-stream; must decode from its first frame (cached SPS/PPS + keyframe)
+  * slow:    connects and never reads; must be dropped without stalling anyone else
+  * reconnect: disconnects halfway and comes back
+Reported: frames decoded, decode errors, time to first frame and whether the server closed
+the connection per viewer (a viewer that never reads can't see it), the longest time the
+encoder-side write() took, and the number of viewers the server dropped.
+
+    python3 source/bench/bench_fanout.py --seconds 8
+"""
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import av
+
+import harness
+
+def viewer(port, stats, stop, duration=None, rcvbuf=None, read=True):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    connected = time.time()
+    sock.connect(("127.0.0.1", port))
+    sock.settimeout(0.5)
+    codec = av.CodecContext.create("h264", "r")
+    deadline = connected + duration if duration else None
+    try:
+        while not stop.is_set() and (deadline is None or time.time() < deadline):
+            if not read:
+                time.sleep(0.1)
+                continue
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                continue
+            if not data:
+                stats["closed"] = True
+                break
+            try:
+                for packet in codec.parse(data):
+                    for _ in codec.decode(packet):
+                        stats.setdefault("first_frame_ms", (time.time() - connected) * 1000)
+                        stats["frames"] = stats.get("frames", 0) + 1
+            except av.error.FFmpegError:
+                stats["errors"] = stats.get("errors", 0) + 1
+    finally:
+        sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=8.0)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--gop", type=int, default=30)
+    args = parser.parse_args()
+
+    rpi = harness.load_side("rpi", "camera_stream", "h264_source")
+    tmp = tempfile.TemporaryDirectory()
+    path = harness.encode_h264(harness.SyntheticVideo(fps=args.fps), os.path.join(tmp.name, "clip.h264"),
+                               args.fps * 4, gop=args.gop)
+    config = harness.load_config({"video": {"host": "127.0.0.1", "port": 0, "source_file": path, "fps": args.fps}})
+
+    stream = rpi.camera_stream.CameraStream(config)
+    # Time every encoder-side write to show it never waits on a viewer
+    write = stream.fanout.write
+    write_times = []
+    def timed_write(data):
+        t0 = time.perf_counter()
+        write(data)
+        write_times.append(time.perf_counter() - t0)
+    stream.source.start = (lambda start: lambda sink: start(timed_write))(stream.source.start)
+    stream.start()
+
+    stop = threading.Event()
+    stats = {name: {} for name in ("steady", "late", "slow", "reconnect#1", "reconnect#2")}
+    half = args.seconds / 2
+    plan = [
+        (0.0, "steady", {}),
+        (0.0, "slow", {"rcvbuf": 4096, "read": False}),
+        (0.2, "reconnect#1", {"duration": half - 0.2}),
+        (half + 0.5, "reconnect#2", {}),
+        (args.seconds * 0.4, "late", {}),
+    ]
+    threads = []
+    for delay, name, kwargs in plan:
+        t = threading.Timer(delay, viewer, args=(stream.port, stats[name], stop), kwargs=kwargs)
+        t.start()
+        threads.append(t)
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    stream.stop()
+    tmp.cleanup()
+
+    print(f"{'viewer':<14}{'frames':>8}{'errors':>8}{'first frame ms':>16}{'closed':>8}")
+    for name, s in stats.items():
+        first = s.get("first_frame_ms")
+        print(f"{name:<14}{s.get('frames', 0):>8}{s.get('errors', 0):>8}"
+              f"{(f'{first:.0f}' if first is not None else '-'):>16}{('yes' if s.get('closed') else 'no'):>8}")
+    print(f"encoded frames: {stream.fanout.written}, max write(): {max(write_times) * 1000:.2f} ms, "
+          f"dropped viewers: {stream.dropped_clients}")
+
+if __name__ == "__main__":
+    main()
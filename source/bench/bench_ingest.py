@@ -0,0 +1,149 @@
+"""
+Stream ingest on the PC: OpenCV VideoCapture versus the PyAV low-latency grabber.
+
+A recorded H.264 clip is served through the RPi CameraStream (file source, real fan-out
+server) on a local port. Every frame carries its index as a barcode, so each decoded frame
+is matched to the moment the server sent it. Reported per ingest path:
+  * time to first frame: grabber start until the first decoded frame is readable, and the
+    part of it spent in ingest (the rest is the server waiting for a keyframe to start on)
+  * glass-to-tensor: server send until the frame is available as a NumPy array (p50/p95)
+  * reconnect: the server is restarted halfway; time from restart to the next frame
+    (the OpenCV path does not reconnect and ends with the first server)
+
+    python3 source/bench/bench_ingest.py --seconds 10
+    python3 source/bench/bench_ingest.py --clip recordings/session1/stream.h264
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import harness
+
+BITS = 16
+BLOCK = 32
+
+class StampedVideo:
+    """Synthetic video with the frame index drawn as a row of black/white blocks."""
+
+    def __init__(self, video):
+        self.video = video
+        self.width, self.height, self.fps = video.width, video.height, video.fps
+
+    def frame(self, i):
+        img, boxes = self.video.frame(i)
+        for b in range(BITS):
+            img[:BLOCK, b * BLOCK:(b + 1) * BLOCK] = 255 if (i >> b) & 1 else 0
+        return img, boxes
+
+def read_stamp(image):
+    centers = image[BLOCK // 2, BLOCK // 2::BLOCK][:BITS].mean(axis=1)
+    return int(sum(1 << b for b, v in enumerate(centers) if v > 127))
+
+class Server:
+    """CameraStream on a fixed port that records when each frame was handed to the viewers."""
+
+    def __init__(self, rpi, config):
+        self.rpi = rpi
+        self.config = config
+        self.port = config['video']['port']
+        self.camera = None
+        self.sent = []
+
+    def start(self):
+        config = dict(self.config, video=dict(self.config['video'], port=self.port))
+        camera = self.rpi.camera_stream.CameraStream(config)
+        camera.source.loop = False
+        sent = []
+        write = camera.fanout.write
+
+        def timed_write(unit):
+            sent.append(time.time())
+            write(unit)
+
+        camera.fanout.write = timed_write
+        camera.start()
+        self.camera, self.sent, self.port = camera, sent, camera.port
+
+    def stop(self):
+        self.camera.stop()
+
+def run(ingest, args, clip, pc, rpi):
+    config = harness.load_config({"video": {"host": "127.0.0.1", "port": 0, "source_file": clip,
+                                            "fps": args.fps, "ingest": ingest, "reconnect_s": 0.2}})
+    server = Server(rpi, config)
+    server.start()
+    grabber = pc.stream_ingest.make_grabber(config, f"tcp://127.0.0.1:{server.port}", realtime=False)
+    started = time.time()
+    grabber.start()
+
+    latencies, first, restart, after_restart = [], None, None, None
+    sent = server.sent
+    last_stamp = -1
+
+    def restart_server():
+        nonlocal restart, sent
+        time.sleep(args.seconds / 2)
+        server.stop()
+        server.start()
+        restart, sent = time.time(), server.sent
+
+    restarter = threading.Thread(target=restart_server, daemon=True)
+    restarter.start()
+    end = started + args.seconds + 2
+    while time.time() < end:
+        frame = grabber.read(timeout=0.5)
+        if frame is None:
+            if grabber.finished:
+                break
+            continue
+        now = time.time()
+        stamp = read_stamp(frame["image"])
+        if first is None:
+            first = now
+            first_ingest = now - sent[stamp] if stamp < len(sent) else float("nan")
+        if restart and after_restart is None and stamp < last_stamp:
+            # The restarted server plays the clip from the start again
+            after_restart = now - restart
+        last_stamp = stamp
+        if stamp < len(sent):
+            latencies.append((now - sent[stamp]) * 1000)
+    grabber.stop()
+    restarter.join()
+    server.stop()
+    return {
+        "ttff": (first - started) * 1000 if first else float("nan"),
+        "ttff_ingest": first_ingest * 1000 if first else float("nan"),
+        "p50": np.percentile(latencies, 50) if latencies else float("nan"),
+        "p95": np.percentile(latencies, 95) if latencies else float("nan"),
+        "frames": len(latencies),
+        "reconnect": after_restart * 1000 if after_restart is not None else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--clip", help="raw H.264 file to serve (default: synthetic stamped clip)")
+    args = parser.parse_args()
+
+    pc = harness.load_side("pc", "stream_ingest")
+    rpi = harness.load_side("rpi", "camera_stream")
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = args.clip
+        if not clip:
+            video = StampedVideo(harness.SyntheticVideo(fps=args.fps))
+            clip = harness.encode_h264(video, os.path.join(tmp, "clip.h264"), int(args.seconds * args.fps))
+        print(f"{'ingest':<8}{'first frame ms':>16}{'(ingest)':>10}{'g2t p50 ms':>12}{'p95 ms':>9}{'frames':>8}{'reconnect ms':>14}")
+        for ingest in ("opencv", "pyav"):
+            r = run(ingest, args, clip, pc, rpi)
+            reconnect = f"{r['reconnect']:.0f}" if r["reconnect"] is not None else "none"
+            print(f"{ingest:<8}{r['ttff']:>16.0f}{r['ttff_ingest']:>10.0f}{r['p50']:>12.1f}{r['p95']:>9.1f}{r['frames']:>8}{reconnect:>14}")
+        if args.clip:
+            print("(glass-to-tensor needs the stamped synthetic clip; with --clip only the timings are meaningful)")
+
+if __name__ == "__main__":
+    main()
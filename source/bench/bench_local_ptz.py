@@ -0,0 +1,106 @@
+"""
+Remote versus local PTZ mode on one machine.
+
+Remote: PC -> broker -> RPi VirtualPTZ -> broker -> PC before the crop can be drawn.
+Local:  the PC runs VirtualPTZ on every result and mirrors detections and PTZ state to MQTT;
+        the RPi only draws the radar and forwards joystick input as control messages.
+Both run the PC loop (source/pc/main.py run, headless) and the RPi inference worker through
+the in-process broker stand-in with a one-way network delay. Reported per mode: viewport
+latency (capture until the frame's PTZ state reaches the dashboard), end-to-end latency,
+MQTT traffic and Sense HAT radar writes. A joystick 'right' press on the RPi checks that
+target selection still reaches the PC in local mode.
+
+    python3 source/bench/bench_local_ptz.py --frames 300 --inference-ms 30 --network-ms 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+import harness
+import mocks
+
+def run(mode, args, pc, rpi):
+    local = mode == "local"
+    config = harness.load_config({"latency": {"report_interval": 0}})
+    config['ptz'] = dict(config['ptz'], local=local)
+    broker = harness.LocalBroker(delay=args.network_ms / 1000)
+
+    # RPi side, as in source/rpi/main.py
+    rpi_mqtt = rpi.mqtt_client.MQTTClient(config, client=broker.client())
+    ptz = rpi.virtual_ptz.VirtualPTZ(config)
+    sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+    if local:
+        handler = lambda payload, received_ts: rpi.main.display_inference(payload, sense_hat)
+    else:
+        handler = lambda payload, received_ts: rpi.main.process_inference(payload, ptz, sense_hat, rpi_mqtt, received_ts)
+    worker = rpi.inference_worker.InferenceWorker(handler, on_idle=sense_hat.refresh)
+    rpi_mqtt.set_callback(lambda topic, payload: worker.submit(payload))
+    worker.start()
+    rpi_mqtt.start()
+
+    # PC side: record when each frame's PTZ state reaches the dashboard
+    viewport_ms = []
+    set_ptz = pc.dashboard.DashboardRenderer.set_ptz
+
+    def timed_set_ptz(renderer, state):
+        if state.get('capture_ts'):
+            viewport_ms.append((time.time() - state['capture_ts']) * 1000)
+        set_ptz(renderer, state)
+
+    pc.dashboard.DashboardRenderer.set_ptz = timed_set_ptz
+    pc_mqtt = pc.mqtt_client.MQTTClient(config, client=broker.client())
+    pc_mqtt.start()
+    latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0)
+    local_ptz = pc.local_ptz.LocalPTZ(config) if local else None
+    video = harness.SyntheticVideo(*config['video']['resolution'])
+    frames = harness.synthetic_frames(video, args.frames, inference_ms=args.inference_ms)
+    try:
+        pc.main.run(config, frames, {None: pc_mqtt}, latency, display=False, local_ptz=local_ptz)
+        broker.drain()
+
+        switched = None
+        if local:
+            # Joystick on the RPi -> control message -> PC-side PTZ picks the next target
+            before = local_ptz.get(None).target_id
+            rpi_mqtt.publish_control(mocks.MockJoystickEvent("right"))
+            broker.drain()
+            switched = local_ptz.get(None).target_id != before
+    finally:
+        pc.dashboard.DashboardRenderer.set_ptz = set_ptz
+        pc_mqtt.stop()
+        worker.stop()
+        rpi_mqtt.stop()
+
+    e2e = latency.summary()["end_to_end"]
+    return {
+        "viewport_p50": np.percentile(viewport_ms, 50),
+        "viewport_p95": np.percentile(viewport_ms, 95),
+        "e2e_p50": e2e["p50"],
+        "messages": broker.published,
+        "radar_writes": sense_hat.sense.writes,
+        "switched": switched,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--inference-ms", type=float, default=30.0)
+    parser.add_argument("--network-ms", type=float, default=10.0, help="one-way broker delay")
+    args = parser.parse_args()
+
+    mocks.install()
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics", "dashboard", "local_ptz")
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface", "inference_worker")
+
+    print(f"{args.frames} frames, inference {args.inference_ms:.0f} ms, network {args.network_ms:.0f} ms one way")
+    print(f"{'mode':<8}{'viewport p50':>14}{'p95':>8}{'e2e p50':>10}{'messages':>10}{'radar writes':>14}")
+    for mode in ("remote", "local"):
+        r = run(mode, args, pc, rpi)
+        print(f"{mode:<8}{r['viewport_p50']:>14.1f}{r['viewport_p95']:>8.1f}{r['e2e_p50']:>10.1f}"
+              f"{r['messages']:>10}{r['radar_writes']:>14}")
+        if r["switched"] is not None:
+            print(f"{'':<8}joystick control message {'switched' if r['switched'] else 'did NOT switch'} the PC-side target")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+RPi inference handling under a message flood: directly on the MQTT network thread (the old
+path) versus the coalescing mailbox + worker thread, with and without the PTZ dead-band.
+
+A flood generator publishes inference messages (synthetic tracked boxes) through the
+in-process broker faster than the RPi handles them; the mocked Sense HAT takes --write-ms
+per framebuffer write to stand in for a slow display. Reported per mode: messages handled
+and coalesced, staleness of the handled messages (time since the PC sent them), PTZ
+publishes and how long the last message took to be acted on after it was published.
+
+    python3 source/bench/bench_mailbox.py --rate 200 --seconds 5 --write-ms 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+import harness
+import mocks
+
+class SlowSenseHat(mocks.MockSenseHat):
+    write_s = 0.05
+
+    def set_pixels(self, pixel_list):
+        time.sleep(self.write_s)
+        super().set_pixels(pixel_list)
+
+def flood(feeder, topics, codec, video, rate, seconds):
+    """
+    Publish one inference message per synthetic frame at rate msg/s; returns the last seq
+    and the time it was published.
+    """
+    start = time.time()
+    seq = 0
+    sent = start
+    while time.time() - start < seconds:
+        rows = video.boxes(seq)
+        detections = codec.Detections(rows[:, :4], np.full(len(rows), 0.9), np.zeros(len(rows)), rows[:, 4])
+        sent = time.time()
+        feeder.publish(topics["inference"], codec.JSONCodec().encode(
+            {"seq": seq, "capture_ts": sent, "sent_ts": sent, "detections": detections}))
+        seq += 1
+        wait = start + seq / rate - time.time()
+        if wait > 0:
+            time.sleep(wait)
+    return seq - 1, sent
+
+def run(mode, config, rpi, rate, seconds, people):
+    broker = harness.LocalBroker()
+    ptz = rpi.virtual_ptz.VirtualPTZ(config)
+    sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+    rpi_mqtt = rpi.mqtt_client.MQTTClient(config, client=broker.client())
+    dead_band = rpi.inference_worker.PTZDeadBand(config) if mode == "mailbox+deadband" else None
+    handled = []
+
+    def handle(payload, received_ts=None):
+        rpi.main.process_inference(payload, ptz, sense_hat, rpi_mqtt, received_ts, dead_band)
+        handled.append((payload["seq"], time.time(), time.time() - payload["sent_ts"]))
+
+    worker = None
+    if mode == "direct":
+        rpi_mqtt.set_callback(lambda topic, payload: handle(payload))
+    else:
+        worker = rpi.inference_worker.InferenceWorker(handle, on_idle=sense_hat.refresh)
+        worker.start()
+        rpi_mqtt.set_callback(lambda topic, payload: worker.submit(payload))
+
+    ptz_out = broker.client()
+    ptz_out.subscribe(rpi_mqtt.topics["ptz"])
+    ptz_out.connect("localhost", 1883)
+    published = []
+    ptz_out.on_message = lambda client, userdata, msg: published.append(msg)
+    rpi_mqtt.start()
+    feeder = broker.client()
+    last_seq, last_sent = flood(feeder, rpi_mqtt.topics, rpi.payload_codec, harness.SyntheticVideo(people=people),
+                                rate, seconds)
+
+    # Wait until the newest message has been acted on
+    deadline = time.time() + 60
+    while time.time() < deadline and not any(seq == last_seq for seq, _, _ in handled):
+        time.sleep(0.005)
+    caught_up = next((t for seq, t, _ in handled if seq == last_seq), float("nan")) - last_sent
+    if worker:
+        worker.stop()
+    rpi_mqtt.stop()
+    staleness = [s * 1000 for _, _, s in handled]
+    return {
+        "sent": last_seq + 1,
+        "handled": len(handled),
+        "coalesced": worker.dropped if worker else 0,
+        "p50": np.percentile(staleness, 50),
+        "p95": np.percentile(staleness, 95),
+        "ptz": len(published),
+        "caught_up": caught_up * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=200, help="inference messages per second")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ms", type=float, default=50, help="time per Sense HAT framebuffer write")
+    parser.add_argument("--people", type=int, default=8)
+    parser.add_argument("--dead-band", type=float, default=2, help="ptz.dead_band_px")
+    args = parser.parse_args()
+
+    mocks.install()
+    SlowSenseHat.write_s = args.write_ms / 1000
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface",
+                            "payload_codec", "inference_worker")
+    rpi.sense_hat_interface.SenseHat = SlowSenseHat
+    base = harness.load_config()
+    config = harness.load_config({"ptz": dict(base["ptz"], dead_band_px=args.dead_band),
+                                  "sense_hat": {"max_fps": 1000}})
+
+    print(f"{args.rate:.0f} msg/s for {args.seconds:.0f} s, Sense HAT write {args.write_ms:.0f} ms")
+    print(f"{'mode':<18}{'sent':>6}{'handled':>9}{'coalesced':>11}{'p50 ms':>9}{'p95 ms':>9}{'ptz out':>9}{'catch-up ms':>13}")
+    for mode in ("direct", "mailbox", "mailbox+deadband"):
+        r = run(mode, config, rpi, args.rate, args.seconds, args.people)
+        print(f"{mode:<18}{r['sent']:>6}{r['handled']:>9}{r['coalesced']:>11}{r['p50']:>9.0f}{r['p95']:>9.0f}"
+              f"{r['ptz']:>9}{r['caught_up']:>13.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Metrics instrumentation: per-call overhead and a scrape of both endpoints.
+
+Measures the cost of a histogram observation and of the timed() decorator, then runs the
+PC loop and the RPi inference worker on one machine (synthetic frames, in-process broker,
+RPi stream server on a synthetic clip with one viewer), with a metrics endpoint per side on
+a free port and the MQTT stats snapshot every second. Prints the per-stage metrics scraped
+from each endpoint and the stats messages seen on the broker.
+
+    python3 source/bench/bench_metrics.py --frames 150
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.request
+
+import harness
+import mocks
+
+def overhead(metrics, calls=200000):
+    histogram = metrics.Histogram("bench")
+    start = time.perf_counter()
+    for i in range(calls):
+        histogram.observe(i % 300)
+    observe_us = (time.perf_counter() - start) / calls * 1e6
+
+    plain = lambda x: x
+    wrapped = metrics.timed("bench_call_ms")(plain)
+    start = time.perf_counter()
+    for i in range(calls):
+        plain(i)
+    base = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(calls):
+        wrapped(i)
+    timed_us = (time.perf_counter() - start - base) / calls * 1e6
+    return observe_us, timed_us
+
+def scrape(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2) as r:
+        return r.read().decode()
+
+def summarize(text, names):
+    """Count and mean of the histograms and the value of the counters/gauges in names."""
+    values = {}
+    for line in text.splitlines():
+        if line.startswith("#") or not line:
+            continue
+        key, value = line.rsplit(" ", 1)
+        values[key] = float(value)
+    rows = []
+    for name in names:
+        base, _, labels = name.partition("{")
+        counts = {k: v for k, v in values.items()
+                  if k.startswith(base + "_count") and (not labels or "{" + labels in k)}
+        for key, count in counts.items():
+            mean = values[key.replace("_count", "_sum", 1)] / count if count else 0.0
+            label = base + key[len(base) + len("_count"):]
+            rows.append(f"  {label:<60}count={count:<8.0f}mean={mean:.3f} ms")
+        if not counts:
+            for key, value in values.items():
+                if key == name or key.startswith(name + "{"):
+                    rows.append(f"  {key:<60}{value:.6g}")
+    return "\n".join(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=150)
+    args = parser.parse_args()
+
+    mocks.install()
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics")
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface",
+                            "inference_worker", "camera_stream", "metrics")
+
+    observe_us, timed_us = overhead(pc.metrics)
+    print(f"overhead: histogram observe {observe_us:.2f} us, timed() wrapper {timed_us:.2f} us per call")
+
+    video = harness.SyntheticVideo()
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = harness.encode_h264(video, os.path.join(tmp, "clip.h264"), 60)
+        config = harness.load_config({"video": {"host": "127.0.0.1", "port": 0, "source_file": clip},
+                                      "latency": {"report_interval": 0},
+                                      "metrics": {"enabled": True, "host": "127.0.0.1", "port": 0, "stats_interval_s": 1.0}})
+        broker = harness.LocalBroker(delay=0.002)
+
+        # RPi side
+        rpi_mqtt = rpi.mqtt_client.MQTTClient(config, client=broker.client())
+        ptz = rpi.virtual_ptz.VirtualPTZ(config)
+        sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+        worker = rpi.inference_worker.InferenceWorker(
+            lambda payload, received_ts: rpi.main.process_inference(payload, ptz, sense_hat, rpi_mqtt, received_ts),
+            on_idle=sense_hat.refresh)
+        rpi_mqtt.set_callback(lambda topic, payload: worker.submit(payload))
+        camera = rpi.camera_stream.CameraStream(config)
+        rpi_exporter = rpi.metrics.MetricsExporter(config, rpi_mqtt.publish_stats)
+
+        # PC side
+        pc_mqtt = pc.mqtt_client.MQTTClient(config, client=broker.client())
+        latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0, metrics=pc.metrics.registry)
+        pc_exporter = pc.metrics.MetricsExporter(config, pc_mqtt.publish_stats)
+
+        stats_messages = []
+        observer = broker.client()
+        observer.on_message = lambda client, userdata, msg: stats_messages.append(msg.topic)
+        observer.connect("localhost")
+        observer.subscribe(f"{config['mqtt']['topics']['stats']}/#")
+
+        camera.start()
+        viewer = socket.create_connection(("127.0.0.1", camera.port))
+        stop = threading.Event()
+
+        def read_stream():
+            while not stop.is_set() and viewer.recv(65536):
+                pass
+        threading.Thread(target=read_stream, daemon=True).start()
+
+        worker.start()
+        rpi_mqtt.start()
+        pc_mqtt.start()
+        rpi_exporter.start()
+        pc_exporter.start()
+        pc.main.run(config, harness.synthetic_frames(video, args.frames), {None: pc_mqtt}, latency, display=False)
+        broker.drain()
+        time.sleep(1.2)
+
+        pc_text, rpi_text = scrape(pc_exporter.port), scrape(rpi_exporter.port)
+        stop.set()
+        pc_exporter.stop()
+        rpi_exporter.stop()
+        worker.stop()
+        pc_mqtt.stop()
+        rpi_mqtt.stop()
+        viewer.close()
+        camera.stop()
+
+    print(f"PC endpoint ({len(pc_text.splitlines())} lines):")
+    print(summarize(pc_text, ["serialize_ms", "render_ms", 'hop_latency_ms{hop="end_to_end"}', "fps", "mqtt_bytes_out_total"]))
+    print(f"RPi endpoint ({len(rpi_text.splitlines())} lines):")
+    print(summarize(rpi_text, ["ptz_update_ms", "sense_hat_update_ms", "inference_handler_ms", "inference_messages_total",
+                               "sense_hat_writes_total", "stream_frames_total", "stream_bytes_sent_total", "stream_viewers"]))
+    print(f"stats messages: {json.dumps({t: stats_messages.count(t) for t in sorted(set(stats_messages))})}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Headless dashboard over MJPEG: shared pooled encoding with fast and slow HTTP viewers.
+
+Runs the PC loop (source/pc/main.py run, no window) on synthetic frames with the MJPEG server
+on a free local port, and connects --viewers clients to the dashboard view, --slow-viewers
+clients reading at --slow-kbps through a small receive buffer, and one client to the PTZ view. Reported:
+frames encoded against frames rendered (each frame is encoded once whatever the number of
+viewers), mean encode time, and per viewer the frames received, their rate and their age
+(offered to the server until fully received). A slow viewer gets fewer but still fresh
+frames and does not slow the others down.
+
+    python3 source/bench/bench_mjpeg.py --frames 300 --viewers 4 --slow-viewers 1 --fps 10
+"""
+import argparse
+import socket
+import threading
+import time
+
+import numpy as np
+
+import harness
+import mocks
+
+def view(port, path, stop, kbps, stats):
+    """
+    Read an MJPEG stream part by part, recording each frame's age. With kbps the viewer
+    reads at that rate through a small receive buffer, like a client on a slow link.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if kbps:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 32768)
+    try:
+        sock.connect(("127.0.0.1", port))
+        sock.settimeout(5)
+        sock.sendall(f"GET {path} HTTP/1.0\r\n\r\n".encode())
+        stream = sock.makefile("rb")
+        while stream.readline().strip():
+            pass
+        while not stop.is_set():
+            headers = {}
+            line = stream.readline()
+            while line and line.strip() != b"":
+                key, _, value = line.decode().partition(":")
+                headers[key.strip().lower()] = value.strip()
+                line = stream.readline()
+            if not line:
+                return
+            if "content-length" not in headers:
+                continue
+            remaining = int(headers["content-length"])
+            while remaining:
+                chunk = stream.read(min(remaining, 16384))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                if kbps:
+                    time.sleep(len(chunk) * 8 / (kbps * 1000))
+            stats["ages"].append((time.time() - float(headers["x-timestamp"])) * 1000)
+            stats["times"].append(time.time())
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--inference-ms", type=float, default=20.0)
+    parser.add_argument("--viewers", type=int, default=4)
+    parser.add_argument("--slow-viewers", type=int, default=1)
+    parser.add_argument("--slow-kbps", type=float, default=2000.0)
+    parser.add_argument("--fps", type=float, default=10, help="mjpeg.fps")
+    parser.add_argument("--quality", type=int, default=70, help="mjpeg.quality")
+    parser.add_argument("--scale", type=float, default=1.0, help="mjpeg.scale")
+    args = parser.parse_args()
+
+    mocks.install()
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics", "mjpeg_server", "local_ptz")
+    config = harness.load_config({"latency": {"report_interval": 0}, "ptz": {"local": True},
+                                  "mjpeg": {"enabled": True, "host": "127.0.0.1", "port": 0, "fps": args.fps,
+                                            "quality": args.quality, "scale": args.scale}})
+    broker = harness.LocalBroker()
+    mqtt = pc.mqtt_client.MQTTClient(config, client=broker.client())
+    mqtt.start()
+    latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0)
+    mjpeg = pc.mjpeg_server.MJPEGServer(config)
+    mjpeg.start()
+    # Views exist once a renderer registers them; register up front so the viewers can connect first
+    mjpeg.feed("dashboard")
+    mjpeg.feed("ptz")
+
+    stop = threading.Event()
+    viewers = [("dashboard", 0)] * args.viewers + [("dashboard", args.slow_kbps)] * args.slow_viewers + [("ptz", 0)]
+    stats = [{"ages": [], "times": []} for _ in viewers]
+    threads = [threading.Thread(target=view, args=(mjpeg.port, f"/{name}.mjpg", stop, kbps, s), daemon=True)
+               for (name, kbps), s in zip(viewers, stats)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+
+    video = harness.SyntheticVideo(*config['video']['resolution'])
+    local_ptz = pc.local_ptz.LocalPTZ(config)
+    start = time.time()
+    result = pc.main.run(config, harness.synthetic_frames(video, args.frames, inference_ms=args.inference_ms),
+                         {None: mqtt}, latency, display=False, local_ptz=local_ptz, mjpeg=mjpeg)
+    elapsed = time.time() - start
+    time.sleep(0.3)
+    stop.set()
+    mjpeg.stop()
+    mqtt.stop()
+
+    encoded = pc.metrics.registry.counter("mjpeg_frames_encoded_total").value
+    encode_ms = pc.metrics.registry.histogram("mjpeg_encode_ms")
+    print(f"{result['rendered']} frames rendered in {elapsed:.1f} s ({result['rendered'] / elapsed:.1f} fps), "
+          f"{encoded:.0f} JPEGs encoded for {len(viewers)} viewers of 2 views at mjpeg.fps {args.fps:g}, "
+          f"mean encode {encode_ms.mean():.1f} ms")
+    print(f"{'viewer':<24}{'frames':>8}{'fps':>7}{'age p50 ms':>12}{'p95 ms':>9}")
+    for (name, kbps), s in zip(viewers, stats):
+        label = f"{name}{f' ({kbps:.0f} kbps)' if kbps else ''}"
+        times = s["times"]
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 else 0.0
+        ages = s["ages"] or [float("nan")]
+        print(f"{label:<24}{len(times):>8}{fps:>7.1f}{np.percentile(ages, 50):>12.1f}{np.percentile(ages, 95):>9.1f}")
+
+if __name__ == "__main__":
+    main()
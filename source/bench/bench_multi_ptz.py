@@ -0,0 +1,119 @@
+"""
+Multi-target PTZ: VirtualPTZ.update cost versus the number of tracked people.
+
+For each count, a synthetic sequence (noisy tracked boxes, each track dropping out now and
+then, plus the odd empty frame and frame without track IDs, so viewports coast) is replayed
+through:
+  single:   the single-target update (one AlphaBetaFilter object per track in a dict)
+  per-dict: a viewport for every track computed the same way, track by track, with the
+            per-track filter objects (the straightforward multi-target implementation)
+  multi:    ptz.multi, every viewport from one NumPy pass over the TrackBank arrays
+Reported: mean microseconds per update, and the largest difference in pixels between the
+per-dict and the vectorized viewports (they implement the same filter).
+
+    python3 source/bench/bench_multi_ptz.py --frames 300 --counts 1 10 50 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+import harness
+
+class PerDictMulti:
+    """Reference multi-target viewports: per-track AlphaBetaFilter objects and Python loops."""
+
+    def __init__(self, config, rpi):
+        self.ptz = rpi.virtual_ptz.VirtualPTZ(config)
+        self.filter = rpi.target_filter.AlphaBetaFilter
+        self.zoom = {}
+
+    def update(self, detections, capture_ts):
+        ptz = self.ptz
+        W, H = ptz.resolution
+        ids = detections.ids
+        seen = set()
+        for box, track_id in zip(detections.boxes, ids.tolist() if ids is not None else []):
+            if track_id < 0 or track_id in seen:
+                continue
+            seen.add(track_id)
+            f = ptz.filters.get(track_id)
+            if f is None:
+                ptz.filters[track_id] = self.filter(box, capture_ts, ptz.alpha, ptz.beta)
+            else:
+                f.update(box, capture_ts)
+        for track_id in [t for t, f in ptz.filters.items() if capture_ts - f.last_seen > ptz.coast_time]:
+            del ptz.filters[track_id]
+            self.zoom.pop(track_id, None)
+
+        viewports = {}
+        for track_id in sorted(ptz.filters):
+            cx, cy, h = ptz.filters[track_id].predict(capture_ts + ptz.latency, ptz.max_lead)
+            auto_zoom = max(1.0, min(H / (h * 1.25), ptz.max_zoom))
+            zoom = self.zoom.get(track_id, 1.0)
+            zoom = self.zoom[track_id] = zoom + ptz.zoom_alpha * (auto_zoom - zoom)
+            crop_h = H / zoom
+            crop_w = crop_h * 9 / 16
+            x = max(0, min(cx - crop_w / 2, W - crop_w))
+            y = max(0, min(cy - crop_h / 2, H - crop_h))
+            viewports[track_id] = [int(x), int(y), int(crop_w), int(crop_h)]
+        return viewports
+
+def generate(count, frames, seed=0):
+    video = harness.SyntheticVideo(people=count, seed=seed)
+    rng = np.random.default_rng(seed)
+    sequence = []
+    for i in range(frames):
+        rows = video.boxes(i)
+        # Each track missing from ~5% of frames
+        rows = rows[rng.random(len(rows)) > 0.05]
+        boxes = rows[:, :4] + rng.normal(0, 3, (len(rows), 4))
+        ids = rows[:, 4]
+        # Now and then an empty scene, or boxes without track IDs: every viewport coasts
+        if i % 50 == 10:
+            boxes, ids = np.zeros((0, 4)), np.zeros(0)
+        elif i % 50 == 30:
+            ids = None
+        sequence.append((1_000_000.0 + i / video.fps, boxes, ids))
+    return sequence
+
+def timed(update, sequence, rpi):
+    outputs = []
+    start = time.perf_counter()
+    for capture_ts, boxes, ids in sequence:
+        detections = rpi.payload_codec.Detections(boxes, np.full(len(boxes), 0.9), np.zeros(len(boxes)), ids)
+        outputs.append(update(detections, capture_ts))
+    return (time.perf_counter() - start) / len(sequence) * 1e6, outputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 5, 10, 25, 50, 100, 200])
+    args = parser.parse_args()
+
+    rpi = harness.load_side("rpi", "virtual_ptz", "target_filter", "payload_codec")
+    # Fixed latency estimate, so all three predict the same distance ahead
+    ptz = {"predict_latency": True, "default_latency_ms": 150}
+    config = harness.load_config({"ptz": ptz})
+    multi_config = harness.load_config({"ptz": dict(ptz, multi={"enabled": True, "max_targets": 0})})
+
+    print(f"{'people':>7}{'single us':>11}{'per-dict us':>13}{'multi us':>10}{'speedup':>9}{'max diff px':>13}")
+    for count in args.counts:
+        sequence = generate(count, args.frames)
+        single = rpi.virtual_ptz.VirtualPTZ(config)
+        single_us, _ = timed(lambda d, ts: single.update(d, ts), sequence, rpi)
+        reference = PerDictMulti(config, rpi)
+        per_dict_us, expected = timed(reference.update, sequence, rpi)
+        multi = rpi.virtual_ptz.VirtualPTZ(multi_config)
+        multi_us, got = timed(lambda d, ts: multi.update(d, ts), sequence, rpi)
+
+        diff = 0
+        for want, cmd in zip(expected, got):
+            viewports = cmd["viewports"]
+            assert viewports["ids"] == list(want), "different set of viewports"
+            if want:
+                diff = max(diff, int(np.abs(np.subtract(viewports["boxes"], list(want.values()))).max()))
+        print(f"{count:>7}{single_us:>11.1f}{per_dict_us:>13.1f}{multi_us:>10.1f}{per_dict_us / multi_us:>8.1f}x{diff:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Multi-camera inference on one model instance.
+
+1. Throughput: the same frames from N synthetic cameras tracked one camera at a time
+   (what N separate processes would each do) versus one batched call per round.
+2. Live run: N local synthetic video files served through FrameGrabbers into
+   YOLOTracker.start(), results published on per-camera topics through a local broker
+   stand-in, with one RPi handler per camera answering on its own namespace.
+
+    python3 source/bench/bench_multicam.py --cameras 4 --model models/yolo26n.pt
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+import harness
+import mocks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--model", help="override ai.model_path")
+    parser.add_argument("--imgsz", type=int, help="override ai.input_size")
+    args = parser.parse_args()
+
+    mocks.install()
+    overrides = {"latency": {"report_interval": 0}, "ai": {}}
+    if args.model:
+        overrides["ai"]["model_path"] = args.model
+    if args.imgsz:
+        overrides["ai"]["input_size"] = args.imgsz
+    config = harness.load_config(overrides)
+    camera_ids = [f"cam{i}" for i in range(args.cameras)]
+    videos = {cid: harness.SyntheticVideo(*config['video']['resolution'], seed=i) for i, cid in enumerate(camera_ids)}
+
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics", "yolo_tracker")
+    tracker = pc.yolo_tracker.YOLOTracker(config)
+
+    # 1. Throughput on preloaded frames
+    frames = [[videos[cid].frame(r)[0] for cid in camera_ids] for r in range(args.rounds)]
+    tracker.track_batch(frames[0], camera_ids)
+    start = time.perf_counter()
+    for images in frames:
+        for cid, image in zip(camera_ids, images):
+            tracker.track(image, cid)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    for images in frames:
+        tracker.track_batch(images, camera_ids)
+    batched = time.perf_counter() - start
+    total = args.rounds * args.cameras
+    print(f"per-camera calls: {total / sequential:6.1f} frames/s")
+    print(f"batched calls:    {total / batched:6.1f} frames/s  ({sequential / batched:.2f}x)")
+
+    # 2. Live run with grabbers, per-camera topics and a broker stand-in
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface")
+    broker = harness.LocalBroker()
+    replies = Counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        count = int(args.seconds * 30)
+        cameras = [{"id": cid, "source": harness.write_video(videos[cid], os.path.join(tmp, f"{cid}.mp4"), count),
+                    "broker": "local"} for cid in camera_ids]
+
+        rpi_clients = []
+        for cam in cameras:
+            rpi_config = dict(config, rpi=dict(config['rpi'], camera_id=cam['id']))
+            rpi_mqtt = rpi.mqtt_client.MQTTClient(rpi_config, client=broker.client())
+            ptz = rpi.virtual_ptz.VirtualPTZ(rpi_config)
+            sense_hat = rpi.sense_hat_interface.SenseHatInterface(rpi_config)
+            rpi_mqtt.set_callback(lambda topic, payload, m=rpi_mqtt, p=ptz, s=sense_hat:
+                                  rpi.main.process_inference(payload, p, s, m) if topic == m.topics['inference'] else None)
+            rpi_mqtt.start()
+            rpi_clients.append(rpi_mqtt)
+
+        pc_clients = {cam['id']: pc.mqtt_client.MQTTClient(config, client=broker.client(), camera=cam) for cam in cameras}
+        for cid, mqtt in pc_clients.items():
+            mqtt.start()
+        watcher = broker.client()
+        watcher.on_message = lambda c, u, msg: replies.update([msg.topic])
+        watcher.connect("local")
+        watcher.subscribe("#")
+
+        latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0)
+        tracker = pc.yolo_tracker.YOLOTracker(config)
+        start = time.perf_counter()
+        stats = pc.main.run(config, tracker.start({c['id']: c['source'] for c in cameras}),
+                            pc_clients, latency, display=False)
+        elapsed = time.perf_counter() - start
+        tracker.stop()
+        broker.drain()
+
+    print(f"live: {stats['frames']} frames in {elapsed:.1f}s ({stats['frames'] / elapsed:.1f} frames/s), "
+          f"dropped {stats['dropped']}")
+    for topic, n in sorted(replies.items()):
+        print(f"  {topic:<28} {n:>5} messages")
+    print(latency.format_report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Replay of detection sequences through VirtualPTZ: jitter and tracking error with the raw
+per-message viewport, the smoothed viewport, and the smoothed + latency-predicted viewport.
+
+A sequence is generated from the synthetic video (noisy boxes, random dropouts of the
+target, fixed pipeline delays) or loaded from a JSONL file with one inference payload
+per line (JSON codec format plus an optional "gt" list of [x1, y1, x2, y2, id] rows).
+
+Metrics per mode:
+  * error:  distance between the viewport center and the true target center in the frame
+            it is drawn on: the PC's newest one, captured an MQTT round trip later
+  * jitter: RMS of the frame-to-frame second difference of the viewport center
+  * snaps:  frames where the viewport center jumps more than 150 px
+
+    python3 source/bench/bench_ptz_filter.py --frames 900 --latency-ms 200
+    python3 source/bench/bench_ptz_filter.py --save seq.jsonl
+    python3 source/bench/bench_ptz_filter.py --replay seq.jsonl
+"""
+import argparse
+import json
+
+import numpy as np
+
+import harness
+
+def generate(frames, latency_ms, noise, dropout, seed):
+    """Synthetic recorded sequence: one JSON-format inference payload per frame."""
+    video = harness.SyntheticVideo(people=3, seed=seed)
+    rng = np.random.default_rng(seed)
+    latency = latency_ms / 1000
+    t0 = 1_000_000.0
+    sequence = []
+    dropped_until = -1
+    for i in range(frames):
+        gt = video.boxes(i)
+        capture_ts = t0 + i / video.fps
+        boxes = gt.copy()
+        boxes[:, :4] += rng.normal(0, noise, (len(boxes), 4))
+        # Occasionally lose the lowest ID (the auto-selected target) for a few frames
+        if i > dropped_until and rng.random() < dropout:
+            dropped_until = i + int(rng.integers(3, 20))
+        if i <= dropped_until:
+            boxes = boxes[boxes[:, 4] != gt[:, 4].min()]
+        sequence.append({
+            "seq": i,
+            "capture_ts": capture_ts,
+            "sent_ts": capture_ts + latency / 2,
+            "received_ts": capture_ts + latency * 3 / 4,
+            "detections": [{"box": b[:4].tolist(), "conf": 0.9, "cls": 0, "id": int(b[4])} for b in boxes],
+            "gt": gt.tolist(),
+        })
+    return sequence
+
+def replay(sequence, config, mode, rpi):
+    ptz_config = dict(config.get('ptz', {}))
+    ptz_config['smoothing'] = mode != "raw"
+    ptz_config['predict_latency'] = mode == "predicted"
+    ptz = rpi.virtual_ptz.VirtualPTZ(dict(config, ptz=ptz_config))
+    centers, errors = [], []
+    gt_tracks = {}
+    for payload in sequence:
+        for x1, y1, x2, y2, track_id in payload.get("gt", []):
+            gt_tracks.setdefault(int(track_id), []).append((payload["capture_ts"], (x1 + x2) / 2, (y1 + y2) / 2))
+    for payload in sequence:
+        decoded = rpi.payload_codec.JSONCodec().decode(json.dumps(payload))
+        received_ts = payload.get("received_ts", payload["capture_ts"])
+        cmd = ptz.update(decoded["detections"], payload["capture_ts"], payload.get("sent_ts"), received_ts)
+        center = np.array([cmd["x"] + cmd["w"] / 2, cmd["y"] + cmd["h"] / 2])
+        centers.append(center)
+        # Drawn on the PC's newest frame when the reply gets back: one round trip newer
+        display_ts = payload["capture_ts"] + 2 * (received_ts - payload.get("sent_ts", received_ts))
+        track = gt_tracks.get(cmd["target_id"])
+        if track:
+            ts, xs, ys = np.array(track).T
+            errors.append(np.hypot(*(center - [np.interp(display_ts, ts, xs), np.interp(display_ts, ts, ys)])))
+    centers = np.array(centers)
+    second_diff = np.diff(centers, n=2, axis=0)
+    steps = np.hypot(*np.diff(centers, axis=0).T)
+    return {
+        "error": np.mean(errors) if errors else float("nan"),
+        "error_p95": np.percentile(errors, 95) if errors else float("nan"),
+        "jitter": np.sqrt(np.mean(np.sum(second_diff ** 2, axis=1))),
+        "snaps": int(np.sum(steps > 150)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--noise", type=float, default=6.0, help="box noise std (px)")
+    parser.add_argument("--dropout", type=float, default=0.02, help="per-frame chance of losing the target")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the generated sequence to a JSONL file")
+    parser.add_argument("--replay", help="replay a recorded JSONL sequence instead")
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay) as f:
+            sequence = [json.loads(line) for line in f if line.strip()]
+    else:
+        sequence = generate(args.frames, args.latency_ms, args.noise, args.dropout, args.seed)
+    if args.save:
+        with open(args.save, "w") as f:
+            for payload in sequence:
+                f.write(json.dumps(payload) + "\n")
+
+    rpi = harness.load_side("rpi", "virtual_ptz", "payload_codec")
+    config = harness.load_config()
+    print(f"{'mode':<10}{'error px':>10}{'p95 px':>10}{'jitter px':>11}{'snaps':>7}")
+    for mode in ("raw", "smoothed", "predicted"):
+        r = replay(sequence, config, mode, rpi)
+        print(f"{mode:<10}{r['error']:>10.1f}{r['error_p95']:>10.1f}{r['jitter']:>11.2f}{r['snaps']:>7}")
+
+if __name__ == "__main__":
+    main()
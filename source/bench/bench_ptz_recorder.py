@@ -0,0 +1,100 @@
+"""
+Background recording of the PTZ view: cost to the inference loop and behaviour when the
+disk falls behind.
+
+Runs the PC loop (source/pc/main.py run, local PTZ, no window) on synthetic frames at the
+source frame rate with:
+  none:       no recording
+  inline:     every frame written from the loop itself (VideoWriter.write in the loop)
+  background: PTZRecorder, frames queued to its worker thread
+  slow disk:  PTZRecorder whose writes take an extra --slow-ms, as on a congested disk
+Reported per mode: time the loop spends per frame (p50 / p95 / max), frames recorded and
+dropped, and the files written (rotated every --rotate-s seconds).
+
+    python3 source/bench/bench_ptz_recorder.py --frames 300 --full-view --slow-ms 80
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import harness
+import mocks
+
+def timed_frames(frames, loop_ms):
+    """Pass frames through, recording how long the loop body took for each."""
+    for item in frames:
+        yielded = time.perf_counter()
+        yield item
+        loop_ms.append((time.perf_counter() - yielded) * 1000)
+
+def run(mode, args, pc, out_dir):
+    config = harness.load_config({"latency": {"report_interval": 0}, "ptz": {"local": True},
+                                  "recording": {"enabled": mode != "none", "dir": out_dir, "full_view": args.full_view,
+                                                "rotate_s": args.rotate_s, "queue_size": args.queue_size}})
+    broker = harness.LocalBroker()
+    mqtt = pc.mqtt_client.MQTTClient(config, client=broker.client())
+    mqtt.start()
+    latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0)
+    recorder = pc.ptz_recorder.PTZRecorder(config)
+    if mode == "inline":
+        # The frame is written before submit returns
+        os.makedirs(out_dir)
+        recorder.thread = True
+        recorder.submit = lambda camera_id, frame_info, image, detections: recorder.record(
+            camera_id, frame_info, image, detections, recorder.ptz_states.get(camera_id))
+    else:
+        recorder.start()
+    if mode == "slow disk":
+        record = recorder.record
+
+        def slow_record(*item):
+            time.sleep(args.slow_ms / 1000)
+            record(*item)
+        recorder.record = slow_record
+
+    loop_ms = []
+    video = harness.SyntheticVideo(*config['video']['resolution'])
+    frames = harness.synthetic_frames(video, args.frames, inference_ms=args.inference_ms)
+    pc.main.run(config, timed_frames(frames, loop_ms), {None: mqtt}, latency, display=False,
+                local_ptz=pc.local_ptz.LocalPTZ(config), recorder=recorder)
+    if mode == "inline":
+        for segment in recorder.segments.values():
+            segment.close()
+    else:
+        recorder.stop()
+    mqtt.stop()
+    files = sorted(os.listdir(out_dir)) if os.path.isdir(out_dir) else []
+    return {
+        "p50": np.percentile(loop_ms, 50),
+        "p95": np.percentile(loop_ms, 95),
+        "max": max(loop_ms),
+        "recorded": recorder.recorded,
+        "dropped": recorder.dropped,
+        "files": len(files),
+        "mb": sum(os.path.getsize(os.path.join(out_dir, f)) for f in files) / 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--inference-ms", type=float, default=15.0)
+    parser.add_argument("--full-view", action="store_true", help="also record the full frame")
+    parser.add_argument("--slow-ms", type=float, default=80.0, help="extra time per write in slow disk mode")
+    parser.add_argument("--rotate-s", type=float, default=4.0)
+    parser.add_argument("--queue-size", type=int, default=30)
+    args = parser.parse_args()
+
+    mocks.install()
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics", "local_ptz", "ptz_recorder")
+    print(f"{'mode':<12}{'loop p50 ms':>12}{'p95':>7}{'max':>8}{'recorded':>10}{'dropped':>9}{'files':>7}{'MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("none", "inline", "background", "slow disk"):
+            r = run(mode, args, pc, os.path.join(tmp, mode.replace(" ", "_")))
+            print(f"{mode:<12}{r['p50']:>12.2f}{r['p95']:>7.2f}{r['max']:>8.1f}{r['recorded']:>10}{r['dropped']:>9}"
+                  f"{r['files']:>7}{r['mb']:>7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+ROI-focused inference versus full-frame inference on a local video file.
+
+Both modes run the same frames offline through YOLOTracker, with VirtualPTZ (RPi code,
+in-process, no latency) picking the target and feeding its viewport back as the ROI.
+Recall is measured on the target locked in full-frame mode: the fraction of frames where
+full-frame mode found it and ROI mode produced a box with IoU >= 0.5 on it.
+
+    python3 source/bench/bench_roi.py --source clip.mp4 --frames 300 --roi-size 480 --sweep 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import harness
+
+def iou(box, boxes):
+    if not len(boxes):
+        return np.zeros(0)
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = lambda b: (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / (area(box) + area(boxes) - inter + 1e-9)
+
+def read_frames(path, count):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, image = cap.read()
+        if not ok:
+            break
+        frames.append(image)
+    cap.release()
+    return frames
+
+def run_mode(config, frames, pc, rpi):
+    tracker = pc.yolo_tracker.YOLOTracker(config)
+    ptz = rpi.virtual_ptz.VirtualPTZ(dict(config, ptz=dict(config.get('ptz', {}), predict_latency=False)))
+    tracker.track(frames[0])
+    tracker.trackers.clear()
+    outputs = []
+    rois = 0
+    start = time.perf_counter()
+    for image in frames:
+        result = tracker.track(image)
+        rois += tracker.last_crops.get(None) is not None
+        detections = pc.payload_codec.Detections.from_boxes(result.boxes)
+        cmd = ptz.update(rpi.payload_codec.Detections(detections.boxes, detections.conf, detections.cls, detections.ids))
+        tracker.set_roi(None, cmd)
+        outputs.append((detections, cmd["target_id"]))
+    elapsed = time.perf_counter() - start
+    return outputs, len(frames) / elapsed, rois
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="local video file (default: synthetic clip)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--model", help="override ai.model_path")
+    parser.add_argument("--roi-size", type=int, default=480)
+    parser.add_argument("--sweep", type=int, default=10, help="full-frame sweep every N frames")
+    args = parser.parse_args()
+
+    pc = harness.load_side("pc", "yolo_tracker", "payload_codec")
+    rpi = harness.load_side("rpi", "virtual_ptz", "payload_codec")
+    overrides = {"ai": {"roi": {"enabled": False}}}
+    if args.model:
+        overrides["ai"]["model_path"] = args.model
+    config = harness.load_config(overrides)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source or harness.write_video(harness.SyntheticVideo(), os.path.join(tmp, "clip.mp4"), args.frames)
+        frames = read_frames(source, args.frames)
+    config['video'] = dict(config['video'], resolution=[frames[0].shape[1], frames[0].shape[0]])
+
+    full, full_fps, _ = run_mode(config, frames, pc, rpi)
+    config['ai'] = dict(config['ai'], roi={"enabled": True, "input_size": args.roi_size,
+                                           "margin": config['ai'].get('roi', {}).get('margin', 1.6),
+                                           "full_sweep_every": args.sweep})
+    roi, roi_fps, roi_frames = run_mode(config, frames, pc, rpi)
+
+    hits = total = 0
+    for (full_det, target_id), (roi_det, _) in zip(full, roi):
+        if target_id is None or full_det.ids is None:
+            continue
+        match = np.flatnonzero(full_det.ids == target_id)
+        if not match.size:
+            continue
+        total += 1
+        hits += bool(np.any(iou(full_det.boxes[match[0]], roi_det.boxes) >= 0.5))
+
+    print(f"full-frame: {full_fps:6.1f} fps")
+    print(f"roi:        {roi_fps:6.1f} fps ({roi_fps / full_fps:.2f}x, {roi_frames}/{len(frames)} frames on a crop)")
+    print(f"locked-target recall: {hits}/{total}" + (f" = {hits / total:.3f}" if total else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+RPi node runtimes: the thread-based 10 ms polling loop versus the asyncio runtime.
+
+Each runtime runs the full RPi node (source/rpi/main.py run_threads / runtime.py) on mocked
+hardware: the stream server (waiting for the PC, so no encoding), a mocked Sense HAT whose
+joystick blocks like the real device, and the in-process broker stand-in.
+  idle:   no traffic for --idle-s seconds; CPU time used by the process
+  active: inference messages at --rate msg/s from a stand-in PC (synthetic tracked boxes)
+          and, from another thread, a joystick 'right' press (pressed + released) about every
+          --press-ms (0.5-1.5x, random phase), every fourth one a double press
+Reported per runtime: idle and active CPU (% of one core), joystick events applied of
+those pressed, input-to-apply latency (event timestamp until VirtualPTZ.handle_input),
+input-to-PTZ latency (until the first PTZ publish after it), and shutdown time.
+
+    python3 source/bench/bench_runtime.py --idle-s 5 --active-s 5 --rate 30
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+
+import harness
+import mocks
+
+def start_node(runtime, config, rpi, broker):
+    camera = rpi.camera_stream.CameraStream(config)
+    ptz = rpi.virtual_ptz.VirtualPTZ(config)
+    sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+    mqtt = rpi.mqtt_client.MQTTClient(config, client=broker.client())
+    camera.on_encoding = rpi.main.encoding_handler(ptz, sense_hat, mqtt)
+    if runtime == "threads":
+        stop = threading.Event()
+        thread = threading.Thread(target=rpi.main.run_threads, args=(config, camera, ptz, sense_hat, mqtt, stop))
+        stopper = stop.set
+    else:
+        handler = rpi.main.inference_handler(config, ptz, sense_hat, mqtt, rpi.inference_worker.PTZDeadBand(config))
+        node = rpi.runtime.RPiRuntime(config, camera, ptz, sense_hat, mqtt, handler,
+                                      on_ready=lambda payload: rpi.main.handle_ready(payload, camera))
+        thread = threading.Thread(target=asyncio.run, args=(node.run(),))
+        stopper = node.stop
+    thread.start()
+    return ptz, sense_hat, mqtt, thread, stopper
+
+def cpu_percent(seconds, work=None):
+    wall, cpu = time.monotonic(), time.process_time()
+    if work:
+        work(seconds)
+    else:
+        time.sleep(seconds)
+    return (time.process_time() - cpu) / (time.monotonic() - wall) * 100
+
+def run(runtime, args, rpi):
+    config = harness.load_config({"video": {"host": "127.0.0.1", "port": 0},
+                                  "metrics": {"enabled": True, "host": "127.0.0.1", "port": 0},
+                                  "startup": {"wait_for_ready": True, "ready_timeout_s": 3600}})
+    broker = harness.LocalBroker()
+    ptz, sense_hat, mqtt, thread, stop = start_node(runtime, config, rpi, broker)
+    time.sleep(0.5)
+
+    applied = []
+    handle_input = ptz.handle_input
+
+    def timed_input(event):
+        handle_input(event)
+        if event.action == "pressed":
+            applied.append((event.timestamp, time.time()))
+    ptz.handle_input = timed_input
+
+    ptz_sent = []
+    observer = broker.client()
+    observer.on_message = lambda client, userdata, msg: ptz_sent.append(msg)
+    observer.connect("localhost")
+    observer.subscribe(mqtt.topics['ptz'])
+
+    idle_cpu = cpu_percent(args.idle_s)
+
+    video = harness.SyntheticVideo(people=3)
+    feeder = broker.client()
+    feeder.connect("localhost")
+    pressed = 0
+
+    def press(seconds):
+        # On its own thread at a random phase to the inference messages, like a real user
+        nonlocal pressed
+        rng = np.random.default_rng(0)
+        end, presses = time.time() + seconds, 0
+        while True:
+            time.sleep(args.press_ms / 1000 * rng.uniform(0.5, 1.5))
+            if time.time() >= end:
+                return
+            presses += 1
+            for _ in range(2 if presses % 4 == 0 else 1):
+                sense_hat.sense.stick.push(mocks.MockJoystickEvent("right", "pressed", time.time()))
+                sense_hat.sense.stick.push(mocks.MockJoystickEvent("right", "released", time.time()))
+                pressed += 1
+
+    def traffic(seconds):
+        presser = threading.Thread(target=press, args=(seconds,))
+        presser.start()
+        start = time.time()
+        seq = 0
+        while time.time() - start < seconds:
+            rows = video.boxes(seq)
+            detections = rpi.payload_codec.Detections(rows[:, :4], np.full(len(rows), 0.9), np.zeros(len(rows)), rows[:, 4])
+            now = time.time()
+            feeder.publish(mqtt.topics["inference"], rpi.payload_codec.JSONCodec().encode(
+                {"seq": seq, "capture_ts": now, "sent_ts": now, "detections": detections}))
+            seq += 1
+            wait = start + seq / args.rate - time.time()
+            if wait > 0:
+                time.sleep(wait)
+        presser.join()
+
+    active_cpu = cpu_percent(args.active_s, traffic)
+    broker.drain()
+    time.sleep(0.2)
+
+    start = time.monotonic()
+    stop()
+    thread.join()
+    shutdown_ms = (time.monotonic() - start) * 1000
+
+    sent = sorted(json.loads(m.payload)["sent_ts"] for m in ptz_sent)
+    apply_ms = [(t - ts) * 1000 for ts, t in applied]
+    to_ptz_ms = []
+    for ts, t in applied:
+        i = np.searchsorted(sent, t)
+        if i < len(sent):
+            to_ptz_ms.append((sent[i] - ts) * 1000)
+    return {
+        "idle_cpu": idle_cpu,
+        "active_cpu": active_cpu,
+        "applied": len(applied),
+        "pressed": pressed,
+        "apply_p50": np.percentile(apply_ms, 50) if apply_ms else float("nan"),
+        "apply_p95": np.percentile(apply_ms, 95) if apply_ms else float("nan"),
+        "ptz_p50": np.percentile(to_ptz_ms, 50) if to_ptz_ms else float("nan"),
+        "ptz_p95": np.percentile(to_ptz_ms, 95) if to_ptz_ms else float("nan"),
+        "shutdown_ms": shutdown_ms,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--idle-s", type=float, default=5.0)
+    parser.add_argument("--active-s", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=30.0, help="inference messages per second")
+    parser.add_argument("--press-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    mocks.install()
+    rpi = harness.load_side("rpi", "main", "runtime", "mqtt_client", "virtual_ptz", "sense_hat_interface",
+                            "inference_worker", "camera_stream", "payload_codec")
+    rows = []
+    for runtime in ("threads", "asyncio"):
+        rows.append((runtime, run(runtime, args, rpi)))
+    print(f"{'runtime':<9}{'idle CPU %':>11}{'active CPU %':>13}{'events':>10}{'apply p50':>11}{'p95':>7}"
+          f"{'to PTZ p50':>12}{'p95':>7}{'shutdown ms':>13}")
+    for runtime, r in rows:
+        print(f"{runtime:<9}{r['idle_cpu']:>11.2f}{r['active_cpu']:>13.2f}{r['applied']:>5}/{r['pressed']:<4}"
+              f"{r['apply_p50']:>11.1f}{r['apply_p95']:>7.1f}{r['ptz_p50']:>12.1f}{r['ptz_p95']:>7.1f}{r['shutdown_ms']:>13.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Sense HAT radar: framebuffer writes of the old per-pixel renderer versus the diffed,
+rate-limited one, on a mocked Sense HAT that counts writes.
+
+The synthetic clip's boxes are fed as inference detections at the clip fps (simulated clock,
+no sleeping). The old renderer clears the matrix and sets one pixel per box on every message;
+the new one composes the image, skips unchanged frames and writes at most max_fps times per
+second with one set_pixels call. Both must end on the same picture.
+
+    python3 source/bench/bench_sense_hat.py --frames 900 --people 3 --max-fps 10
+"""
+import argparse
+import time
+
+import harness
+import mocks
+
+def legacy_update(sense, resolution, detections, active_target_id):
+    """The renderer before diffing: clear, then one set_pixel per detection."""
+    sense.clear()
+    W, H = resolution
+    for i, (x1, y1, x2, y2) in enumerate(detections.boxes.tolist()):
+        ix = max(0, min(int((x1 + x2) / 2 / W * 8), 7))
+        iy = max(0, min(int((y1 + y2) / 2 / H * 8), 7))
+        color = (255, 0, 0) if detections.ids is not None and detections.ids[i] == active_target_id else (255, 255, 255)
+        sense.set_pixel(ix, iy, color)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--people", type=int, default=3)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--max-fps", type=float, default=10)
+    args = parser.parse_args()
+
+    mocks.install()
+    rpi = harness.load_side("rpi", "sense_hat_interface", "payload_codec")
+    config = harness.load_config({"sense_hat": {"max_fps": args.max_fps}})
+    video = harness.SyntheticVideo(people=args.people, fps=args.fps)
+    messages = []
+    for i in range(args.frames):
+        rows = video.boxes(i)
+        messages.append((i / args.fps, rpi.payload_codec.Detections(rows[:, :4], ids=rows[:, 4])))
+    target = int(messages[0][1].ids[0])
+
+    legacy = mocks.MockSenseHat()
+    start = time.perf_counter()
+    for _, detections in messages:
+        legacy_update(legacy, config['video']['resolution'], detections, target)
+    legacy_ms = (time.perf_counter() - start) * 1000
+
+    display = rpi.sense_hat_interface.SenseHatInterface(config)
+    display.sense.writes = 0
+    start = time.perf_counter()
+    for now, detections in messages:
+        display.update_display(detections, target, now=now)
+    new_ms = (time.perf_counter() - start) * 1000
+    # The main loop flushes whatever the rate limit held back
+    display.refresh(now=messages[-1][0] + 1.0)
+
+    duration = args.frames / args.fps
+    print(f"{args.frames} messages, {args.people} people, {duration:.0f} s at {args.fps:.0f} fps")
+    print(f"{'renderer':<12}{'writes':>8}{'per msg':>9}{'writes/s':>10}{'total ms':>10}")
+    for name, writes, ms in (("per-pixel", legacy.writes, legacy_ms), ("diffed", display.sense.writes, new_ms)):
+        print(f"{name:<12}{writes:>8}{writes / args.frames:>9.2f}{writes / duration:>10.1f}{ms:>10.1f}")
+
+    assert display.sense.get_pixels() == legacy.get_pixels(), "final radar differs from the per-pixel renderer"
+    assert display.sense.writes <= duration * args.max_fps + 2, "refresh rate cap exceeded"
+    assert display.sense.writes < legacy.writes, "no reduction in framebuffer writes"
+    print(f"reduction: {legacy.writes / max(display.sense.writes, 1):.0f}x fewer writes, same final picture")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+PC startup: sequential versus concurrent with warm-up and the ready handshake.
+
+Both sides "boot" at the same moment on one machine: the RPi stream server (file source, a
+synthetic H.264 clip) with its MQTT client and inference worker, and the PC with the real
+tracker, the in-process broker stand-in (with a simulated connect time) and the headless
+dashboard loop.
+  sequential: the previous order. Load the model, open the stream, connect MQTT; the RPi
+              encodes from boot and the first inference runs on a cold model.
+  concurrent: source/pc/main.py start_up. Model load plus warm-up, MQTT connect and stream
+              open overlap; the RPi starts its encoder on the PC's ready message.
+Reported per mode: time to ready, time to the first PTZ frame on the dashboard, the first
+frame's inference time and its age (capture until inference done).
+
+    python3 source/bench/bench_startup.py --model models/yolo26n.pt --connect-ms 300
+    python3 source/bench/bench_startup.py --backend openvino --frames 60
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+import harness
+import mocks
+
+def run(mode, args, clip, pc, rpi):
+    concurrent = mode == "concurrent"
+    ai = {k: v for k, v in (("model_path", args.model), ("backend", args.backend)) if v}
+    config = harness.load_config({"video": {"host": "127.0.0.1", "port": 0, "source_file": clip},
+                                  "latency": {"report_interval": 0}, "ai": ai})
+    broker = harness.LocalBroker(delay=args.network_ms / 1000)
+
+    def slow_client():
+        client = broker.client()
+        connect = client.connect
+
+        def delayed_connect(*a, **kw):
+            time.sleep(args.connect_ms / 1000)
+            return connect(*a, **kw)
+        client.connect = delayed_connect
+        return client
+
+    started = time.time()
+    clock = pc.main.StartupClock(started)
+
+    # RPi side, as in source/rpi/main.py
+    camera = rpi.camera_stream.CameraStream(config)
+    ptz = rpi.virtual_ptz.VirtualPTZ(config)
+    sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+    rpi_mqtt = rpi.mqtt_client.MQTTClient(config, client=slow_client())
+    worker = rpi.inference_worker.InferenceWorker(
+        lambda payload, received_ts: rpi.main.process_inference(payload, ptz, sense_hat, rpi_mqtt, received_ts),
+        on_idle=sense_hat.refresh)
+
+    def on_rpi_message(topic, payload):
+        if topic == rpi_mqtt.topics['inference']:
+            worker.submit(payload)
+        elif topic == rpi_mqtt.topics.get('ready'):
+            rpi.main.handle_ready(payload, camera)
+
+    rpi_mqtt.set_callback(on_rpi_message)
+    camera.start(encode=not concurrent)
+    worker.start()
+    rpi_mqtt.start()
+
+    # PC side
+    sources = {None: f"tcp://127.0.0.1:{camera.port}"}
+    mqtt_clients = {None: pc.mqtt_client.MQTTClient(config, client=slow_client())}
+    latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0)
+    if concurrent:
+        tracker = pc.yolo_tracker.YOLOTracker(config, load=False)
+        frames = pc.main.start_up(config, tracker, sources, mqtt_clients, clock)
+    else:
+        tracker = pc.yolo_tracker.YOLOTracker(config)
+        frames = tracker.start(sources)
+        for mqtt in mqtt_clients.values():
+            mqtt.start()
+    ready_ms = (time.time() - started) * 1000
+
+    first = {}
+
+    def first_frame(frames):
+        for camera_id, frame_info, result in frames:
+            if not first:
+                first["inference_ms"] = frame_info["inference_ms"]
+                first["age_ms"] = (time.time() - frame_info["capture_ts"]) * 1000
+            yield camera_id, frame_info, result
+
+    try:
+        pc.main.run(config, itertools.islice(first_frame(frames), args.frames), mqtt_clients, latency,
+                    display=False, tracker=tracker, clock=clock)
+        broker.drain()
+    finally:
+        tracker.stop()
+        for mqtt in mqtt_clients.values():
+            mqtt.stop()
+        worker.stop()
+        rpi_mqtt.stop()
+        camera.stop()
+    return {
+        "ready_ms": ready_ms,
+        "first_ptz_ms": clock.first_ptz.get(None, float("nan")),
+        "inference_ms": first.get("inference_ms", float("nan")),
+        "age_ms": first.get("age_ms", float("nan")),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="override ai.model_path")
+    parser.add_argument("--backend", help="override ai.backend")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--connect-ms", type=float, default=200.0, help="simulated MQTT connect time")
+    parser.add_argument("--network-ms", type=float, default=5.0, help="one-way broker delay")
+    args = parser.parse_args()
+
+    mocks.install()
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics", "yolo_tracker")
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface",
+                            "inference_worker", "camera_stream")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = harness.encode_h264(harness.SyntheticVideo(), os.path.join(tmp, "clip.h264"), 150)
+        print(f"MQTT connect {args.connect_ms:.0f} ms, network {args.network_ms:.0f} ms one way")
+        print(f"{'mode':<12}{'ready ms':>10}{'first PTZ ms':>14}{'1st inference ms':>18}{'1st frame age ms':>18}")
+        for mode in ("sequential", "concurrent"):
+            r = run(mode, args, clip, pc, rpi)
+            print(f"{mode:<12}{r['ready_ms']:>10.0f}{r['first_ptz_ms']:>14.0f}{r['inference_ms']:>18.1f}{r['age_ms']:>18.1f}")
+
+if __name__ == "__main__":
+    main()
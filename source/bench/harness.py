@@ -0,0 +1,392 @@
+"""
+Shared helpers for running the PC and RPi code on one Linux machine without a Pi,
+a camera or a real MQTT broker.
+"""
+import fnmatch
+import importlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(SOURCE_DIR)
+CONFIG_PATH = os.path.join(REPO_DIR, "config", "settings.json")
+
+def load_config(overrides=None):
+    with open(CONFIG_PATH, 'r') as f:
+        config = json.load(f)
+    for section, values in (overrides or {}).items():
+        config.setdefault(section, {}).update(values)
+    return config
+
+# Module names shared by source/pc and source/rpi (each side has its own copy)
+_side_modules = {}
+
+def load_side(side, *names):
+    """
+    Import modules from source/<side> and return them as a namespace.
+    Both sides use flat top-level module names (mqtt_client, utils, main...), so each
+    side is imported in isolation and its modules are removed from sys.modules afterwards.
+    """
+    side_dir = os.path.join(SOURCE_DIR, side)
+    local_names = {f[:-3] for f in os.listdir(side_dir) if f.endswith(".py")}
+    saved = {n: sys.modules.pop(n) for n in local_names if n in sys.modules}
+    for n, mod in _side_modules.get(side, {}).items():
+        sys.modules[n] = mod
+    sys.path.insert(0, side_dir)
+    try:
+        ns = types.SimpleNamespace()
+        for name in names:
+            setattr(ns, name, importlib.import_module(name))
+    finally:
+        sys.path.remove(side_dir)
+        loaded = {n: sys.modules.pop(n) for n in local_names if n in sys.modules}
+        _side_modules.setdefault(side, {}).update(loaded)
+        sys.modules.update(saved)
+    return ns
+
+# ---------------------------------------------------------------------------
+# In-process MQTT broker stand-in
+# ---------------------------------------------------------------------------
+
+class _Message:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+class LocalBroker:
+    """Delivers messages between LocalClient instances on a background thread, like a broker."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.clients = []
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.published = 0
+        self.bytes = 0
+        # Last retained payload per topic, handed to new subscribers
+        self.retained = {}
+        self.thread = threading.Thread(target=self._deliver_loop, daemon=True)
+        self.thread.start()
+
+    def client(self):
+        c = LocalClient(self)
+        with self.lock:
+            self.clients.append(c)
+        return c
+
+    def publish(self, topic, payload, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.published += 1
+        self.bytes += len(payload)
+        if retain:
+            with self.lock:
+                self.retained[topic] = payload
+        self.queue.put((time.monotonic() + self.delay, topic, payload, None))
+
+    def send_retained(self, client, subscription):
+        with self.lock:
+            retained = list(self.retained.items())
+        for topic, payload in retained:
+            if client.matches(topic, [subscription]):
+                self.queue.put((time.monotonic() + self.delay, topic, payload, client))
+
+    def _deliver_loop(self):
+        while True:
+            due, topic, payload, target = self.queue.get()
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            with self.lock:
+                clients = [target] if target else list(self.clients)
+            for c in clients:
+                if c.connected and c.matches(topic):
+                    c.deliver(_Message(topic, payload))
+
+    def drain(self, timeout=2.0):
+        """Wait until every queued message has been delivered."""
+        end = time.monotonic() + timeout
+        while not self.queue.empty() and time.monotonic() < end:
+            time.sleep(0.001)
+        time.sleep(self.delay + 0.005)
+
+class LocalClient:
+    """Subset of the paho-mqtt 1.x client API used by the MQTTClient wrappers."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.subscriptions = []
+        self.connected = False
+        self.on_connect = None
+        self.on_message = None
+        self.will = None
+
+    def will_set(self, topic, payload=None, qos=0, retain=False):
+        self.will = (topic, payload, retain)
+
+    def connect(self, host, port=1883, keepalive=60):
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+        return 0
+
+    def loop_start(self):
+        return 0
+
+    def loop_stop(self):
+        return 0
+
+    def disconnect(self):
+        self.connected = False
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        topics = [t for t, _ in topic] if isinstance(topic, list) else [topic]
+        for t in topics:
+            self.subscriptions.append(t)
+            self.broker.send_retained(self, t)
+        return (0, 0)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.broker.publish(topic, payload if payload is not None else b"", retain)
+        # Like paho's MQTTMessageInfo; the message is already with the broker
+        return types.SimpleNamespace(rc=0, wait_for_publish=lambda timeout=None: True, is_published=lambda: True)
+
+    def matches(self, topic, subscriptions=None):
+        for sub in self.subscriptions if subscriptions is None else subscriptions:
+            pattern = sub.replace("+", "*").replace("#", "*")
+            if sub == topic or fnmatch.fnmatchcase(topic, pattern):
+                return True
+        return False
+
+    def deliver(self, msg):
+        if self.on_message:
+            self.on_message(self, None, msg)
+
+# ---------------------------------------------------------------------------
+# Synthetic video source
+# ---------------------------------------------------------------------------
+
+class SyntheticVideo:
+    """
+    Deterministic frames with "people" (tall rectangles) walking across a textured background.
+    frame(i) returns the BGR image and the ground-truth boxes as an (N, 5) array of x1, y1, x2, y2, id.
+    """
+
+    def __init__(self, width=1280, height=720, people=3, fps=30, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+        self.people = []
+        for pid in range(people):
+            h = rng.uniform(0.3, 0.7) * height
+            self.people.append({
+                "id": pid + 1,
+                "h": h,
+                "w": h * 0.4,
+                "x": rng.uniform(0, width - h * 0.4),
+                "y": rng.uniform(0, height - h),
+                "vx": rng.uniform(-6, 6),
+                "vy": rng.uniform(-2, 2),
+                "color": tuple(int(c) for c in rng.integers(120, 255, 3)),
+            })
+
+    def boxes(self, i):
+        rows = []
+        for p in self.people:
+            x = _bounce(p["x"] + p["vx"] * i, self.width - p["w"])
+            y = _bounce(p["y"] + p["vy"] * i, self.height - p["h"])
+            rows.append([x, y, x + p["w"], y + p["h"], p["id"]])
+        return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+    def frame(self, i):
+        img = self.background.copy()
+        boxes = self.boxes(i)
+        for (x1, y1, x2, y2, _), p in zip(boxes, self.people):
+            img[int(y1):int(y2), int(x1):int(x2)] = p["color"]
+        return img, boxes
+
+def _bounce(pos, limit):
+    if limit <= 0:
+        return 0.0
+    period = 2 * limit
+    pos = pos % period
+    return pos if pos <= limit else period - pos
+
+# ---------------------------------------------------------------------------
+# Ultralytics Results look-alikes built from ground truth
+# ---------------------------------------------------------------------------
+
+class SyntheticBoxes:
+    def __init__(self, xyxy, conf, cls, ids):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.float32).reshape(-1)
+        self.id = None if ids is None else np.asarray(ids, dtype=np.float32).reshape(-1)
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __getitem__(self, i):
+        i = [i] if isinstance(i, int) else i
+        return SyntheticBoxes(self.xyxy[i], self.conf[i], self.cls[i], None if self.id is None else self.id[i])
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+class SyntheticResult:
+    def __init__(self, orig_img, boxes, speed=None):
+        self.orig_img = orig_img
+        self.boxes = boxes
+        self.speed = speed or {"preprocess": 0.0, "inference": 0.0, "postprocess": 0.0}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, i):
+        return SyntheticResult(self.orig_img, self.boxes[i], self.speed)
+
+    def plot(self):
+        img = self.orig_img.copy()
+        import cv2
+        for x1, y1, x2, y2 in self.boxes.xyxy.astype(int):
+            cv2.rectangle(img, (x1, y1), (x2, y2), (255, 128, 0), 2)
+        return img
+
+def synthetic_result(img, gt_boxes, speed=None, jitter=0.0, rng=None):
+    """Wrap a synthetic frame as a detector output (optionally with box jitter)."""
+    xyxy = gt_boxes[:, :4].copy()
+    if jitter and len(xyxy):
+        rng = rng or np.random.default_rng()
+        xyxy += rng.normal(0, jitter, xyxy.shape).astype(np.float32)
+    n = len(xyxy)
+    return SyntheticResult(img, SyntheticBoxes(xyxy, np.full(n, 0.9), np.zeros(n), gt_boxes[:, 4]), speed)
+
+def synthetic_frames(video, count, inference_ms=0.0, realtime=True, camera_id=None):
+    """
+    Tagged (camera_id, frame_info, result) tuples shaped like YOLOTracker.start(), with the
+    model replaced by ground truth plus an emulated inference delay.
+    """
+    period = 1.0 / video.fps
+    start = time.time()
+    for seq in range(count):
+        if realtime:
+            wait = start + seq * period - time.time()
+            if wait > 0:
+                time.sleep(wait)
+        t0 = time.time()
+        img, gt = video.frame(seq)
+        t1 = time.time()
+        if inference_ms:
+            time.sleep(inference_ms / 1000)
+        speed = {"preprocess": 0.0, "inference": inference_ms, "postprocess": 0.0}
+        frame_info = {
+            "seq": seq,
+            "capture_ts": t0,
+            "decode_ms": (t1 - t0) * 1000,
+            "inference_ms": inference_ms,
+        }
+        yield camera_id, frame_info, synthetic_result(img, gt, speed)
+
+# ---------------------------------------------------------------------------
+# Video files and a local TCP H.264 server
+# ---------------------------------------------------------------------------
+
+def write_video(video, path, count):
+    """Write synthetic frames to a container file OpenCV can read back (MPEG-4 part 2)."""
+    import cv2
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), video.fps, (video.width, video.height))
+    for i in range(count):
+        writer.write(video.frame(i)[0])
+    writer.release()
+    return path
+
+def encode_h264(video, path, count, bitrate=2_000_000, gop=30):
+    """Encode synthetic frames to a raw H.264 Annex-B file, like the RPi encoder output (needs PyAV)."""
+    import av
+    with open(path, "wb") as f:
+        codec = av.CodecContext.create("libx264", "w")
+        codec.width, codec.height = video.width, video.height
+        codec.pix_fmt = "yuv420p"
+        codec.bit_rate = bitrate
+        codec.gop_size = gop
+        codec.framerate = video.fps
+        codec.options = {"preset": "ultrafast", "tune": "zerolatency", "repeat-headers": "1"}
+        for i in range(count):
+            frame = av.VideoFrame.from_ndarray(video.frame(i)[0], format="bgr24")
+            frame.pts = i
+            for packet in codec.encode(frame):
+                f.write(bytes(packet))
+        for packet in codec.encode(None):
+            f.write(bytes(packet))
+    return path
+
+class H264FileServer:
+    """
+    Serves a raw H.264 file to each TCP client at a steady byte rate matching the
+    recorded fps, standing in for the RPi CameraStream.
+    """
+
+    def __init__(self, path, port=0, fps=30, frames=None, loop=False, host="127.0.0.1"):
+        import socket
+        with open(path, "rb") as f:
+            self.data = f.read()
+        self.fps = fps
+        self.frames = frames
+        self.loop = loop
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen()
+        self.host, self.port = self.sock.getsockname()
+        self.url = f"tcp://{self.host}:{self.port}"
+        self.start_time = None
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        duration = (self.frames or self.fps) / self.fps
+        chunk = max(1024, int(len(self.data) / duration / 100))
+        rate = len(self.data) / duration
+        self.start_time = time.time()
+        sent = 0
+        try:
+            while self.running:
+                for offset in range(0, len(self.data), chunk):
+                    if not self.running:
+                        return
+                    conn.sendall(self.data[offset:offset + chunk])
+                    sent += len(self.data[offset:offset + chunk])
+                    wait = self.start_time + sent / rate - time.time()
+                    if wait > 0:
+                        time.sleep(wait)
+                if not self.loop:
+                    return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self.running = False
+        self.sock.close()
@@ -0,0 +1,112 @@
+"""
+Stand-ins for the Raspberry Pi only packages (picamera2, sense_hat) so the RPi modules
+can be imported and exercised on any Linux machine.
+"""
+import sys
+import threading
+import types
+
+class MockStick:
+    def __init__(self):
+        self.pending = []
+        self.cond = threading.Condition()
+
+    def push(self, event):
+        with self.cond:
+            self.pending.append(event)
+            self.cond.notify_all()
+
+    def get_events(self):
+        with self.cond:
+            events, self.pending = self.pending, []
+        return events
+
+    def _wait(self, timeout=None):
+        # Like the real stick's select() on the joystick device
+        with self.cond:
+            return self.cond.wait_for(lambda: bool(self.pending), timeout)
+
+class MockSenseHat:
+    """Counts framebuffer writes so display changes can be measured."""
+
+    def __init__(self):
+        self.pixels = [[0, 0, 0] for _ in range(64)]
+        self.stick = MockStick()
+        self.writes = 0
+        self.pixel_writes = 0
+
+    def clear(self, *colour):
+        self.pixels = [[0, 0, 0] for _ in range(64)]
+        self.writes += 1
+
+    def set_pixel(self, x, y, *colour):
+        colour = colour[0] if len(colour) == 1 else colour
+        self.pixels[y * 8 + x] = list(colour)
+        self.writes += 1
+        self.pixel_writes += 1
+
+    def set_pixels(self, pixel_list):
+        self.pixels = [list(p) for p in pixel_list]
+        self.writes += 1
+
+    def get_pixels(self):
+        return [list(p) for p in self.pixels]
+
+class MockJoystickEvent:
+    def __init__(self, direction, action="pressed", timestamp=0.0):
+        self.direction = direction
+        self.action = action
+        self.timestamp = timestamp
+
+class MockPicamera2:
+    def __init__(self, *args, **kwargs):
+        self.encoders = None
+        self.started = False
+
+    def create_video_configuration(self, main=None, **kwargs):
+        return {"main": main or {}}
+
+    def configure(self, config):
+        self.config = config
+
+    def start_encoder(self, encoder, *args, **kwargs):
+        self.encoder = encoder
+
+    def stop_encoder(self, *args, **kwargs):
+        pass
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        pass
+
+class MockH264Encoder:
+    def __init__(self, bitrate=None, repeat=False, iperiod=None):
+        self.bitrate = bitrate
+        self.output = None
+
+class MockFileOutput:
+    def __init__(self, file=None):
+        self.fileoutput = file
+
+def install():
+    """Register the mock picamera2 and sense_hat modules in sys.modules."""
+    sense_hat = types.ModuleType("sense_hat")
+    sense_hat.SenseHat = MockSenseHat
+    sys.modules.setdefault("sense_hat", sense_hat)
+
+    picamera2 = types.ModuleType("picamera2")
+    picamera2.Picamera2 = MockPicamera2
+    encoders = types.ModuleType("picamera2.encoders")
+    encoders.H264Encoder = MockH264Encoder
+    outputs = types.ModuleType("picamera2.outputs")
+    outputs.FileOutput = MockFileOutput
+    picamera2.encoders = encoders
+    picamera2.outputs = outputs
+    sys.modules.setdefault("picamera2", picamera2)
+    sys.modules.setdefault("picamera2.encoders", encoders)
+    sys.modules.setdefault("picamera2.outputs", outputs)
@@ -0,0 +1,177 @@
+"""
+Record a live session for offline replay (see replay.py): the RPi H.264 stream plus every
+MQTT message on the camera's topics, each with its arrival time.
+
+A recording is a directory:
+    stream.h264    raw H.264 exactly as received
+    stream.jsonl   one line per received chunk: {"ts", "offset", "size"}
+    mqtt.jsonl     one line per message: {"ts", "topic", "payload" (base64 of the raw bytes)}
+    meta.json      start/end time, video URL, topics and the config in use
+
+    python3 source/bench/recorder.py --out recordings/session1 --seconds 60
+    python3 source/bench/recorder.py --out recordings/synthetic --seconds 20 --synthetic
+
+--synthetic records a local session instead of a live one: the RPi stream server plays a
+synthetic H.264 clip, the PC publishes ground-truth detections and the RPi answers, all
+through the in-process broker stand-in.
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import harness
+
+class SessionRecorder:
+    def __init__(self, config, out_dir, video_url, client, camera_id=None):
+        self.config = config
+        self.out_dir = out_dir
+        self.video_url = video_url
+        self.client = client
+        self.topics = harness.load_side("pc", "utils").utils.camera_topics(config, camera_id)
+        self.running = False
+        self.thread = None
+        self.lock = threading.Lock()
+        self.start_ts = None
+        self.stats = {"video_bytes": 0, "messages": 0}
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.start_ts = time.time()
+        self.mqtt_log = open(os.path.join(self.out_dir, "mqtt.jsonl"), "w")
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+        broker = self.config['mqtt']['broker']
+        self.client.connect(broker, self.config['mqtt']['port'], 60)
+        self.client.loop_start()
+
+        self.running = True
+        self.thread = threading.Thread(target=self.video_loop, daemon=True)
+        self.thread.start()
+
+    def on_connect(self, client, userdata, flags, rc):
+        for topic in self.topics.values():
+            client.subscribe(topic)
+
+    def on_message(self, client, userdata, msg):
+        line = json.dumps({"ts": time.time(), "topic": msg.topic,
+                           "payload": base64.b64encode(bytes(msg.payload)).decode()})
+        with self.lock:
+            if self.mqtt_log.closed:
+                return
+            self.mqtt_log.write(line + "\n")
+            self.stats["messages"] += 1
+
+    def video_loop(self):
+        url = urlparse(self.video_url)
+        sock = socket.create_connection((url.hostname, url.port), timeout=5)
+        sock.settimeout(1.0)
+        offset = 0
+        with open(os.path.join(self.out_dir, "stream.h264"), "wb") as stream, \
+                open(os.path.join(self.out_dir, "stream.jsonl"), "w") as index:
+            try:
+                while self.running:
+                    try:
+                        data = sock.recv(65536)
+                    except socket.timeout:
+                        continue
+                    if not data:
+                        print("Video stream closed")
+                        break
+                    stream.write(data)
+                    index.write(json.dumps({"ts": time.time(), "offset": offset, "size": len(data)}) + "\n")
+                    offset += len(data)
+                    self.stats["video_bytes"] = offset
+            finally:
+                sock.close()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        self.client.loop_stop()
+        self.client.disconnect()
+        with self.lock:
+            self.mqtt_log.close()
+        meta = {
+            "start_ts": self.start_ts,
+            "end_ts": time.time(),
+            "video_url": self.video_url,
+            "topics": self.topics,
+            "config": self.config,
+        }
+        with open(os.path.join(self.out_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=4)
+
+def record_synthetic(out_dir, seconds, fps=30):
+    """Run the whole loop locally (mocked Pi modules, in-process broker) and record it."""
+    import tempfile
+    import mocks
+    mocks.install()
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics")
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface", "camera_stream")
+
+    video = harness.SyntheticVideo(fps=fps)
+    frames = int(seconds * fps)
+    with tempfile.TemporaryDirectory() as tmp:
+        clip = harness.encode_h264(video, os.path.join(tmp, "clip.h264"), frames)
+        config = harness.load_config({"video": {"host": "127.0.0.1", "port": 0, "source_file": clip, "fps": fps},
+                                      "latency": {"report_interval": 0}})
+        broker = harness.LocalBroker(delay=0.005)
+
+        camera = rpi.camera_stream.CameraStream(config)
+        ptz = rpi.virtual_ptz.VirtualPTZ(config)
+        sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+        rpi_mqtt = rpi.mqtt_client.MQTTClient(config, client=broker.client())
+        rpi_mqtt.set_callback(lambda topic, payload: rpi.main.process_inference(payload, ptz, sense_hat, rpi_mqtt))
+        pc_mqtt = pc.mqtt_client.MQTTClient(config, client=broker.client())
+        latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0)
+
+        camera.start()
+        recorder = SessionRecorder(config, out_dir, f"tcp://127.0.0.1:{camera.port}", broker.client())
+        recorder.start()
+        rpi_mqtt.start()
+        pc_mqtt.start()
+        pc.main.run(config, harness.synthetic_frames(video, frames), {None: pc_mqtt}, latency, display=False)
+        broker.drain()
+        recorder.stop()
+        pc_mqtt.stop()
+        rpi_mqtt.stop()
+        camera.stop()
+    return recorder
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="recording directory")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--camera-id", help="camera ID (multi-camera setups)")
+    parser.add_argument("--video-url", help="default: tcp://<rpi.ip>:<video.port>")
+    parser.add_argument("--synthetic", action="store_true", help="record a local synthetic session")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        recorder = record_synthetic(args.out, args.seconds)
+        print(f"Recorded {recorder.stats['video_bytes'] / 1e6:.1f} MB of video and "
+              f"{recorder.stats['messages']} messages to {args.out}")
+        return
+
+    import paho.mqtt.client as mqtt
+    config = harness.load_config()
+    url = args.video_url or f"tcp://{config['rpi']['ip']}:{config['video']['port']}"
+    recorder = SessionRecorder(config, args.out, url, mqtt.Client(), args.camera_id)
+    recorder.start()
+    try:
+        time.sleep(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.stop()
+    print(f"Recorded {recorder.stats['video_bytes'] / 1e6:.1f} MB of video and "
+          f"{recorder.stats['messages']} messages to {args.out}")
+
+if __name__ == "__main__":
+    main()
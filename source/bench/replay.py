@@ -0,0 +1,273 @@
+"""
+Replay a recording (see recorder.py) through the pipeline and write a benchmark report.
+
+Stages:
+  * rpi:      recorded inference messages -> in-process broker -> RPi MQTTClient ->
+              process_inference (VirtualPTZ + mocked Sense HAT). Reports handler time and
+              how far the replayed viewports are from the recorded ones (regression check).
+  * pipeline: recorded H.264 -> YOLOTracker -> pc/main.run (headless dashboard) -> broker ->
+              RPi process_inference -> broker -> dashboard. Reports fps and per-hop latency.
+--speed realtime keeps the recorded timing (the pipeline stage serves the stream through
+the RPi CameraStream); --speed fast replays as fast as possible without dropping frames.
+Every report has wall time, throughput, per-stage latency percentiles, CPU and peak memory;
+--report saves it as JSON and --compare prints the difference to an earlier report.
+
+    python3 source/bench/replay.py recordings/session1 --stage rpi --speed fast --report rpi.json
+    python3 source/bench/replay.py recordings/session1 --stage pipeline --model models/yolo26n.pt
+    python3 source/bench/replay.py recordings/session1 --stage rpi --compare rpi.json
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+
+import harness
+import mocks
+
+def load_recording(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "mqtt.jsonl")) as f:
+        messages = [json.loads(line) for line in f if line.strip()]
+    for m in messages:
+        m["payload"] = base64.b64decode(m["payload"])
+    with open(os.path.join(path, "stream.jsonl")) as f:
+        chunks = [json.loads(line) for line in f if line.strip()]
+    return meta, messages, chunks
+
+class Usage:
+    """Wall time, CPU share and peak RSS of a replay run."""
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.rusage = resource.getrusage(resource.RUSAGE_SELF)
+        return self
+
+    def __exit__(self, *exc):
+        end = resource.getrusage(resource.RUSAGE_SELF)
+        self.wall_s = time.perf_counter() - self.wall
+        cpu_s = (end.ru_utime - self.rusage.ru_utime) + (end.ru_stime - self.rusage.ru_stime)
+        self.cpu_percent = cpu_s / self.wall_s * 100 if self.wall_s else 0.0
+        # ru_maxrss is in KiB on Linux
+        self.peak_rss_mb = end.ru_maxrss / 1024
+
+    def report(self):
+        return {"wall_s": self.wall_s, "cpu_percent": self.cpu_percent, "peak_rss_mb": self.peak_rss_mb}
+
+def shifted(payload_codec, raw, offset):
+    """Re-encode a recorded inference payload with its timestamps moved by offset seconds."""
+    if not offset:
+        return raw
+    payload = payload_codec.decode(raw)
+    for key in ("capture_ts", "sent_ts"):
+        if payload.get(key):
+            payload[key] += offset
+    codec = payload_codec.BinaryCodec() if raw[:len(payload_codec.MAGIC)] == payload_codec.MAGIC else payload_codec.JSONCodec()
+    return codec.encode(payload)
+
+def replay_rpi(meta, messages, config, realtime):
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface", "payload_codec")
+    pc = harness.load_side("pc", "metrics")
+    topics = meta["topics"]
+    inference = [m for m in messages if m["topic"] == topics["inference"]]
+    recorded_ptz = {}
+    for m in messages:
+        if m["topic"] == topics["ptz"]:
+            ptz_cmd = json.loads(m["payload"])
+            recorded_ptz[ptz_cmd.get("seq")] = ptz_cmd
+
+    broker = harness.LocalBroker()
+    latency = pc.metrics.LatencyTracker(["broker", "rpi_handler"], report_interval=0)
+    ptz = rpi.virtual_ptz.VirtualPTZ(config)
+    sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+    rpi_mqtt = rpi.mqtt_client.MQTTClient(config, client=broker.client())
+    published = {}
+    replayed = []
+
+    def on_message(topic, payload):
+        start = time.perf_counter()
+        sent, received_ts = published.pop(payload.get("seq"), (time.time(), None))
+        latency.observe("broker", (time.time() - sent) * 1000)
+        ptz_cmd = rpi.main.process_inference(payload, ptz, sense_hat, rpi_mqtt, received_ts)
+        latency.observe("rpi_handler", (time.perf_counter() - start) * 1000)
+        if ptz_cmd:
+            replayed.append(dict(ptz_cmd))
+
+    rpi_mqtt.set_callback(on_message)
+    rpi_mqtt.start()
+    feeder = broker.client()
+
+    with Usage() as usage:
+        t0 = time.time()
+        # Realtime: timestamps move to the replay clock. Fast: they stay as recorded and the
+        # recorded arrival time stands in for the RPi receive time, so the PTZ filters and
+        # latency prediction see the original timing either way.
+        offset = t0 - inference[0]["ts"] if realtime and inference else 0.0
+        for m in inference:
+            if realtime:
+                wait = m["ts"] + offset - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            data = shifted(rpi.payload_codec, m["payload"], offset)
+            published[rpi.payload_codec.decode(data).get("seq")] = (time.time(), None if realtime else m["ts"])
+            feeder.publish(topics["inference"], data)
+        broker.drain(timeout=10)
+    rpi_mqtt.stop()
+
+    # Viewport difference to the recorded run, matched by frame sequence number
+    diffs = []
+    for cmd in replayed:
+        old = recorded_ptz.get(cmd.get("seq"))
+        if old and None not in (old.get("x"), cmd.get("x")):
+            diffs.append([abs((cmd["x"] + cmd["w"] / 2) - (old["x"] + old["w"] / 2)),
+                          abs((cmd["y"] + cmd["h"] / 2) - (old["y"] + old["h"] / 2)),
+                          abs(cmd["w"] - old["w"])])
+    diffs = np.array(diffs).reshape(-1, 3)
+    report = {
+        "stage": "rpi",
+        "messages": len(inference),
+        "throughput": len(replayed) / usage.wall_s,
+        "latency": latency.summary(),
+        "ptz_diff": {
+            "matched": len(diffs),
+            "center_px": float(np.hypot(diffs[:, 0], diffs[:, 1]).mean()) if len(diffs) else 0.0,
+            "width_px": float(diffs[:, 2].mean()) if len(diffs) else 0.0,
+        },
+    }
+    report.update(usage.report())
+    return report
+
+def stream_fps(path, chunks):
+    """Average fps of the recorded stream: frames in the file over the recorded duration."""
+    h264 = harness.load_side("rpi", "h264_source").h264_source
+    with open(path, "rb") as f:
+        frames = sum(1 for _ in h264.access_units(f.read()))
+    duration = chunks[-1]["ts"] - chunks[0]["ts"] if len(chunks) > 1 else 0
+    return frames, (frames / duration if duration > 0 else 30)
+
+def replay_pipeline(meta, chunks, path, config, realtime):
+    pc = harness.load_side("pc", "main", "mqtt_client", "metrics", "yolo_tracker")
+    rpi = harness.load_side("rpi", "main", "mqtt_client", "virtual_ptz", "sense_hat_interface", "camera_stream")
+    stream_path = os.path.join(path, "stream.h264")
+    frames, fps = stream_fps(stream_path, chunks)
+
+    broker = harness.LocalBroker()
+    ptz = rpi.virtual_ptz.VirtualPTZ(config)
+    sense_hat = rpi.sense_hat_interface.SenseHatInterface(config)
+    rpi_mqtt = rpi.mqtt_client.MQTTClient(config, client=broker.client())
+    rpi_mqtt.set_callback(lambda topic, payload: rpi.main.process_inference(payload, ptz, sense_hat, rpi_mqtt))
+    pc_mqtt = pc.mqtt_client.MQTTClient(config, client=broker.client())
+    latency = pc.metrics.LatencyTracker(pc.main.LATENCY_HOPS, report_interval=0)
+    tracker = pc.yolo_tracker.YOLOTracker(config)
+
+    camera = None
+    if realtime:
+        # Served by the RPi stream server at the recorded frame rate, decoded like a live stream
+        camera = rpi.camera_stream.CameraStream(dict(config, video=dict(config['video'], host="127.0.0.1", port=0,
+                                                                         source_file=stream_path, fps=fps)))
+        camera.source.loop = False
+        camera.start()
+        source = f"tcp://127.0.0.1:{camera.port}"
+
+        def close_at_end():
+            # Closing the server when the recording is played out ends the stream for the PC
+            camera.source.thread.join()
+            time.sleep(0.5)
+            camera.stop()
+        threading.Thread(target=close_at_end, daemon=True).start()
+    else:
+        source = stream_path
+
+    rpi_mqtt.start()
+    pc_mqtt.start()
+    try:
+        with Usage() as usage:
+            stream = tracker.start({None: source}, realtime=False, drop=realtime)
+            stats = pc.main.run(config, stream, {None: pc_mqtt}, latency, display=False, tracker=tracker)
+            broker.drain()
+    finally:
+        tracker.stop()
+        pc_mqtt.stop()
+        rpi_mqtt.stop()
+        if camera:
+            camera.stop()
+
+    report = {
+        "stage": "pipeline",
+        "frames": stats["frames"],
+        "recorded_frames": frames,
+        "dropped": stats["dropped"],
+        "throughput": stats["frames"] / usage.wall_s,
+        "latency": latency.summary(),
+    }
+    report.update(usage.report())
+    return report
+
+def format_report(report, baseline=None):
+    def delta(value, key, *path):
+        if baseline is None:
+            return ""
+        old = baseline
+        for p in path + (key,):
+            old = old.get(p, {}) if isinstance(old, dict) else {}
+        if not isinstance(old, (int, float)) or not old:
+            return ""
+        return f" ({(value - old) / old * 100:+.0f}%)"
+
+    lines = [f"stage {report['stage']}: " + ", ".join(
+        f"{k}={report[k]:.1f}{delta(report[k], k)}" if isinstance(report[k], float) else f"{k}={report[k]}"
+        for k in ("throughput", "wall_s", "cpu_percent", "peak_rss_mb") if k in report)]
+    for k in ("frames", "recorded_frames", "dropped", "messages"):
+        if k in report:
+            lines.append(f"  {k}: {report[k]}")
+    if "ptz_diff" in report:
+        d = report["ptz_diff"]
+        lines.append(f"  viewport vs recording: {d['matched']} matched, center {d['center_px']:.1f} px, width {d['width_px']:.1f} px")
+    lines.append(f"  {'hop':<12}{'count':>8}{'p50':>16}{'p95':>16}{'p99':>16}  (ms)")
+    for hop, s in report["latency"].items():
+        if not s["count"]:
+            continue
+        cells = "".join(f"{s[p]:>8.1f}{delta(s[p], p, 'latency', hop):>8}" for p in ("p50", "p95", "p99"))
+        lines.append(f"  {hop:<12}{s['count']:>8}{cells}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="recording directory")
+    parser.add_argument("--stage", choices=("rpi", "pipeline"), default="rpi")
+    parser.add_argument("--speed", choices=("realtime", "fast"), default="fast")
+    parser.add_argument("--model", help="override ai.model_path (pipeline stage)")
+    parser.add_argument("--report", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    mocks.install()
+    meta, messages, chunks = load_recording(args.recording)
+    # The recorded config, minus anything tied to the original hosts
+    config = meta["config"]
+    config['latency'] = dict(config.get('latency', {}), report_interval=0)
+    config['ai'] = dict(config['ai'], **({"model_path": args.model} if args.model else {}))
+    realtime = args.speed == "realtime"
+
+    if args.stage == "rpi":
+        report = replay_rpi(meta, messages, config, realtime)
+    else:
+        report = replay_pipeline(meta, chunks, args.recording, config, realtime)
+    report["speed"] = args.speed
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
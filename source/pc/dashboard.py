@@ -0,0 +1,295 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_ring import FrameRing
+from metrics import registry
+
+WINDOW_NAME = "RPi Virtual PTZ - Dashboard"
+HEADER_H = 40
+PTZ_COLOR = (0, 0, 255)
+
+_id_colors = {}
+
+def id_color(track_id):
+    """Stable BGR color per track ID."""
+    if track_id is None or track_id < 0:
+        return (255, 128, 0)
+    if track_id not in _id_colors:
+        hue = (track_id * 47) % 180
+        _id_colors[track_id] = tuple(int(c) for c in cv2.cvtColor(np.uint8([[[hue, 200, 255]]]), cv2.COLOR_HSV2BGR)[0, 0])
+    return _id_colors[track_id]
+
+class Dashboard:
+    """
+    Composes the side-by-side dashboard into one preallocated buffer.
+    The system view and PTZ view are sub-views of the output, so boxes, HUD and the resized
+    PTZ crop are drawn straight into place and nothing full-frame is allocated per frame.
+    With grid=(columns, rows) a panel of 9:16 tiles follows the PTZ view, one per
+    multi-target viewport.
+    """
+
+    def __init__(self, width, height, grid=None):
+        self.W, self.H = width, height
+        # PTZ view keeps a 9:16 (vertical) aspect ratio
+        self.ptz_W = int(height * 9 / 16)
+        self.grid = grid
+        grid_W = 0
+        if grid:
+            self.tile_H = height // grid[1]
+            self.tile_W = int(self.tile_H * 9 / 16)
+            grid_W = self.tile_W * grid[0]
+        self.canvas = np.zeros((height, width + self.ptz_W + grid_W, 3), dtype=np.uint8)
+        self.full_view = self.canvas[:, :width]
+        self.ptz_view = self.canvas[:, width:width + self.ptz_W]
+        self.grid_view = self.canvas[:, width + self.ptz_W:]
+        self.header = self.canvas[:HEADER_H]
+
+        # Pre-rendered placeholder shown until the first PTZ state arrives
+        self.waiting = np.zeros_like(self.ptz_view)
+        cv2.putText(self.waiting, "WAITING", (self.ptz_W//10, height//2),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (100, 100, 100), 2)
+
+    def compose(self, image, detections, ptz_state):
+        if image.shape[:2] != (self.H, self.W):
+            image = cv2.resize(image, (self.W, self.H))
+        np.copyto(self.full_view, image)
+
+        self.draw_detections(detections)
+        if self.grid:
+            self.draw_grid(image, ptz_state)
+        if not self.draw_ptz(image, ptz_state):
+            np.copyto(self.ptz_view, self.waiting)
+
+        # Darken only the header strip, then add the labels
+        cv2.addWeighted(self.header, 0.5, self.header, 0.0, 0, dst=self.header)
+        cv2.putText(self.canvas, "SYSTEM VIEW", (15, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(self.canvas, "PTZ VIEW", (self.W + 15, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        if self.grid:
+            cv2.putText(self.canvas, "TARGETS", (self.W + self.ptz_W + 15, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        return self.canvas
+
+    def draw_detections(self, detections):
+        if detections is None or not len(detections):
+            return
+        ids = detections.ids.tolist() if detections.ids is not None else [None] * len(detections)
+        for (x1, y1, x2, y2), conf, track_id in zip(detections.boxes.astype(int).tolist(), detections.conf.tolist(), ids):
+            color = id_color(track_id)
+            cv2.rectangle(self.full_view, (x1, y1), (x2, y2), color, 2)
+            label = f"id:{track_id} person {conf:.2f}" if track_id is not None and track_id >= 0 else f"person {conf:.2f}"
+            (lw, lh), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+            cv2.rectangle(self.full_view, (x1, max(0, y1 - lh - 8)), (x1 + lw + 6, y1), color, -1)
+            cv2.putText(self.full_view, label, (x1 + 3, max(lh, y1 - 5)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+    def draw_ptz(self, image, ptz_state):
+        """Draw the PTZ viewport on the system view and its crop into the PTZ slot."""
+        if not ptz_state:
+            return False
+        x, y, w, h = ptz_state.get('x'), ptz_state.get('y'), ptz_state.get('w'), ptz_state.get('h')
+        if any(v is None for v in [x, y, w, h]):
+            return False
+
+        # Calculate coordinates and ensure they are within frame boundaries
+        x1, y1 = max(0, int(x)), max(0, int(y))
+        x2, y2 = min(self.W, int(x + w)), min(self.H, int(y + h))
+        if x2 <= x1 or y2 <= y1:
+            return False
+
+        # Resize the crop of the clean frame straight into the PTZ slot
+        cv2.resize(image[y1:y2, x1:x2], (self.ptz_W, self.H), dst=self.ptz_view)
+
+        # Draw PTZ region rectangle on full frame (YOLO style)
+        cv2.rectangle(self.full_view, (x1, y1), (x2, y2), PTZ_COLOR, 3)
+        label = "PTZ VIEWPORT"
+        (lw, lh), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+        cv2.rectangle(self.full_view, (x1 - 1, y1 - lh - 12), (x1 + lw + 10, y1), PTZ_COLOR, -1)
+        cv2.putText(self.full_view, label, (x1 + 4, y1 - 7),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+        return True
+
+    def draw_grid(self, image, ptz_state):
+        """
+        One tile per multi-target viewport, in the order published (by track ID); the primary
+        tile is framed in the PTZ color. The viewports are also outlined on the system view.
+        """
+        viewports = (ptz_state or {}).get('viewports') or {}
+        ids, boxes = viewports.get('ids', []), viewports.get('boxes', [])
+        columns, rows = self.grid
+        self.grid_view[:] = 0
+        primary = ptz_state.get('target_id') if ptz_state else None
+        for i, (track_id, (x, y, w, h)) in enumerate(zip(ids[:columns * rows], boxes)):
+            x1, y1 = max(0, x), max(0, y)
+            x2, y2 = min(self.W, x + w), min(self.H, y + h)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            row, column = divmod(i, columns)
+            tile = self.grid_view[row * self.tile_H:(row + 1) * self.tile_H, column * self.tile_W:(column + 1) * self.tile_W]
+            cv2.resize(image[y1:y2, x1:x2], (self.tile_W, self.tile_H), dst=tile)
+            color = PTZ_COLOR if track_id == primary else id_color(track_id)
+            cv2.rectangle(tile, (0, 0), (self.tile_W - 1, self.tile_H - 1), color, 3 if track_id == primary else 1)
+            cv2.putText(tile, f"id:{track_id}", (6, self.tile_H - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+            if track_id != primary:
+                cv2.rectangle(self.full_view, (x1, y1), (x2, y2), color, 1)
+
+class DashboardRenderer:
+    """
+    Renders the dashboard on its own thread so drawing and display never stall inference.
+    The inference loop submits frames into a short ring; the renderer draws the newest frame
+    whose PTZ reply has arrived (matched by sequence number), or the newest frame otherwise.
+    A viewport the RPi predicted forward (lead_ms) is drawn on the newest frame, carried on
+    by the target's velocity from the lead to that frame's capture time.
+    With an MJPEGServer the composed dashboard and the PTZ view are offered to it as the
+    views <view_prefix>dashboard and <view_prefix>ptz.
+    """
+
+    def __init__(self, config, latency=None, display=True, window_name=WINDOW_NAME, mjpeg=None, view_prefix=""):
+        self.W, self.H = config['video']['resolution']
+        multi = config.get('ptz', {}).get('multi', {})
+        self.grid = None
+        if multi.get('enabled', False):
+            columns = multi.get('grid_columns', 3)
+            # max_targets 0 (all) shows as many as fit a 2-row grid
+            self.grid = (columns, -(-(multi.get('max_targets', 6) or 2 * columns) // columns))
+        self.window_name = window_name
+        self.ring = FrameRing(config.get('latency', {}).get('frame_ring_size', 15))
+        self.latency = latency
+        self.max_lead = config.get('ptz', {}).get('max_lead_ms', 500) / 1000
+        self.display = display
+        self.dashboard = None
+        self.ptz_state = {}
+        self.cond = threading.Condition()
+        self.pending = False
+        self.running = False
+        self.quit = False
+        self.thread = None
+        self.last_rendered_seq = None
+        self.encoding = None
+        self.stats = {"rendered": 0, "matched": 0}
+        self.render_ms = registry.histogram("render_ms", window=window_name)
+        self.mjpeg = mjpeg
+        self.views = (view_prefix + "dashboard", view_prefix + "ptz")
+        if mjpeg:
+            # Listed by the server before the first frame arrives
+            for view in self.views:
+                mjpeg.feed(view)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.render_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join()
+        if self.display:
+            cv2.destroyAllWindows()
+
+    def submit(self, frame_info, image, detections):
+        self.ring.push(frame_info["seq"], (frame_info, image, detections))
+        with self.cond:
+            self.pending = True
+            self.cond.notify()
+
+    def set_ptz(self, ptz_state):
+        with self.cond:
+            self.ptz_state = ptz_state
+            self.pending = True
+            self.cond.notify()
+
+    def set_encoding(self, params):
+        """Encoding params published by the RPi; the dashboard follows resolution changes."""
+        if params != self.encoding:
+            print(f"{self.window_name}: stream is {params['resolution'][0]}x{params['resolution'][1]} "
+                  f"@ {params['bitrate'] / 1e6:.2f} Mbps")
+        self.encoding = params
+
+    def render_loop(self):
+        while self.running:
+            with self.cond:
+                if not self.pending:
+                    # Wake up periodically to keep the window responsive
+                    self.cond.wait(0.01 if self.display else 0.1)
+                if not self.running:
+                    break
+                has_work = self.pending
+                self.pending = False
+                state = self.ptz_state
+
+            if has_work:
+                self.render_once(state)
+
+            # Break the loop if 'q' is pressed
+            if self.display and cv2.waitKey(1) & 0xFF == ord("q"):
+                self.quit = True
+
+    def extrapolate(self, state, capture_ts):
+        """
+        Move the viewports (predicted for their frame's capture_ts + lead_ms) on to a frame
+        captured at capture_ts, by the velocities the RPi sent. Both timestamps are PC clock.
+        """
+        if state.get('velocity') is None or state.get('capture_ts') is None:
+            return state
+        dt = min(max(capture_ts - state['capture_ts'], 0.0), self.max_lead) - (state.get('lead_ms') or 0) / 1000
+        if not dt:
+            return state
+
+        def move(x, y, w, h, velocity):
+            x = max(0, min(int(x + velocity[0] * dt), self.W - int(w)))
+            y = max(0, min(int(y + velocity[1] * dt), self.H - int(h)))
+            return x, y
+
+        state = dict(state)
+        state['x'], state['y'] = move(state['x'], state['y'], state['w'], state['h'], state['velocity'])
+        viewports = state.get('viewports')
+        if viewports and viewports.get('velocity'):
+            boxes = [[*move(*box, velocity), box[2], box[3]] for box, velocity in zip(viewports['boxes'], viewports['velocity'])]
+            state['viewports'] = dict(viewports, boxes=boxes)
+        return state
+
+    def render_once(self, state):
+        # Draw the viewport on the frame it was computed from, unless the RPi already
+        # predicted it forward (then it is aimed at the newest frame)
+        entry = None
+        if state.get('seq') is not None and not state.get('lead_ms'):
+            entry = self.ring.get(state['seq'])
+        matched = entry is not None
+        if not matched:
+            # Matching frame unknown or already gone: fall back to the newest frame
+            entry = self.ring.latest()
+            if entry is None:
+                return
+
+        frame_info, image, detections = entry
+        if frame_info["seq"] == self.last_rendered_seq:
+            return
+
+        render_start = time.time()
+        if self.dashboard is None or image.shape[:2] != (self.H, self.W):
+            # First frame, or the RPi changed the stream resolution
+            self.H, self.W = image.shape[:2]
+            self.dashboard = Dashboard(self.W, self.H, self.grid)
+        if not matched and state:
+            state = self.extrapolate(state, frame_info["capture_ts"])
+        canvas = self.dashboard.compose(image, detections, state)
+        if self.display:
+            # Display the final composed window
+            cv2.imshow(self.window_name, canvas)
+        if self.mjpeg:
+            self.mjpeg.offer(self.views[0], canvas)
+            self.mjpeg.offer(self.views[1], self.dashboard.ptz_view)
+        now = time.time()
+        self.render_ms.observe((now - render_start) * 1000)
+        if self.latency:
+            self.latency.observe("render", (now - render_start) * 1000)
+            self.latency.observe("end_to_end", (now - frame_info["capture_ts"]) * 1000)
+        self.last_rendered_seq = frame_info["seq"]
+        self.stats["rendered"] += 1
+        if matched:
+            self.stats["matched"] += 1
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+
+class FlowPropagator:
+    """
+    Moves the boxes of the last detection to the next frame with sparse Lucas-Kanade optical
+    flow: corners inside each box are tracked forward (and back, to reject bad matches), and
+    the box is shifted by their median motion and scaled by the median change in spread.
+    Costs a few milliseconds per frame, versus a full model call.
+    """
+
+    def __init__(self, max_points=20, min_points=4, fb_threshold=1.0):
+        self.max_points = max_points
+        self.min_points = min_points
+        self.fb_threshold = fb_threshold
+        self.lk_params = dict(winSize=(21, 21), maxLevel=3,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self.gray = None
+        self.boxes = np.zeros((0, 4), np.float32)
+
+    @staticmethod
+    def to_gray(image):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+    def reset(self, image, boxes):
+        """Start from a fresh detection: boxes is an (N, 4) xyxy array on image."""
+        self.gray = self.to_gray(image)
+        self.boxes = np.asarray(boxes, np.float32).reshape(-1, 4)
+
+    def box_points(self, box):
+        H, W = self.gray.shape
+        x1, y1, x2, y2 = (int(v) for v in np.clip(box, 0, [W, H, W, H]))
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return np.zeros((0, 2), np.float32)
+        corners = cv2.goodFeaturesToTrack(self.gray[y1:y2, x1:x2], self.max_points, 0.01, 3)
+        if corners is None:
+            return np.zeros((0, 2), np.float32)
+        return corners.reshape(-1, 2) + np.float32([x1, y1])
+
+    def propagate(self, image):
+        """
+        Move the boxes to image. Returns (boxes, ok) where ok flags the boxes that kept enough
+        good points; the others keep their previous position.
+        """
+        gray = self.to_gray(image)
+        boxes = self.boxes.copy()
+        ok = np.zeros(len(boxes), bool)
+        if self.gray is None or not len(boxes):
+            self.gray = gray
+            return boxes, ok
+
+        points = [self.box_points(b) for b in self.boxes]
+        owner = np.concatenate([np.full(len(p), i) for i, p in enumerate(points)])
+        points = np.concatenate(points).astype(np.float32)
+        if len(points):
+            # One forward and one backward LK call for the points of all boxes
+            forward, status, _ = cv2.calcOpticalFlowPyrLK(self.gray, gray, points, None, **self.lk_params)
+            backward, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.gray, forward, None, **self.lk_params)
+            good = (status.ravel() == 1) & (status_back.ravel() == 1)
+            good &= np.linalg.norm(backward - points, axis=1) < self.fb_threshold
+
+            for i in range(len(boxes)):
+                sel = good & (owner == i)
+                if sel.sum() < self.min_points:
+                    continue
+                old, new = points[sel], forward[sel]
+                shift = np.median(new - old, axis=0)
+                spread_old = np.linalg.norm(old - np.median(old, axis=0), axis=1)
+                spread_new = np.linalg.norm(new - np.median(new, axis=0), axis=1)
+                valid = spread_old > 1
+                scale = np.median(spread_new[valid] / spread_old[valid]) if valid.sum() >= 2 else 1.0
+                scale = float(np.clip(scale, 0.8, 1.25))
+
+                center = (boxes[i, :2] + boxes[i, 2:]) / 2 + shift
+                half = (boxes[i, 2:] - boxes[i, :2]) / 2 * scale
+                boxes[i] = np.concatenate([center - half, center + half])
+                ok[i] = True
+
+        self.gray = gray
+        self.boxes = boxes
+        return boxes, ok
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from metrics import registry
+
+class FrameGrabber:
+    """
+    Capture/decode stage running on its own thread.
+    Only the freshest decoded frames are kept (bounded buffer, oldest dropped first), so a
+    slow consumer always gets a recent frame instead of draining a backlog.
+    Accepts anything cv2.VideoCapture can open: tcp://host:port H.264 streams or local files.
+    With drop=False the capture thread waits for room instead (offline replay of every frame).
+    Opening and reading give up after open_timeout / read_timeout seconds, so a stalled
+    stream cannot hold the capture thread (and stop()) forever.
+    """
+
+    def __init__(self, source, buffer_size=1, realtime=None, notify=None, drop=True,
+                 read_timeout=2.0, open_timeout=10.0):
+        self.source = source
+        # Optional threading.Event shared by several grabbers, set on every new frame
+        self.notify = notify
+        self.buffer = deque(maxlen=max(1, int(buffer_size)))
+        # Local files are paced at their native fps to behave like a live camera
+        self.realtime = os.path.isfile(str(source)) if realtime is None else realtime
+        self.drop = drop
+        self.read_timeout = read_timeout
+        self.open_timeout = open_timeout
+        self.cond = threading.Condition()
+        self.running = False
+        self.ended = False
+        self.thread = None
+        self.captured = 0
+        self.dropped = 0
+        self.decode_ms = registry.histogram("decode_ms", source=source)
+        self.captured_total = registry.counter("frames_captured_total", source=source)
+        self.dropped_total = registry.counter("frames_dropped_total", source=source)
+        self.queue_depth = registry.gauge("capture_queue_depth", source=source)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.capture_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread:
+            # The capture thread notices stop after its current open or read, which time out
+            self.thread.join(max(self.open_timeout, self.read_timeout) + 1.0)
+            if self.thread.is_alive():
+                print(f"Capture thread for {self.source} did not stop, leaving it behind")
+
+    def capture_loop(self):
+        try:
+            for image, capture_ts, decode_ms in self.decode():
+                self.push(image, capture_ts, decode_ms)
+        except Exception as e:
+            print(f"Capture error: {e}")
+        finally:
+            with self.cond:
+                self.ended = True
+                self.cond.notify_all()
+            if self.notify:
+                self.notify.set()
+
+    def decode(self):
+        """Yield (image, capture_ts, decode_ms) until the source ends or the grabber stops."""
+        print(f"Opening video source {self.source}")
+        cap = cv2.VideoCapture(self.source, cv2.CAP_ANY, [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000)])
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not cap.isOpened():
+            print(f"Failed to open video source {self.source}")
+        period = 0.0
+        if self.realtime:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            period = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        next_due = time.monotonic()
+
+        try:
+            while self.running and cap.isOpened():
+                if period:
+                    wait = next_due - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                    next_due += period
+
+                start = time.time()
+                ok, image = cap.read()
+                if not ok:
+                    break
+                now = time.time()
+                yield image, now, (now - start) * 1000
+        finally:
+            cap.release()
+
+    def push(self, image, capture_ts, decode_ms):
+        frame = {
+            "seq": self.captured,
+            "capture_ts": capture_ts,
+            "decode_ms": decode_ms,
+            "image": image,
+        }
+        with self.cond:
+            if not self.drop:
+                self.cond.wait_for(lambda: len(self.buffer) < self.buffer.maxlen or not self.running)
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+                self.dropped_total.inc()
+            self.buffer.append(frame)
+            self.captured += 1
+            self.queue_depth.set(len(self.buffer))
+            self.cond.notify()
+        self.decode_ms.observe(decode_ms)
+        self.captured_total.inc()
+        if self.notify:
+            self.notify.set()
+
+    def read(self, timeout=None):
+        """Return the oldest buffered frame (the freshest one with the default buffer of 1), or None once the source ended."""
+        with self.cond:
+            while not self.buffer:
+                if self.ended or not self.running:
+                    return None
+                if not self.cond.wait(timeout):
+                    return None
+            frame = self.buffer.popleft()
+            self.queue_depth.set(len(self.buffer))
+            self.cond.notify_all()
+            return frame
+
+    def poll(self):
+        """Return a buffered frame without waiting, or None."""
+        with self.cond:
+            if not self.buffer:
+                return None
+            frame = self.buffer.popleft()
+            self.queue_depth.set(len(self.buffer))
+            self.cond.notify_all()
+            return frame
+
+    @property
+    def finished(self):
+        """True once the source ended (or the grabber stopped) and no frame is left."""
+        with self.cond:
+            return (self.ended or not self.running) and not self.buffer
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
@@ -0,0 +1,29 @@
+import threading
+from collections import OrderedDict
+
+class FrameRing:
+    """Bounded store of the most recent frames keyed by sequence number."""
+
+    def __init__(self, size):
+        self.size = max(1, int(size))
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def push(self, seq, item):
+        with self.lock:
+            self.frames[seq] = item
+            while len(self.frames) > self.size:
+                self.frames.popitem(last=False)
+
+    def get(self, seq):
+        with self.lock:
+            return self.frames.get(seq)
+
+    def latest(self):
+        with self.lock:
+            if not self.frames:
+                return None
+            return next(reversed(self.frames.values()))
+
+    def __len__(self):
+        return len(self.frames)
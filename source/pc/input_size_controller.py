@@ -0,0 +1,97 @@
+from metrics import registry
+
+class InputSizeController:
+    """
+    Picks the model input size from a ladder (largest first) for each full-frame detection:
+      * over budget: the measured inference time (EWMA at the current size) is above
+        budget_ms (default: one source frame interval) -> next smaller size
+      * target large enough: the PTZ target would still be at least target_px tall at the
+        next smaller size -> next smaller size, to save compute
+      * target too small (or no target to follow) and the next larger size is expected to
+        fit the budget with headroom -> next larger size
+    A move needs down_after (smaller) or up_after (larger) consecutive decisions the same
+    way, and the target thresholds have a hysteresis band, so the size does not flap.
+    The times of the other sizes follow the current one as the load changes; a size not yet
+    measured is estimated from the nearest measured one, scaled by the pixel count.
+    A conf_thresholds list (one per size) changes the confidence threshold with the size.
+    """
+
+    def __init__(self, config):
+        ai = config['ai']
+        adaptive = ai.get('adaptive_size', {})
+        self.enabled = adaptive.get('enabled', False)
+        sizes = adaptive.get('sizes') or [ai['input_size']]
+        confs = adaptive.get('conf_thresholds') or [ai['conf_threshold']] * len(sizes)
+        ladder = sorted(zip(sizes, confs), reverse=True)
+        self.sizes = [s for s, _ in ladder]
+        self.confs = [c for _, c in ladder]
+        budget = adaptive.get('budget_ms')
+        self.budget_ms = budget if budget else 1000.0 / config['video'].get('fps', 30)
+        self.headroom = adaptive.get('headroom', 0.8)
+        self.target_px = adaptive.get('target_px', 128)
+        self.hysteresis = adaptive.get('hysteresis', 0.25)
+        self.down_after = adaptive.get('down_after', 3)
+        self.up_after = adaptive.get('up_after', 30)
+        # Start at the configured size (or the closest rung)
+        self.rung = min(range(len(self.sizes)), key=lambda i: abs(self.sizes[i] - ai['input_size']))
+        self.ms = [None] * len(self.sizes)
+        self.pending = 0
+        self.streak = 0
+        self.changes = 0
+        self.size_gauge = registry.gauge("input_size")
+
+    @property
+    def size(self):
+        return self.sizes[self.rung]
+
+    @property
+    def conf(self):
+        return self.confs[self.rung]
+
+    def estimate(self, rung):
+        """Expected inference ms at a rung: measured, or scaled from the nearest measured one."""
+        if self.ms[rung] is not None:
+            return self.ms[rung]
+        measured = [i for i, ms in enumerate(self.ms) if ms is not None]
+        if not measured:
+            return None
+        nearest = min(measured, key=lambda i: abs(i - rung))
+        return self.ms[nearest] * (self.sizes[rung] / self.sizes[nearest]) ** 2
+
+    def observe(self, inference_ms, target_h=None, frame_size=None):
+        """
+        One full-frame model call at the current size; target_h is the PTZ target's height
+        in pixels in a frame whose longer side is frame_size (None: no target). Returns the
+        size for the next call.
+        """
+        if not self.enabled:
+            return self.size
+        ms = self.ms[self.rung]
+        self.ms[self.rung] = inference_ms if ms is None else ms + 0.2 * (inference_ms - ms)
+        if ms:
+            # Load affects every size alike: the other sizes' times follow, keeping their ratios
+            scale = self.ms[self.rung] / ms
+            self.ms = [m if m is None or i == self.rung else m * scale for i, m in enumerate(self.ms)]
+
+        # Target height at a rung's input size (letterboxed on the longer side)
+        at = (lambda rung: target_h * self.sizes[rung] / frame_size) if target_h and frame_size else None
+        smaller, larger = self.rung + 1, self.rung - 1
+        want = 0
+        if self.ms[self.rung] > self.budget_ms:
+            want = 1 if smaller < len(self.sizes) else 0
+        elif smaller < len(self.sizes) and at and at(smaller) >= self.target_px * (1 + self.hysteresis):
+            want = 1
+        elif larger >= 0 and (not at or at(self.rung) < self.target_px * (1 - self.hysteresis)) \
+                and self.estimate(larger) <= self.budget_ms * self.headroom:
+            want = -1
+
+        if want and want == self.pending:
+            self.streak += 1
+        else:
+            self.pending, self.streak = want, 1 if want else 0
+        if want and self.streak >= (self.down_after if want > 0 else self.up_after):
+            self.rung += want
+            self.pending = self.streak = 0
+            self.changes += 1
+            self.size_gauge.set(self.size)
+        return self.size
@@ -0,0 +1,46 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from virtual_ptz import VirtualPTZ
+
+class LocalPTZ:
+    """
+    Local PTZ mode: one VirtualPTZ per camera runs on the PC on every result, so the crop is
+    drawn without the MQTT round trip through the RPi. Joystick input arrives from the RPi as
+    control messages.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.ptz = {}
+        self.lock = threading.Lock()
+
+    def get(self, camera_id):
+        if camera_id not in self.ptz:
+            ptz = self.ptz[camera_id] = VirtualPTZ(self.config)
+            # Drawn on the frame it was computed from: there is no round trip to lead
+            ptz.predict_latency = False
+        return self.ptz[camera_id]
+
+    def update(self, camera_id, detections, frame_info):
+        """PTZ state for one result, with the same frame correlation fields the RPi adds."""
+        with self.lock:
+            ptz = self.get(camera_id)
+            now = time.time()
+            ptz_cmd = ptz.update(detections, frame_info.get("capture_ts"), None, now)
+        ptz_cmd["seq"] = frame_info.get("seq")
+        ptz_cmd["capture_ts"] = frame_info.get("capture_ts")
+        ptz_cmd["received_ts"] = now
+        ptz_cmd["sent_ts"] = time.time()
+        return ptz_cmd
+
+    def handle_control(self, camera_id, payload):
+        """Joystick event forwarded by the RPi ({"direction", "action"})."""
+        event = SimpleNamespace(direction=payload.get("direction"), action=payload.get("action", "pressed"))
+        with self.lock:
+            self.get(camera_id).handle_input(event)
+
+    def set_resolution(self, camera_id, resolution):
+        with self.lock:
+            self.get(camera_id).resolution = list(resolution)
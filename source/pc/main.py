@@ -1,105 +1,218 @@
-import cv2
-import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from yolo_tracker import YOLOTracker
 from mqtt_client import MQTTClient
-from utils import load_config
+from dashboard import DashboardRenderer, WINDOW_NAME
+from metrics import LatencyTracker, MetricsExporter, registry
+from local_ptz import LocalPTZ
+from mjpeg_server import MJPEGServer
+from ptz_recorder import PTZRecorder
+from payload_codec import Detections
+from utils import load_config, camera_sources
 
-def main():
-    print("Starting remote PC edge AI system...")
-    
-    config = load_config()
-    if not config:
-        return
+LATENCY_HOPS = ["decode", "inference", "mqtt_out", "ptz", "mqtt_back", "render", "end_to_end"]
+
+class StartupClock:
+    """Startup phase durations and the time from process start to each camera's first PTZ frame."""
+
+    def __init__(self, started=None):
+        self.started = started or time.time()
+        self.first_ptz = {}
 
-    # Initialize video capture
-    source = f"tcp://{config['rpi']['ip']}:{config['video']['port']}"
+    def phase(self, name, ms):
+        registry.gauge("startup_ms", phase=name).set(ms)
 
-    tracker = YOLOTracker(config)
-    mqtt = MQTTClient(config)
+    def ptz_frame(self, camera_id):
+        if camera_id in self.first_ptz:
+            return
+        ms = self.first_ptz[camera_id] = (time.time() - self.started) * 1000
+        registry.gauge("time_to_first_ptz_ms", camera=camera_id).set(ms)
+        print(f"First PTZ frame{'' if camera_id is None else f' from {camera_id}'} {ms:.0f} ms after startup")
 
-    ptz_state = {}
+def start_up(config, tracker, sources, mqtt_clients, clock):
+    """
+    Load and warm up the model while the MQTT clients connect and the capture threads open
+    the streams, then announce ready on every camera's ready topic; the RPis start their
+    encoders on it, so the first frames are not queued behind a cold model.
+    Returns the tracker's frame generator.
+    """
+    def load_model():
+        start = time.perf_counter()
+        tracker.load()
+        clock.phase("model_load", (time.perf_counter() - start) * 1000)
+        if config.get('startup', {}).get('warmup', True):
+            clock.phase("warmup", tracker.warmup(batch_size=len(sources)))
 
+    def connect():
+        start = time.perf_counter()
+        for mqtt in mqtt_clients.values():
+            mqtt.start()
+        clock.phase("mqtt_connect", (time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        loading = pool.submit(load_model)
+        connecting = pool.submit(connect)
+        frames = tracker.start(sources)
+        loading.result()
+        connecting.result()
+
+    ready_ms = (time.time() - clock.started) * 1000
+    clock.phase("ready", ready_ms)
+    print(f"Ready after {ready_ms:.0f} ms")
+    for mqtt in mqtt_clients.values():
+        mqtt.publish_ready(True, input_size=tracker.input_size)
+    return frames
+
+def ptz_handler(mqtt, renderer, latency, tracker=None, local_ptz=None, clock=None, recorder=None):
     def on_mqtt_message(topic, payload):
-        nonlocal ptz_state
-        if topic == config['mqtt']['topics']['ptz']:
-            ptz_state = payload
+        if topic == mqtt.topics.get('encoding'):
+            renderer.set_encoding(payload)
+            if local_ptz:
+                local_ptz.set_resolution(mqtt.camera_id, payload['resolution'])
+        elif topic == mqtt.topics.get('control'):
+            if local_ptz:
+                local_ptz.handle_control(mqtt.camera_id, payload)
+        elif topic == mqtt.topics['ptz'] and not local_ptz:
+            # In local PTZ mode this is our own mirror coming back
+            now = time.time()
+            renderer.set_ptz(payload)
+            if recorder:
+                recorder.set_ptz(mqtt.camera_id, payload)
+            if clock:
+                clock.ptz_frame(mqtt.camera_id)
+            if tracker:
+                # The PTZ viewport steers ROI-focused inference
+                tracker.set_roi(mqtt.camera_id, payload)
+            # Cross-host hops assume the PC and RPi clocks are NTP-synced
+            if payload.get('received_ts') is not None:
+                if payload.get('inference_sent_ts') is not None:
+                    latency.observe("mqtt_out", (payload['received_ts'] - payload['inference_sent_ts']) * 1000)
+                if payload.get('sent_ts') is not None:
+                    latency.observe("ptz", (payload['sent_ts'] - payload['received_ts']) * 1000)
+            if payload.get('sent_ts') is not None:
+                latency.observe("mqtt_back", (now - payload['sent_ts']) * 1000)
+    return on_mqtt_message
 
-    mqtt.set_callback(on_mqtt_message)
+def run(config, frames, mqtt_clients, latency, display=True, tracker=None, local_ptz=None, clock=None, mjpeg=None,
+        recorder=None):
+    """
+    Publish every tagged result on its camera's topics and hand it to that camera's
+    dashboard renderer thread. mqtt_clients maps camera ID -> MQTTClient; PTZ replies are
+    fed back to the tracker (if given) for ROI inference.
+    The renderer draws the PTZ crop on the frame it was computed from (looked up by
+    sequence number in a short ring of recent frames) instead of on whatever frame is newest.
+    With local_ptz (LocalPTZ) the PTZ is computed here on every result and only mirrored to
+    MQTT for the RPi radar. clock (StartupClock) records when the first PTZ frame is drawn.
+    With mjpeg (MJPEGServer) every camera's dashboard and PTZ view are also served over HTTP.
+    With recorder (PTZRecorder) every frame is also queued for recording in the background.
+    """
+    renderers = {}
+    fps_gauges = {camera_id: registry.gauge("fps", camera=camera_id) for camera_id in mqtt_clients}
+    for camera_id, mqtt in mqtt_clients.items():
+        window_name = WINDOW_NAME if camera_id is None else f"{WINDOW_NAME} [{camera_id}]"
+        view_prefix = "" if camera_id is None else f"{camera_id}/"
+        renderer = DashboardRenderer(config, latency, display, window_name, mjpeg, view_prefix)
+        mqtt.set_callback(ptz_handler(mqtt, renderer, latency, tracker, local_ptz, clock, recorder))
+        renderer.start()
+        renderers[camera_id] = renderer
 
+    stats = {"frames": 0, "rendered": 0, "matched": 0, "dropped": 0}
+    dropped = {}
+    # Per-camera frame interval (EWMA) for the fps gauge
+    intervals = {}
+    last_frame = {}
     try:
-        results = tracker.start(source)
-        mqtt.start()
-        
-        for result in results:
+        for camera_id, frame_info, result in frames:
+            stats["frames"] += 1
+            dropped[camera_id] = frame_info.get("dropped", 0)
+            now = time.monotonic()
+            if camera_id in last_frame:
+                dt = now - last_frame[camera_id]
+                interval = intervals[camera_id] = 0.9 * intervals.get(camera_id, dt) + 0.1 * dt
+                if interval > 0:
+                    fps_gauges[camera_id].set(1.0 / interval)
+            last_frame[camera_id] = now
+            latency.observe("decode", frame_info["decode_ms"])
+            latency.observe("inference", frame_info["inference_ms"])
+
             # Publish the inference results to MQTT
-            mqtt.publish_inference(result)
-
-            # Get the annotated frame (YOLO detections)
-            full_frame = result.plot()
-            H, W = full_frame.shape[:2]
-            
-            # Initialize PTZ view with a placeholder (using 9:16 aspect ratio)
-            target_ratio = 9 / 16
-            ptz_W = int(H * target_ratio)
-            ptz_view = np.zeros((H, ptz_W, 3), dtype=np.uint8)
-            cv2.putText(ptz_view, "WAITING", (ptz_W//10, H//2),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (100, 100, 100), 2)
-
-            # Process PTZ if state is available
-            if ptz_state:
-                try:
-                    x, y, w, h = ptz_state.get('x'), ptz_state.get('y'), ptz_state.get('w'), ptz_state.get('h')
-                    if all(v is not None for v in [x, y, w, h]):
-                        # Calculate coordinates and ensure they are within frame boundaries
-                        x1, y1 = max(0, int(x)), max(0, int(y))
-                        x2, y2 = min(W, int(x + w)), min(H, int(y + h))
-                        
-                        if x2 > x1 and y2 > y1:
-                            # Draw PTZ region rectangle on full frame (YOLO style)
-                            color = (0, 0, 255)
-                            thickness = 3
-                            cv2.rectangle(full_frame, (x1, y1), (x2, y2), color, thickness)
-                            
-                            label = "PTZ VIEWPORT"
-                            (lw, lh), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                            # Draw filled background for label
-                            cv2.rectangle(full_frame, (x1 - 1, y1 - lh - 12), (x1 + lw + 10, y1), color, -1)
-                            # Draw label text
-                            cv2.putText(full_frame, label, (x1 + 4, y1 - 7), 
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
-                            
-                            # Extract and resize crop, maintaining vertical aspect ratio
-                            crop = result.orig_img[y1:y2, x1:x2]
-                            if crop.size > 0:
-                                ptz_view = cv2.resize(crop, (ptz_W, H))
-                except Exception as e:
-                    print(f"Error processing PTZ crop: {e}")
-
-            # Add HUD elements / Design
-            # Add semi-transparent overlays for labels
-            for img, label in [(full_frame, "SYSTEM VIEW"), (ptz_view, "PTZ VIEW")]:
-                cur_H, cur_W = img.shape[:2]
-                overlay = img.copy()
-                cv2.rectangle(overlay, (0, 0), (cur_W, 40), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.5, img, 0.5, 0, img)
-                cv2.putText(img, label, (15, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-            # Combine both views side-by-side
-            dashboard = np.hstack((full_frame, ptz_view))
-            
-            # Display the final composed window
-            cv2.imshow("RPi Virtual PTZ - Dashboard", dashboard)
-
-            # Break the loop if 'q' is pressed
-            if cv2.waitKey(1) & 0xFF == ord("q"):
+            detections = Detections.from_boxes(result.boxes)
+            ptz_cmd = None
+            if local_ptz:
+                ptz_cmd = local_ptz.update(camera_id, detections, frame_info)
+                latency.observe("ptz", (ptz_cmd['sent_ts'] - ptz_cmd['received_ts']) * 1000)
+            mqtt_clients[camera_id].publish_inference(detections, frame_info, ptz_cmd)
+            renderers[camera_id].submit(frame_info, result.orig_img, detections)
+            if ptz_cmd:
+                # Drawn right away; the MQTT mirror is for the RPi and other observers
+                renderers[camera_id].set_ptz(ptz_cmd)
+                if clock:
+                    clock.ptz_frame(camera_id)
+                if tracker:
+                    tracker.set_roi(camera_id, ptz_cmd)
+                mqtt_clients[camera_id].publish_ptz(ptz_cmd)
+                if recorder:
+                    recorder.set_ptz(camera_id, ptz_cmd)
+            if recorder:
+                # Queued, never blocks: frames are dropped if the recorder falls behind
+                recorder.submit(camera_id, frame_info, result.orig_img, detections)
+
+            latency.maybe_report()
+
+            # Stop when 'q' is pressed in a dashboard window
+            if any(r.quit for r in renderers.values()):
                 break
+    finally:
+        for renderer in renderers.values():
+            renderer.stop()
+
+    stats["dropped"] = sum(dropped.values())
+    for renderer in renderers.values():
+        stats["rendered"] += renderer.stats["rendered"]
+        stats["matched"] += renderer.stats["matched"]
+    return stats
+
+def main():
+    clock = StartupClock()
+    print("Starting remote PC edge AI system...")
+
+    config = load_config()
+    if not config:
+        return
+
+    # One video source, broker connection and topic namespace per camera
+    cameras = camera_sources(config)
+    sources = {cam['id']: cam['source'] for cam in cameras}
+
+    tracker = YOLOTracker(config, load=False)
+    mqtt_clients = {cam['id']: MQTTClient(config, camera=cam) for cam in cameras}
+    latency = LatencyTracker(LATENCY_HOPS, config.get('latency', {}).get('report_interval', 5.0), registry)
+    # Metrics endpoint; the periodic snapshot goes out through the first camera's broker
+    exporter = MetricsExporter(config, next(iter(mqtt_clients.values())).publish_stats)
+    local_ptz = LocalPTZ(config) if config.get('ptz', {}).get('local') else None
+    mjpeg = MJPEGServer(config)
+    recorder = PTZRecorder(config)
+
+    try:
+        exporter.start()
+        mjpeg.start()
+        recorder.start()
+        frames = start_up(config, tracker, sources, mqtt_clients, clock)
+        stats = run(config, frames, mqtt_clients, latency, display=not mjpeg.headless, tracker=tracker,
+                    local_ptz=local_ptz, clock=clock, mjpeg=mjpeg, recorder=recorder)
+        print(f"Processed {stats['frames']} frames from {len(cameras)} camera(s), dropped {stats['dropped']} stale frames")
 
     except KeyboardInterrupt:
         print("\nStopping...")
     finally:
-        mqtt.stop()
-        cv2.destroyAllWindows()
+        exporter.stop()
+        mjpeg.stop()
+        tracker.stop()
+        recorder.stop()
+        for mqtt in mqtt_clients.values():
+            mqtt.stop()
+        print(latency.format_report())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,328 @@
+import asyncio
+import bisect
+import functools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bucket upper bounds in milliseconds (last bucket catches everything above)
+DEFAULT_BUCKETS_MS = (1, 2, 3, 5, 7.5, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 2000, float("inf"))
+
+class Histogram:
+    def __init__(self, name, buckets=DEFAULT_BUCKETS_MS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        # First bucket whose upper bound is >= value
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[min(i, len(self.counts) - 1)] += 1
+            self.count += 1
+            self.sum += value
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Estimate the p-th percentile (0-100) by interpolating inside the matching bucket."""
+        with self.lock:
+            if not self.count:
+                return 0.0
+            rank = self.count * p / 100.0
+            seen = 0
+            lower = 0.0
+            for bound, n in zip(self.buckets, self.counts):
+                if n and seen + n >= rank:
+                    if bound == float("inf"):
+                        return lower
+                    return lower + (bound - lower) * (rank - seen) / n
+                seen += n
+                if bound != float("inf"):
+                    lower = bound
+            return lower
+
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * len(self.buckets)
+            self.count = 0
+            self.sum = 0.0
+
+class Counter:
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+class Gauge:
+    def __init__(self, name):
+        self.name = name
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+class MetricsRegistry:
+    """
+    Process-wide counters, gauges and histograms, looked up by name and labels.
+    Hot paths fetch their metric once and keep it; rendering is only done on a scrape.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def get(self, kind, name, labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+        with self.lock:
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = self.metrics[key] = kind(name)
+            return metric
+
+    def counter(self, name, **labels):
+        return self.get(Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self.get(Gauge, name, labels)
+
+    def histogram(self, name, **labels):
+        return self.get(Histogram, name, labels)
+
+    def items(self):
+        with self.lock:
+            return sorted(self.metrics.items(), key=lambda item: item[0])
+
+    def render_prometheus(self):
+        """Prometheus text exposition format."""
+        lines = []
+        typed = set()
+        for (name, labels), metric in self.items():
+            kind = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}[type(metric)]
+            if name not in typed:
+                lines.append(f"# TYPE {name} {kind}")
+                typed.add(name)
+            if kind == "histogram":
+                with metric.lock:
+                    counts, count, total = list(metric.counts), metric.count, metric.sum
+                cumulative = 0
+                for bound, n in zip(metric.buckets, counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+            else:
+                lines.append(f"{name}{format_labels(labels)} {metric.value:g}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Compact JSON-able view (histograms as count / mean / p50 / p95) for the MQTT stats topic."""
+        stats = {}
+        for (name, labels), metric in self.items():
+            key = name + format_labels(labels)
+            if isinstance(metric, Histogram):
+                stats[key] = {"count": metric.count, "mean": round(metric.mean(), 3),
+                              "p50": round(metric.percentile(50), 3), "p95": round(metric.percentile(95), 3)}
+            else:
+                stats[key] = metric.value
+        return stats
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+# Default registry of this process
+registry = MetricsRegistry()
+
+def timed(name, **labels):
+    """Decorator recording every call's duration (ms) in a histogram of the default registry."""
+    histogram = registry.histogram(name, **labels)
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe((time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorate
+
+class MetricsExporter:
+    """
+    Serves the registry on http://<host>:<port>/metrics (Prometheus text format) and, with a
+    publish callable, sends a snapshot every stats_interval_s seconds (e.g. to MQTT).
+    """
+
+    def __init__(self, config, publish=None, metrics=registry):
+        metrics_config = config.get('metrics', {})
+        self.enabled = metrics_config.get('enabled', False)
+        # Loopback only unless the operator opts in to exposing the (unauthenticated) endpoint
+        self.host = metrics_config.get('host', "127.0.0.1")
+        self.port = metrics_config.get('port', 9108)
+        self.interval = metrics_config.get('stats_interval_s', 10.0)
+        self.publish = publish
+        self.registry = metrics
+        self.server = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            print(f"Metrics on http://{self.host}:{self.port}/metrics")
+        except OSError as e:
+            print(f"Failed to start metrics endpoint on port {self.port}: {e}")
+        if self.publish and self.interval > 0:
+            self.running = True
+            self.thread = threading.Thread(target=self.publish_loop, daemon=True)
+            self.thread.start()
+
+    def publish_loop(self):
+        next_due = time.monotonic() + self.interval
+        while self.running:
+            time.sleep(min(0.2, max(0.0, next_due - time.monotonic())))
+            if time.monotonic() < next_due:
+                continue
+            next_due += self.interval
+            self.publish_snapshot()
+
+    async def serve(self):
+        """
+        The endpoint and the periodic snapshot as a task on the running asyncio loop, instead
+        of the server and publish threads of start(); cancel the task to stop.
+        """
+        if not self.enabled:
+            return
+
+        async def handle(reader, writer):
+            try:
+                request = (await reader.readline()).split()
+                while (await reader.readline()).strip():
+                    pass
+                if len(request) > 1 and request[1].split(b"?")[0] == b"/metrics":
+                    status, body = "200 OK", self.registry.render_prometheus().encode()
+                else:
+                    status, body = "404 Not Found", b"Not Found\n"
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                             f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        try:
+            server = await asyncio.start_server(handle, self.host, self.port)
+        except OSError as e:
+            print(f"Failed to start metrics endpoint on port {self.port}: {e}")
+            server = None
+        if server:
+            self.port = server.sockets[0].getsockname()[1]
+            print(f"Metrics on http://{self.host}:{self.port}/metrics")
+        try:
+            while True:
+                await asyncio.sleep(self.interval if self.publish and self.interval > 0 else 3600)
+                if self.publish and self.interval > 0:
+                    self.publish_snapshot()
+        finally:
+            if server:
+                server.close()
+
+    def publish_snapshot(self):
+        try:
+            self.publish(json.dumps(self.registry.snapshot()))
+        except Exception as e:
+            print(f"Failed to publish stats: {e}")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+class LatencyTracker:
+    """
+    Named per-hop latency histograms (values in ms) with a periodic console report.
+    With a registry the hops are also exported as hop_latency_ms{hop="..."}.
+    """
+
+    def __init__(self, hops, report_interval=5.0, metrics=None):
+        self.metrics = metrics
+        self.hops = {}
+        for name in hops:
+            self.hops[name] = self.histogram(name)
+        self.report_interval = report_interval
+        self.last_report = time.monotonic()
+
+    def histogram(self, hop):
+        return self.metrics.histogram("hop_latency_ms", hop=hop) if self.metrics else Histogram(hop)
+
+    def observe(self, hop, value_ms):
+        if value_ms is None or value_ms < 0:
+            return
+        if hop not in self.hops:
+            self.hops[hop] = self.histogram(hop)
+        self.hops[hop].observe(value_ms)
+
+    def summary(self):
+        return {
+            name: {
+                "count": h.count,
+                "mean": h.mean(),
+                "p50": h.percentile(50),
+                "p95": h.percentile(95),
+                "p99": h.percentile(99),
+            }
+            for name, h in self.hops.items()
+        }
+
+    def format_report(self):
+        lines = [f"{'hop':<12}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<12}{s['count']:>8}{s['mean']:>9.1f}{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}")
+        return "\n".join(lines)
+
+    def maybe_report(self):
+        if self.report_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self.last_report >= self.report_interval:
+            self.last_report = now
+            print(self.format_report())
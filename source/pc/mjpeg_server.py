@@ -0,0 +1,253 @@
+import fcntl
+import select
+import socket
+import struct
+import termios
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from metrics import registry
+
+BOUNDARY = "frame"
+# A viewer is sent the next frame once less than this is still queued in its socket
+DRAINED_BYTES = 16384
+
+def send_queue_bytes(sock):
+    """Bytes written to a TCP socket but not yet acknowledged by the peer (Linux TIOCOUTQ)."""
+    try:
+        return struct.unpack("i", fcntl.ioctl(sock.fileno(), termios.TIOCOUTQ, b"\0\0\0\0"))[0]
+    except OSError:
+        return 0
+
+def peer_closed(sock):
+    """True once the viewer has hung up (the request is already read, so EOF is all it can send)."""
+    try:
+        if not select.select([sock], [], [], 0)[0]:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except OSError:
+        return True
+
+class MJPEGFeed:
+    """
+    Latest JPEG of one view, shared by all of its viewers.
+    A viewer always gets the newest frame once it is ready for the next one, so a slow viewer
+    skips frames instead of queueing them, and never holds up the others.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.jpeg = None
+        self.stamp = 0.0
+        self.seq = 0
+        self.viewers = 0
+        self.encoding = False
+        self.last_offer = 0.0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.viewers_gauge = registry.gauge("mjpeg_viewers", view=name)
+
+    def put(self, jpeg, stamp):
+        with self.cond:
+            self.jpeg, self.stamp = jpeg, stamp
+            self.seq += 1
+            self.encoding = False
+            self.cond.notify_all()
+
+    def get(self, seq, timeout=1.0):
+        """Newest frame after seq: (jpeg, stamp, seq), or (None, None, seq) on timeout or close."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > seq or self.closed, timeout) or self.closed:
+                return None, None, seq
+            return self.jpeg, self.stamp, self.seq
+
+    def join(self, delta):
+        with self.cond:
+            self.viewers += delta
+            self.viewers_gauge.set(self.viewers)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+class MJPEGServer:
+    """
+    Serves dashboard views as MJPEG over HTTP to any number of viewers (browsers, VLC, curl):
+    /<view>.mjpg streams a view, /<view>.jpg is a single snapshot and / lists the views.
+    Renderers offer every frame they compose; each view is encoded at most mjpeg.fps times
+    per second, at mjpeg.quality and mjpeg.scale, once on a small thread pool, and the same
+    bytes go to every viewer. Views nobody is watching are not encoded.
+    """
+
+    def __init__(self, config):
+        mjpeg_config = config.get('mjpeg', {})
+        self.enabled = mjpeg_config.get('enabled', False)
+        # Headless: no OpenCV window, the MJPEG views are the only output
+        self.headless = self.enabled and mjpeg_config.get('headless', True)
+        self.host = mjpeg_config.get('host', "0.0.0.0")
+        self.port = mjpeg_config.get('port', 8080)
+        self.interval = 1.0 / mjpeg_config.get('fps', 10)
+        self.quality = int(mjpeg_config.get('quality', 70))
+        self.scale = mjpeg_config.get('scale', 1.0)
+        self.send_timeout = mjpeg_config.get('send_timeout', 5.0)
+        # Small kernel send buffer, so a slow viewer's backlog stays in view of send_queue_bytes
+        self.send_buffer = mjpeg_config.get('send_buffer', 131072)
+        self.pool = ThreadPoolExecutor(max_workers=mjpeg_config.get('encode_threads', 2))
+        self.feeds = {}
+        self.lock = threading.Lock()
+        self.server = None
+        self.running = False
+        self.encode_ms = registry.histogram("mjpeg_encode_ms")
+        self.encoded = registry.counter("mjpeg_frames_encoded_total")
+
+    def feed(self, name):
+        with self.lock:
+            if name not in self.feeds:
+                self.feeds[name] = MJPEGFeed(name)
+            return self.feeds[name]
+
+    def offer(self, name, image):
+        """Frame for a view, from a renderer thread; skipped unless watched and due."""
+        if not self.running:
+            return
+        feed = self.feed(name)
+        now = time.monotonic()
+        with feed.cond:
+            if not feed.viewers or feed.encoding or now - feed.last_offer < self.interval:
+                return
+            feed.encoding = True
+            feed.last_offer = now
+        # The renderer draws into a reused buffer: hand the pool its own (scaled) copy
+        if self.scale != 1.0:
+            image = cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        else:
+            image = image.copy()
+        self.pool.submit(self.encode, feed, image, time.time())
+
+    def encode(self, feed, image, stamp):
+        start = time.perf_counter()
+        try:
+            ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                self.encoded.inc()
+                feed.put(data.tobytes(), stamp)
+        except cv2.error as e:
+            print(f"MJPEG encoding of {feed.name} failed: {e}")
+        finally:
+            # Whatever happened: a view left marked as encoding would never be offered again
+            with feed.cond:
+                feed.encoding = False
+            self.encode_ms.observe((time.perf_counter() - start) * 1000)
+
+    def start(self):
+        if not self.enabled:
+            return
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            timeout = server.send_timeout
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, server.send_buffer)
+
+            def do_GET(self):
+                path = self.path.split("?")[0].strip("/")
+                if not path:
+                    self.send_index()
+                    return
+                name, _, ext = path.rpartition(".")
+                with server.lock:
+                    feed = server.feeds.get(name)
+                if feed is None or ext not in ("mjpg", "jpg"):
+                    self.send_error(404)
+                    return
+                feed.join(1)
+                try:
+                    if ext == "jpg":
+                        self.send_snapshot(feed)
+                    else:
+                        self.send_stream(feed)
+                except OSError:
+                    # Viewer went away or stalled past the send timeout
+                    pass
+                finally:
+                    feed.join(-1)
+
+            def send_index(self):
+                with server.lock:
+                    names = sorted(server.feeds)
+                links = "".join(f'<li><a href="/{n}.mjpg">{n}</a> (<a href="/{n}.jpg">snapshot</a>)</li>' for n in names)
+                body = f"<html><body><h3>RPi Virtual PTZ</h3><ul>{links}</ul></body></html>".encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_snapshot(self, feed):
+                # A fresh frame: the view is being encoded again now that it has a viewer
+                jpeg, _, _ = feed.get(feed.seq, timeout=2.0)
+                if jpeg is None:
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(jpeg)))
+                self.end_headers()
+                self.wfile.write(jpeg)
+
+            def send_stream(self, feed):
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                seq = feed.seq
+                last_write = time.monotonic()
+                while server.running:
+                    # Take the newest frame only once the previous one has (nearly) left the
+                    # socket: a viewer on a slow link skips frames instead of falling behind
+                    if send_queue_bytes(self.connection) > DRAINED_BYTES:
+                        if time.monotonic() - last_write > server.send_timeout:
+                            return
+                        time.sleep(0.005)
+                        continue
+                    jpeg, stamp, seq = feed.get(seq)
+                    if jpeg is None:
+                        # Idle view: nothing is written, so notice a viewer that left by itself
+                        # (it would otherwise keep the view counted as watched and encoded)
+                        if peer_closed(self.connection):
+                            return
+                        continue
+                    last_write = time.monotonic()
+                    self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n"
+                                     f"X-Timestamp: {stamp:.6f}\r\n\r\n".encode() + jpeg + b"\r\n")
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+            self.running = True
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            print(f"Dashboard MJPEG streams on http://{self.host}:{self.port}/")
+        except OSError as e:
+            print(f"Failed to start MJPEG server on port {self.port}: {e}")
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            feeds = list(self.feeds.values())
+        for feed in feeds:
+            feed.close()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from ultralytics import YOLO
+
+# Precisions each backend can be exported to for CPU inference
+PRECISIONS = {
+    "torch": ("fp32",),
+    "onnx": ("fp32", "int8"),
+    "openvino": ("fp32", "fp16", "int8"),
+}
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+def cache_path(model_path, input_size, backend, precision, cache_dir):
+    """Where the converted model lives: keyed by checkpoint hash, input size, backend and precision."""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    name = f"{stem}-{file_hash(model_path)}-{input_size}-{backend}-{precision}"
+    return os.path.join(cache_dir, name + (".onnx" if backend == "onnx" else "_openvino_model"))
+
+def export_model(model_path, input_size, backend, precision, target, calibration_data=None):
+    """
+    Export the PyTorch checkpoint to target. Exports use dynamic shapes so ROI crops and
+    multi-camera batches still work at other sizes. ONNX INT8 is a dynamic (weight-only)
+    quantization of the FP32 export; OpenVINO INT8 is calibrated on calibration_data
+    (an Ultralytics dataset YAML; its default dataset is downloaded if not given).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        # Export next to a copy, so nothing is written beside the original checkpoint
+        source = shutil.copy(model_path, tmp)
+        kwargs = {"format": backend, "imgsz": input_size, "dynamic": True}
+        if backend == "openvino":
+            kwargs["half"] = precision == "fp16"
+            kwargs["int8"] = precision == "int8"
+            if precision == "int8" and calibration_data:
+                kwargs["data"] = calibration_data
+        exported = YOLO(source).export(**kwargs)
+
+        if backend == "onnx" and precision == "int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantized = os.path.join(tmp, "int8.onnx")
+            quantize_dynamic(exported, quantized, weight_type=QuantType.QUInt8)
+            exported = quantized
+
+        # load_model only checks that the target exists: stage the finished export beside it
+        # (a move from the temp dir may be a copy) and rename it into place in one step
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        staging = target + ".partial"
+        if os.path.isdir(staging):
+            shutil.rmtree(staging)
+        elif os.path.exists(staging):
+            os.remove(staging)
+        shutil.move(exported, staging)
+        os.replace(staging, target)
+    return target
+
+def load_model(config):
+    """
+    YOLO model for config['ai']: the PyTorch checkpoint itself, or its ONNX Runtime /
+    OpenVINO conversion, exported on first use and reused from ai.cache_dir afterwards.
+    Falls back to the PyTorch model if the conversion is not possible.
+    """
+    ai = config['ai']
+    model_path = ai['model_path']
+    backend = ai.get('backend', "torch")
+    precision = ai.get('precision', "fp32")
+    if backend not in PRECISIONS:
+        print(f"Unknown inference backend '{backend}', using torch")
+        backend = "torch"
+    if precision not in PRECISIONS[backend]:
+        print(f"{backend} does not support {precision} here (supported: {', '.join(PRECISIONS[backend])}), using fp32")
+        precision = "fp32"
+    if backend == "torch":
+        print(f"Loading YOLO model from {model_path}")
+        return YOLO(model_path)
+
+    target = cache_path(model_path, ai['input_size'], backend, precision, ai.get('cache_dir', "models/cache"))
+    if not os.path.exists(target):
+        print(f"Exporting {model_path} to {backend} {precision} (cached in {target})")
+        try:
+            export_model(model_path, ai['input_size'], backend, precision, target, ai.get('calibration_data'))
+        except Exception as e:
+            print(f"Export to {backend} {precision} failed: {e}; using the PyTorch model")
+            return YOLO(model_path)
+    print(f"Loading {backend} {precision} model from {target}")
+    return YOLO(target, task="detect")
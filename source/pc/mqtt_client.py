@@ -1,21 +1,38 @@
 import paho.mqtt.client as mqtt
 import json
 import threading
+import time
+
+from metrics import registry
+from payload_codec import get_codec
+from utils import camera_topics
 
 class MQTTClient:
-    def __init__(self, config):
-        self.broker = config['mqtt']['broker']
+    def __init__(self, config, client=None, camera=None):
+        # camera: entry from utils.camera_sources (own broker and topic namespace)
+        self.camera_id = camera['id'] if camera else None
+        self.broker = camera['broker'] if camera else config['mqtt']['broker']
         self.port = config['mqtt']['port']
-        self.topics = config['mqtt']['topics']
-        self.client = mqtt.Client()
+        self.topics = camera_topics(config, self.camera_id)
+        self.codec = get_codec(config)
+        # A paho-compatible client can be injected (e.g. a local broker stand-in)
+        self.client = client or mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
+        if 'ready' in self.topics:
+            # Withdraw readiness if the PC drops off without a clean stop
+            self.client.will_set(self.topics['ready'], json.dumps({"ready": False}), retain=True)
         self.message_callback = None
         self.running = False
+        self.serialize_ms = registry.histogram("serialize_ms", camera=self.camera_id)
+        self.bytes_out = registry.counter("mqtt_bytes_out_total", camera=self.camera_id)
 
     def on_connect(self, client, userdata, flags, rc):
         print(f"Connected to MQTT Broker with result code {rc}")
         client.subscribe(self.topics['ptz'])
+        for key in ('encoding', 'control'):
+            if key in self.topics:
+                client.subscribe(self.topics[key])
 
     def on_message(self, client, userdata, msg):
         if self.message_callback:
@@ -28,30 +45,55 @@ class MQTTClient:
     def set_callback(self, callback):
         self.message_callback = callback
 
-    def publish_inference(self, results):
+    def publish_inference(self, detections, frame_info=None, ptz_state=None):
         if not self.running:
             return
 
-        serializable_detections = []
-        for r in results:
-            boxes = r.boxes
-            for i in range(len(boxes)):
-                box = boxes[i]
-                detection = {
-                    "box": box.xyxy[0].tolist(),  # [x1, y1, x2, y2]
-                    "conf": float(box.conf[0]),
-                    "cls": int(box.cls[0]),
-                }
-                if box.id is not None:
-                    detection["id"] = int(box.id[0])
-                serializable_detections.append(detection)
-
-        payload = {"detections": serializable_detections}
+        payload = {"detections": detections}
+        if frame_info:
+            # Frame identity travels with the detections so the PTZ reply can be matched to its frame
+            payload["seq"] = frame_info["seq"]
+            payload["capture_ts"] = frame_info["capture_ts"]
+            if "input_size" in frame_info:
+                # Model input size used for this frame (adaptive input size)
+                payload["input_size"] = frame_info["input_size"]
+        if ptz_state:
+            # Local PTZ mode: the RPi radar highlights the target chosen on the PC
+            payload["target_id"] = ptz_state["target_id"]
+        payload["sent_ts"] = time.time()
         try:
-            self.client.publish(self.topics['inference'], json.dumps(payload))
+            start = time.perf_counter()
+            data = self.codec.encode(payload)
+            self.serialize_ms.observe((time.perf_counter() - start) * 1000)
+            self.bytes_out.inc(len(data))
+            self.client.publish(self.topics['inference'], data)
         except Exception as e:
             print(f"Error publishing inference: {e}")
 
+    def publish_ptz(self, ptz_state):
+        """Mirror of the PTZ state computed on the PC (local PTZ mode)."""
+        if not self.running:
+            return
+        try:
+            self.client.publish(self.topics['ptz'], json.dumps(ptz_state))
+        except Exception as e:
+            print(f"Error publishing PTZ state: {e}")
+
+    def publish_ready(self, ready, **info):
+        """
+        Readiness for this camera's RPi (retained): it starts the encoder once the model is
+        warm, so the first frames are not queued behind model loading. Returns the publish's
+        message info (None if not sent).
+        """
+        if self.running and 'ready' in self.topics:
+            return self.client.publish(self.topics['ready'], json.dumps(dict(info, ready=ready, ts=time.time())), retain=True)
+        return None
+
+    def publish_stats(self, stats_json):
+        """Periodic metrics snapshot (see metrics.MetricsExporter)."""
+        if self.running and 'stats' in self.topics:
+            self.client.publish(f"{self.topics['stats']}/pc", stats_json)
+
     def start(self):
         if not self.running:
             try:
@@ -63,6 +105,15 @@ class MQTTClient:
 
     def stop(self):
         if self.running:
-            self.client.loop_stop()
+            # A clean disconnect suppresses the last will: make sure the withdrawal is out first,
+            # or a stale retained ready would start the RPi encoder before the model is warm
+            info = self.publish_ready(False)
+            if info is not None:
+                try:
+                    info.wait_for_publish(timeout=2.0)
+                except (RuntimeError, ValueError) as e:
+                    print(f"Failed to withdraw readiness: {e}")
+            # Disconnecting first wakes the network loop, so loop_stop() returns at once
             self.client.disconnect()
+            self.client.loop_stop()
             self.running = False
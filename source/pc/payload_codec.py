@@ -0,0 +1,149 @@
+import json
+import struct
+
+import numpy as np
+
+# Binary inference payload layout (little endian):
+#   header: magic, version, flags, extras length, detection count, seq, capture_ts, sent_ts
+#   body:   boxes float32[N, 4] | conf float32[N] | cls int32[N] | ids int32[N] (if FLAG_IDS) | extras JSON
+MAGIC = b"PTZD"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHIqdd")
+FLAG_IDS = 0x01
+NO_SEQ = -1
+UNTRACKED = -1
+
+# Keys carried in the fixed header; anything else rides along in the extras JSON
+HEADER_KEYS = ("detections", "seq", "capture_ts", "sent_ts")
+
+class Detections:
+    """
+    Detections for one frame as contiguous arrays.
+    ids is None when the tracker assigned none; UNTRACKED marks single boxes without an id.
+    """
+
+    def __init__(self, boxes=None, conf=None, cls=None, ids=None):
+        self.boxes = np.zeros((0, 4), np.float32) if boxes is None else np.asarray(boxes, np.float32).reshape(-1, 4)
+        n = len(self.boxes)
+        self.conf = np.zeros(n, np.float32) if conf is None else np.asarray(conf, np.float32).reshape(-1)
+        self.cls = np.zeros(n, np.int32) if cls is None else np.asarray(cls, np.int32).reshape(-1)
+        self.ids = None if ids is None else np.asarray(ids, np.int32).reshape(-1)
+
+    @classmethod
+    def from_boxes(cls, boxes):
+        """Extract every detection in one shot from an Ultralytics Boxes object."""
+        if boxes is None or len(boxes) == 0:
+            return cls()
+        b = boxes.cpu().numpy()
+        return cls(b.xyxy, b.conf, b.cls, b.id)
+
+    @classmethod
+    def from_list(cls, detections):
+        """Build from the JSON list form [{"box": [...], "conf": .., "cls": .., "id": ..}, ...]."""
+        if not detections:
+            return cls()
+        ids = None
+        if any('id' in d for d in detections):
+            ids = [d.get('id', UNTRACKED) for d in detections]
+        return cls([d['box'] for d in detections],
+                   [d.get('conf', 0.0) for d in detections],
+                   [d.get('cls', 0) for d in detections],
+                   ids)
+
+    def to_list(self):
+        boxes = self.boxes.tolist()
+        conf = self.conf.tolist()
+        cls = self.cls.tolist()
+        if self.ids is None:
+            return [{"box": b, "conf": c, "cls": k} for b, c, k in zip(boxes, conf, cls)]
+        detections = []
+        for b, c, k, i in zip(boxes, conf, cls, self.ids.tolist()):
+            d = {"box": b, "conf": c, "cls": k}
+            if i != UNTRACKED:
+                d["id"] = i
+            detections.append(d)
+        return detections
+
+    def __len__(self):
+        return len(self.boxes)
+
+class JSONCodec:
+    """Compatibility codec: the original JSON message format."""
+    name = "json"
+
+    def encode(self, payload):
+        message = {k: v for k, v in payload.items() if k != "detections"}
+        message["detections"] = payload["detections"].to_list()
+        return json.dumps(message).encode()
+
+    def decode(self, data):
+        payload = json.loads(data.decode() if isinstance(data, (bytes, bytearray)) else data)
+        payload["detections"] = Detections.from_list(payload.get("detections", []))
+        return payload
+
+class BinaryCodec:
+    """Packed header + contiguous arrays, decoded into zero-copy NumPy views."""
+    name = "binary"
+
+    def encode(self, payload):
+        det = payload["detections"]
+        n = len(det)
+        extras = {k: v for k, v in payload.items() if k not in HEADER_KEYS}
+        extras_bytes = json.dumps(extras).encode() if extras else b""
+        flags = FLAG_IDS if det.ids is not None else 0
+        seq = payload.get("seq")
+        header = HEADER.pack(MAGIC, VERSION, flags, len(extras_bytes), n,
+                             NO_SEQ if seq is None else seq,
+                             payload.get("capture_ts") or 0.0,
+                             payload.get("sent_ts") or 0.0)
+        parts = [header,
+                 np.ascontiguousarray(det.boxes, "<f4").tobytes(),
+                 np.ascontiguousarray(det.conf, "<f4").tobytes(),
+                 np.ascontiguousarray(det.cls, "<i4").tobytes()]
+        if det.ids is not None:
+            parts.append(np.ascontiguousarray(det.ids, "<i4").tobytes())
+        parts.append(extras_bytes)
+        return b"".join(parts)
+
+    def decode(self, data):
+        if len(data) < HEADER.size:
+            raise ValueError(f"Truncated binary payload ({len(data)} bytes)")
+        magic, version, flags, extras_len, n, seq, capture_ts, sent_ts = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported binary payload (magic={magic!r}, version={version})")
+        offset = HEADER.size
+        boxes = np.frombuffer(data, "<f4", n * 4, offset).reshape(n, 4)
+        offset += n * 16
+        conf = np.frombuffer(data, "<f4", n, offset)
+        offset += n * 4
+        cls = np.frombuffer(data, "<i4", n, offset)
+        offset += n * 4
+        ids = None
+        if flags & FLAG_IDS:
+            ids = np.frombuffer(data, "<i4", n, offset)
+            offset += n * 4
+
+        payload = json.loads(data[offset:offset + extras_len]) if extras_len else {}
+        payload["detections"] = Detections(boxes, conf, cls, ids)
+        payload["seq"] = None if seq == NO_SEQ else seq
+        payload["capture_ts"] = capture_ts or None
+        payload["sent_ts"] = sent_ts or None
+        return payload
+
+CODECS = {
+    JSONCodec.name: JSONCodec,
+    BinaryCodec.name: BinaryCodec,
+}
+
+def get_codec(config):
+    name = config['mqtt'].get('codec', JSONCodec.name)
+    if name not in CODECS:
+        print(f"Unknown payload codec '{name}', falling back to {JSONCodec.name}")
+        name = JSONCodec.name
+    return CODECS[name]()
+
+def decode(data):
+    """Decode an inference payload in either format (the binary one is recognised by its magic)."""
+    if data[:len(MAGIC)] == MAGIC:
+        return BinaryCodec().decode(data)
+    return JSONCodec().decode(data)
@@ -0,0 +1,156 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from metrics import registry
+
+class Segment:
+    """One recording file set of a camera: PTZ video, optional full-view video and sidecar."""
+
+    def __init__(self, directory, camera_id, number, fps, fourcc, ptz_size, full_size=None, sidecar=True):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.base = os.path.join(directory, f"{camera_id or 'camera'}_{stamp}_{number:04d}")
+        self.started = time.monotonic()
+        self.frames = 0
+        self.ptz = cv2.VideoWriter(self.base + "_ptz.mp4", fourcc, fps, ptz_size)
+        self.full = cv2.VideoWriter(self.base + "_full.mp4", fourcc, fps, full_size) if full_size else None
+        self.full_size = full_size
+        self.sidecar = open(self.base + ".jsonl", "w") if sidecar else None
+
+    def size_bytes(self):
+        paths = [self.base + "_ptz.mp4", self.base + "_full.mp4", self.base + ".jsonl"]
+        return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+    def close(self):
+        self.ptz.release()
+        if self.full:
+            self.full.release()
+        if self.sidecar:
+            self.sidecar.close()
+
+class PTZRecorder:
+    """
+    Archives what the PTZ was looking at without slowing the inference loop down.
+    submit() only puts the frame on a bounded queue; a worker thread crops and encodes the
+    PTZ view (and with recording.full_view the whole frame), and writes a sidecar JSONL line
+    per frame with the detections and the PTZ state. When the worker falls behind (slow disk
+    or encoder) new frames are dropped and counted instead of blocking the caller.
+    Files rotate every recording.rotate_s seconds or recording.rotate_mb megabytes, and when
+    the stream resolution changes. Each frame is recorded with the camera's latest PTZ state
+    (set_ptz); in local PTZ mode that is the state computed from the frame itself.
+    """
+
+    def __init__(self, config):
+        rec_config = config.get('recording', {})
+        self.enabled = rec_config.get('enabled', False)
+        self.directory = rec_config.get('dir', "recordings")
+        self.full_view = rec_config.get('full_view', False)
+        self.sidecar = rec_config.get('sidecar', True)
+        self.fps = rec_config.get('fps') or config['video'].get('fps', 30)
+        self.fourcc = cv2.VideoWriter_fourcc(*rec_config.get('fourcc', "mp4v"))
+        # PTZ crops vary in size: they are scaled to a fixed 9:16 frame of this height
+        ptz_height = rec_config.get('ptz_height', 720)
+        self.ptz_size = (int(ptz_height * 9 / 16) // 2 * 2, ptz_height // 2 * 2)
+        self.rotate_s = rec_config.get('rotate_s', 600)
+        self.rotate_bytes = rec_config.get('rotate_mb', 256) * 1024 * 1024
+        self.queue = queue.Queue(maxsize=rec_config.get('queue_size', 30))
+        self.ptz_states = {}
+        self.segments = {}
+        self.segment_count = 0
+        self.thread = None
+        self.recorded = 0
+        self.dropped = 0
+        self.dropped_counter = registry.counter("recorder_dropped_total")
+        self.frames_counter = registry.counter("recorder_frames_total")
+        self.write_ms = registry.histogram("recorder_write_ms")
+        self.queue_gauge = registry.gauge("recorder_queue_depth")
+
+    def start(self):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self.record_loop, daemon=True)
+        self.thread.start()
+        print(f"Recording PTZ view{' and full view' if self.full_view else ''} to {self.directory}")
+
+    def set_ptz(self, camera_id, ptz_state):
+        self.ptz_states[camera_id] = ptz_state
+
+    def submit(self, camera_id, frame_info, image, detections):
+        """Queue a frame for recording; never blocks. Returns False if it was dropped."""
+        if not self.thread:
+            return False
+        try:
+            self.queue.put_nowait((camera_id, frame_info, image, detections, self.ptz_states.get(camera_id)))
+        except queue.Full:
+            self.dropped += 1
+            self.dropped_counter.inc()
+            return False
+        self.queue_gauge.set(self.queue.qsize())
+        return True
+
+    def record_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            start = time.perf_counter()
+            try:
+                self.record(*item)
+            except Exception as e:
+                print(f"Recording error: {e}")
+            self.write_ms.observe((time.perf_counter() - start) * 1000)
+        for segment in self.segments.values():
+            segment.close()
+        self.segments.clear()
+
+    def segment(self, camera_id, image):
+        segment = self.segments.get(camera_id)
+        H, W = image.shape[:2]
+        if segment is not None and (
+                time.monotonic() - segment.started >= self.rotate_s
+                or (self.full_view and segment.full_size != (W, H))
+                # Checking the files every second's worth of frames is enough
+                or (segment.frames % max(1, int(self.fps)) == 0 and segment.size_bytes() >= self.rotate_bytes)):
+            segment.close()
+            segment = None
+        if segment is None:
+            self.segment_count += 1
+            segment = self.segments[camera_id] = Segment(
+                self.directory, camera_id, self.segment_count, self.fps, self.fourcc, self.ptz_size,
+                (W, H) if self.full_view else None, self.sidecar)
+        return segment
+
+    def record(self, camera_id, frame_info, image, detections, ptz_state):
+        """Write one frame (worker thread, or inline for comparison)."""
+        segment = self.segment(camera_id, image)
+        H, W = image.shape[:2]
+        crop = image
+        if ptz_state and None not in (ptz_state.get('x'), ptz_state.get('y'), ptz_state.get('w'), ptz_state.get('h')):
+            x1, y1 = max(0, int(ptz_state['x'])), max(0, int(ptz_state['y']))
+            x2, y2 = min(W, int(ptz_state['x'] + ptz_state['w'])), min(H, int(ptz_state['y'] + ptz_state['h']))
+            if x2 > x1 and y2 > y1:
+                crop = image[y1:y2, x1:x2]
+        segment.ptz.write(cv2.resize(crop, self.ptz_size, interpolation=cv2.INTER_AREA))
+        if segment.full:
+            segment.full.write(image)
+        if segment.sidecar:
+            record = {"frame": segment.frames, "seq": frame_info.get("seq"), "capture_ts": frame_info.get("capture_ts"),
+                      "detections": detections.to_list() if detections is not None else [], "ptz": ptz_state}
+            segment.sidecar.write(json.dumps(record) + "\n")
+        segment.frames += 1
+        self.recorded += 1
+        self.frames_counter.inc()
+
+    def stop(self):
+        """Finish the queued frames and close the files."""
+        if not self.thread:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        print(f"Recorded {self.recorded} frames, dropped {self.dropped}")
@@ -0,0 +1,110 @@
+import time
+
+try:
+    import av
+except ImportError:
+    # Optional: without PyAV the OpenCV capture path is used
+    av = None
+
+from frame_grabber import FrameGrabber
+
+# Demuxer/decoder options: minimal probing, frames out as soon as decoded. fflags=nobuffer is
+# left out on purpose: it discards the probed packets, and with them the stream's first
+# keyframe, so decoding would only start at the next one.
+LOW_DELAY_OPTIONS = {
+    "flags": "low_delay",
+    "probesize": "32",
+    "analyzeduration": "0",
+}
+
+class AVFrameGrabber(FrameGrabber):
+    """
+    FrameGrabber decoding with PyAV instead of cv2.VideoCapture.
+    The RPi stream (tcp://) is opened as raw H.264 with low-delay options, so the first frame
+    arrives right after the first keyframe instead of after seconds of probing, and no frames
+    are held back in demuxer buffers. capture_ts is the arrival time of the frame's packet.
+    A network stream that ends or stalls is reopened every reconnect_s seconds until stopped,
+    so the PC picks the stream up again when the RPi restarts.
+    """
+
+    def __init__(self, source, buffer_size=1, realtime=None, notify=None, drop=True,
+                 reconnect_s=1.0, read_timeout=2.0, open_timeout=10.0):
+        # The RPi only starts encoding once the PC is ready, so opening may wait on the first keyframe
+        super().__init__(source, buffer_size, realtime, notify, drop, read_timeout, open_timeout)
+        self.network = "://" in str(source)
+        self.reconnect_s = reconnect_s
+        self.reconnects = 0
+
+    def open(self):
+        print(f"Opening video source {self.source} (PyAV)")
+        if self.network:
+            # The RPi serves raw Annex-B H.264: no format probing needed
+            return av.open(self.source, format="h264", options=LOW_DELAY_OPTIONS,
+                           timeout=(self.open_timeout, self.read_timeout))
+        return av.open(self.source)
+
+    def decode(self):
+        while self.running:
+            try:
+                container = self.open()
+            except (av.FFmpegError, OSError) as e:
+                if not self.network:
+                    print(f"Failed to open video source {self.source}: {e}")
+                    return
+                print(f"Video source {self.source} unavailable ({e}), retrying in {self.reconnect_s:.1f} s")
+                self.wait_reconnect()
+                continue
+
+            try:
+                yield from self.decode_container(container)
+            except (av.FFmpegError, OSError) as e:
+                print(f"Video stream error: {e}")
+            finally:
+                container.close()
+
+            if not self.network or not self.running:
+                return
+            print(f"Video stream {self.source} ended, reconnecting")
+            self.reconnects += 1
+            self.wait_reconnect()
+
+    def decode_container(self, container):
+        stream = container.streams.video[0]
+        # Slice threading decodes each frame on several cores without the extra frames of
+        # delay that frame threading adds
+        stream.codec_context.thread_type = "SLICE"
+        period = 0.0
+        if self.realtime and not self.network:
+            fps = float(stream.average_rate or 0)
+            period = 1.0 / fps if fps > 0 else 1.0 / 30
+        next_due = time.monotonic()
+
+        for packet in container.demux(stream):
+            if not self.running:
+                return
+            arrival = time.time()
+            for frame in packet.decode():
+                if period:
+                    wait = next_due - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                    next_due += period
+                    arrival = time.time()
+                image = frame.to_ndarray(format="bgr24")
+                yield image, arrival, (time.time() - arrival) * 1000
+
+    def wait_reconnect(self):
+        end = time.monotonic() + self.reconnect_s
+        while self.running and time.monotonic() < end:
+            time.sleep(0.05)
+
+def make_grabber(config, source, buffer_size=1, realtime=None, notify=None, drop=True):
+    """FrameGrabber for video.ingest: "pyav" (low-latency, reconnecting) or "opencv"."""
+    video = config['video']
+    read_timeout, open_timeout = video.get('read_timeout_s', 2.0), video.get('open_timeout_s', 10.0)
+    if video.get('ingest', "opencv") == "pyav":
+        if av is not None:
+            return AVFrameGrabber(source, buffer_size, realtime, notify, drop,
+                                  video.get('reconnect_s', 1.0), read_timeout, open_timeout)
+        print("PyAV is not installed, falling back to OpenCV capture")
+    return FrameGrabber(source, buffer_size, realtime, notify, drop, read_timeout, open_timeout)
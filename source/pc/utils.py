@@ -6,4 +6,34 @@ def load_config(config_path="config/settings.json"):
             return json.load(f)
     except FileNotFoundError:
         print(f"Config file not found at {config_path}")
-        return {}
\ No newline at end of file
+        return {}
+
+def camera_topics(config, camera_id=None):
+    """
+    MQTT topics for one camera. Without an ID the configured (global) topics are used;
+    with one, the ID is inserted before the last topic level, e.g. rpi-ptz/cam1/inference.
+    """
+    topics = config['mqtt']['topics']
+    if camera_id is None:
+        return dict(topics)
+    namespaced = {}
+    for key, topic in topics.items():
+        prefix, _, leaf = topic.rpartition('/')
+        namespaced[key] = f"{prefix}/{camera_id}/{leaf}" if prefix else f"{camera_id}/{leaf}"
+    return namespaced
+
+def camera_sources(config):
+    """
+    Cameras served by this PC. Falls back to the single RPi at config['rpi']['ip'] on the
+    global topics when no 'cameras' list is configured.
+    """
+    cameras = config.get('cameras') or [{"id": None, "ip": config['rpi']['ip']}]
+    sources = []
+    for cam in cameras:
+        port = cam.get('port', config['video']['port'])
+        sources.append({
+            "id": cam.get('id'),
+            "source": cam.get('source', f"tcp://{cam['ip']}:{port}"),
+            "broker": cam.get('broker', config['mqtt']['broker']),
+        })
+    return sources
@@ -0,0 +1,336 @@
+import time
+
+import numpy as np
+
+from metrics import timed
+from target_filter import AlphaBetaFilter, TrackBank
+
+# Human-like aspect ratio (vertical): width / height
+TARGET_RATIO = 9 / 16
+
+class VirtualPTZ:
+    def __init__(self, config):
+        self.config = config
+        self.resolution = config['video']['resolution']  # [W, H]
+        self.current_zoom = 1.0
+        self.target_id = None
+        self.last_detections = None
+        self.max_zoom = 6.0
+        self.zoom_step = 0.2
+        self.manual_zoom_active = False
+        self.last_auto_zoom = 1.0
+
+        # Smoothing, latency compensation and coasting
+        ptz_config = config.get('ptz', {})
+        self.smoothing = ptz_config.get('smoothing', True)
+        self.alpha = ptz_config.get('alpha', 0.5)
+        self.beta = ptz_config.get('beta', 0.1)
+        self.zoom_alpha = ptz_config.get('zoom_alpha', 0.3)
+        self.predict_latency = ptz_config.get('predict_latency', True)
+        self.max_lead = ptz_config.get('max_lead_ms', 500) / 1000
+        self.coast_time = ptz_config.get('coast_s', 1.5)
+        self.latency = ptz_config.get('default_latency_ms', 150) / 1000
+        self.filters = {}
+        self.locked_id = None
+        self.smoothed_zoom = 1.0
+
+        # Multi-target mode: a viewport for each of up to max_targets tracks, the joystick
+        # selects the primary one
+        multi_config = ptz_config.get('multi', {})
+        self.multi = multi_config.get('enabled', False)
+        self.max_targets = multi_config.get('max_targets', 6)
+        self.tracks = TrackBank(self.alpha, self.beta)
+
+    @timed("ptz_update_ms")
+    def update(self, detections, capture_ts=None, sent_ts=None, received_ts=None):
+        """
+        Calculate PTZ based on detections (payload_codec.Detections) and current target.
+        capture_ts / sent_ts are the frame capture and inference publish times from the PC;
+        they drive the per-track filters and the round-trip estimate used for prediction.
+        "velocity" is the target's filtered velocity in px/s, so the PC can carry the viewport
+        on to whichever frame it draws it on.
+        """
+        self.last_detections = detections
+        W, H = self.resolution
+        now = received_ts or time.time()
+        frame_ts = capture_ts or now
+        self._update_latency(now, sent_ts)
+        if self.multi:
+            return self._update_multi(detections, frame_ts)
+
+        target_ratio = TARGET_RATIO
+
+        # Default: centered view based on current zoom
+        target_center_x, target_center_y = W / 2, H / 2
+
+        # Determine target to track
+        target_box = None
+        active_target_id = self.target_id
+        ids = detections.ids
+        tracked = np.flatnonzero(ids >= 0) if ids is not None else np.zeros(0, dtype=int)
+        visible_ids = ids[tracked] if ids is not None else tracked
+        if self.smoothing:
+            self._update_filters(detections, tracked, frame_ts)
+
+        # Automatic target acquisition (if no target manually selected)
+        if self.target_id is None:
+             # Stay on the auto-acquired target while it is visible or coasting,
+             # otherwise find target with lowest ID
+             if self.locked_id is not None and (self.locked_id in visible_ids or self.locked_id in self.filters):
+                 active_target_id = self.locked_id
+             elif tracked.size:
+                 active_target_id = int(visible_ids.min())
+             else:
+                 active_target_id = None
+             self.locked_id = active_target_id
+        if active_target_id is not None and ids is not None:
+             matches = np.flatnonzero(ids == active_target_id)
+             if matches.size:
+                 target_box = detections.boxes[matches[0]]
+
+        # Calculate Zoom
+        calculated_zoom = 1.0
+        target_h = 0.0
+        coasting = False
+        lead = 0.0
+        velocity = [0.0, 0.0]
+
+        if self.smoothing and active_target_id in self.filters:
+            # Filtered position, predicted forward by the round trip (held while coasting)
+            lead = self.latency if self.predict_latency else 0.0
+            target_filter = self.filters[active_target_id]
+            target_center_x, target_center_y, target_h = target_filter.predict(frame_ts + lead, self.max_lead)
+            velocity = target_filter.velocity[:2].tolist()
+            coasting = target_box is None
+        elif target_box is not None:
+            # Use target's bounding box center
+            x1, y1, x2, y2 = (float(v) for v in target_box)
+            target_center_x = (x1 + x2) / 2
+            target_center_y = (y1 + y2) / 2
+            target_h = y2 - y1
+
+        # Automatic digital zoom level
+        if target_h > 0:
+            # Aim for target to be 80% of screen height
+            wanted_crop_h = target_h * 1.25
+            auto_zoom = H / wanted_crop_h
+            calculated_zoom = max(1.0, min(auto_zoom, self.max_zoom))
+
+        if self.smoothing:
+            self.smoothed_zoom += self.zoom_alpha * (calculated_zoom - self.smoothed_zoom)
+            calculated_zoom = self.smoothed_zoom
+
+        self.last_auto_zoom = calculated_zoom
+
+        # Determine effective zoom
+        if self.manual_zoom_active:
+            effective_zoom = self.current_zoom
+        else:
+            effective_zoom = calculated_zoom
+
+        # Calculate crop dimensions using the human-like aspect ratio
+        # We base the size on the height and the current zoom
+        crop_h = H / effective_zoom
+        crop_w = crop_h * target_ratio
+
+        # Ensure crop is within frame boundaries
+        if crop_h > H:
+            crop_h = H
+            crop_w = crop_h * target_ratio
+
+        # Calculate top-left corner
+        crop_x = target_center_x - crop_w / 2
+        crop_y = target_center_y - crop_h / 2
+
+        # Clamp to frame boundaries
+        crop_x = max(0, min(crop_x, W - crop_w))
+        crop_y = max(0, min(crop_y, H - crop_h))
+
+        return {
+            "x": int(crop_x),
+            "y": int(crop_y),
+            "w": int(crop_w),
+            "h": int(crop_h),
+            "zoom": float(effective_zoom),
+            "target_id": active_target_id,
+            "coasting": coasting,
+            "lead_ms": lead * 1000,
+            "velocity": velocity
+        }
+
+    def _update_multi(self, detections, frame_ts):
+        """
+        Multi-target update: viewports for every track (visible, or coasting with smoothing)
+        computed in one pass over arrays, up to max_targets of them (lowest IDs, always
+        including the primary; 0 for all). The primary viewport fills the usual fields; all of them go
+        in "viewports" as {"ids", "boxes" [[x, y, w, h], ...], "coasting", "velocity" [[vx, vy], ...]}.
+        """
+        W, H = self.resolution
+        ids = detections.ids
+        tracked = np.flatnonzero(ids >= 0) if ids is not None else np.zeros(0, dtype=int)
+        # No track IDs (empty scene, or none assigned): no measurements, tracks coast
+        tracked_ids = ids[tracked] if ids is not None else np.zeros(0, np.int64)
+        lead = 0.0
+        if self.smoothing:
+            seen = self.tracks.update(tracked_ids, detections.boxes[tracked], frame_ts, self.coast_time)
+            lead = self.latency if self.predict_latency else 0.0
+            track_ids = self.tracks.ids
+            cx, cy, target_h = self.tracks.predict(frame_ts + lead, self.max_lead).T
+            velocity = self.tracks.velocity[:, :2]
+            coasting = ~seen
+        else:
+            track_ids, first = np.unique(tracked_ids, return_index=True)
+            x1, y1, x2, y2 = detections.boxes[tracked[first]].astype(np.float64).T
+            cx, cy, target_h = (x1 + x2) / 2, (y1 + y2) / 2, y2 - y1
+            coasting = np.zeros(len(track_ids), bool)
+            velocity = np.zeros((len(track_ids), 2))
+
+        # Primary: the selected target, else stay on the auto-acquired one, else the lowest ID
+        primary = self.target_id
+        if primary is None:
+            if self.locked_id is not None and self.locked_id in track_ids:
+                primary = self.locked_id
+            elif len(track_ids):
+                primary = int(track_ids[0])
+            self.locked_id = primary
+        row = int(np.searchsorted(track_ids, primary)) if primary is not None else len(track_ids)
+        if row >= len(track_ids) or track_ids[row] != primary:
+            row = None
+
+        # Auto zoom (target at 80% of the crop height), smoothed per track
+        zoom = np.ones(len(track_ids))
+        np.divide(H, target_h * 1.25, out=zoom, where=target_h > 0)
+        zoom = np.clip(zoom, 1.0, self.max_zoom)
+        if self.smoothing:
+            self.tracks.zoom += self.zoom_alpha * (zoom - self.tracks.zoom)
+            zoom = self.tracks.zoom.copy()
+        if row is not None:
+            self.last_auto_zoom = float(zoom[row])
+            if self.manual_zoom_active:
+                zoom[row] = self.current_zoom
+
+        crop_h = H / zoom
+        crop_w = crop_h * TARGET_RATIO
+        crop_x = np.maximum(0, np.minimum(cx - crop_w / 2, W - crop_w))
+        crop_y = np.maximum(0, np.minimum(cy - crop_h / 2, H - crop_h))
+
+        limit = self.max_targets or len(track_ids)
+        keep = np.arange(len(track_ids)) < limit
+        if row is not None and not keep[row]:
+            keep[limit - 1] = False
+            keep[row] = True
+        boxes = np.column_stack((crop_x, crop_y, crop_w, crop_h))[keep].astype(int)
+
+        if row is not None:
+            x, y, w, h = (int(v) for v in (crop_x[row], crop_y[row], crop_w[row], crop_h[row]))
+            primary_zoom, primary_coasting = float(zoom[row]), bool(coasting[row])
+            primary_velocity = velocity[row].tolist()
+        else:
+            # No primary target in view: centered at the manual (or no) zoom
+            primary_zoom = self.current_zoom if self.manual_zoom_active else 1.0
+            h = H / primary_zoom
+            w = h * TARGET_RATIO
+            x, y = int(max(0, W / 2 - w / 2)), int(max(0, H / 2 - h / 2))
+            w, h = int(w), int(h)
+            primary_coasting = False
+            primary_velocity = [0.0, 0.0]
+        return {
+            "x": x,
+            "y": y,
+            "w": w,
+            "h": h,
+            "zoom": primary_zoom,
+            "target_id": primary,
+            "coasting": primary_coasting,
+            "lead_ms": lead * 1000,
+            "velocity": primary_velocity,
+            "viewports": {
+                "ids": track_ids[keep].tolist(),
+                "boxes": boxes.tolist(),
+                "coasting": coasting[keep].tolist(),
+                "velocity": velocity[keep].tolist(),
+            },
+        }
+
+    def _update_latency(self, now, sent_ts):
+        """
+        Track the lead the PC needs: when a reply arrives, its newest frame is about one MQTT
+        round trip newer than the frame the reply was computed from (the round trip assumed
+        twice the PC -> RPi hop). Needs NTP-synced clocks; implausible values are ignored.
+        """
+        if sent_ts is None:
+            return
+        sample = 2 * (now - sent_ts)
+        if 0 <= sample <= 2 * self.max_lead:
+            self.latency += 0.1 * (min(sample, self.max_lead) - self.latency)
+
+    def _update_filters(self, detections, tracked, frame_ts):
+        ids = detections.ids
+        for idx in tracked:
+            track_id = int(ids[idx])
+            f = self.filters.get(track_id)
+            if f is None:
+                self.filters[track_id] = AlphaBetaFilter(detections.boxes[idx], frame_ts, self.alpha, self.beta)
+            else:
+                f.update(detections.boxes[idx], frame_ts)
+
+        # Tracks unseen for longer than the grace period are released
+        for track_id in [t for t, f in self.filters.items() if frame_ts - f.last_seen > self.coast_time]:
+            del self.filters[track_id]
+
+    def set_target(self, target_id):
+        self.target_id = target_id
+
+    def handle_input(self, event):
+        """Handle joystick events from Sense HAT"""
+        # event is expected to have 'direction' and 'action'
+        if event.action in ['pressed', 'held']:
+            if event.direction == 'up':
+                # Tweak manual zoom -> start with automatic zoom
+                if not self.manual_zoom_active:
+                    self.current_zoom = self.last_auto_zoom
+                    self.manual_zoom_active = True
+                self.current_zoom = min(self.max_zoom, self.current_zoom + self.zoom_step)
+            elif event.direction == 'down':
+                # Tweak manual zoom
+                if not self.manual_zoom_active:
+                    self.current_zoom = self.last_auto_zoom
+                    self.manual_zoom_active = True
+                self.current_zoom = max(1.0, self.current_zoom - self.zoom_step)
+            elif event.direction == 'middle':
+                self.current_zoom = 1.0
+                self.manual_zoom_active = False
+                self.target_id = None
+                self.locked_id = None
+            elif event.direction == 'left':
+                self._cycle_target(reverse=True)
+            elif event.direction == 'right':
+                self._cycle_target(reverse=False)
+
+    def _cycle_target(self, reverse=False):
+        """Cycle through available target IDs from last detections"""
+        if not self.last_detections or self.last_detections.ids is None:
+            self.target_id = None
+            return
+
+        # Get all unique IDs from detections
+        all_ids = self.last_detections.ids
+        ids = np.unique(all_ids[all_ids >= 0]).tolist()
+
+        if not ids:
+            self.target_id = None
+            return
+
+        if self.target_id is None:
+            self.target_id = ids[0]
+        else:
+            try:
+                current_idx = ids.index(self.target_id)
+                if reverse:
+                    new_idx = (current_idx - 1) % len(ids)
+                else:
+                    new_idx = (current_idx + 1) % len(ids)
+                self.target_id = ids[new_idx]
+            except ValueError:
+                # Current target_id not in latest detections
+                self.target_id = ids[0]
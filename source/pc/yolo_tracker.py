@@ -1,23 +1,351 @@
-import cv2
+import threading
+import time
 
-from ultralytics import YOLO
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import YAML, IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+from flow_tracker import FlowPropagator
+from input_size_controller import InputSizeController
+from metrics import registry
+from model_backends import load_model
+from stream_ingest import make_grabber
 
 class YOLOTracker:
-    def __init__(self, config):
+    """
+    One model instance serving one or more cameras.
+    The freshest frame of every camera is gathered into a single batched model call, and each
+    camera keeps its own tracker state so track IDs never leak between streams.
+
+    With ROI mode enabled, a camera whose PTZ has locked a target is only searched inside an
+    expanded crop around the last PTZ viewport at a smaller input size; a full-frame sweep
+    runs every N frames and whenever the locked target is lost.
+
+    With detect-every-N enabled, the model only runs on every Nth frame of a camera; the
+    frames in between reuse the last tracked boxes (same IDs) moved by optical flow. N adapts
+    so that the average cost per frame fits the source frame interval, and a detection is
+    forced early when flow loses too many boxes.
+
+    With adaptive input size enabled, full-frame detections run at the size an
+    InputSizeController picks from measured inference time and the PTZ target's height.
+    """
+
+    def __init__(self, config, load=True):
+        self.config = config
         self.model_path = config['ai']['model_path']
         self.conf_threshold = config['ai']['conf_threshold']
         self.input_size = config['ai']['input_size']
+        self.tracker_config = config['ai'].get('tracker', "bytetrack.yaml")
+        self.capture_buffer = config['video'].get('capture_buffer', 1)
+        roi_config = config['ai'].get('roi', {})
+        self.roi_enabled = roi_config.get('enabled', False)
+        self.roi_input_size = roi_config.get('input_size', 480)
+        self.roi_margin = roi_config.get('margin', 1.6)
+        self.roi_sweep_every = roi_config.get('full_sweep_every', 10)
+        detect_config = config['ai'].get('detect_every', {})
+        self.detect_enabled = detect_config.get('enabled', False)
+        self.min_interval = max(1, detect_config.get('min_interval', 1))
+        self.max_interval = max(self.min_interval, detect_config.get('max_interval', 5))
+        self.min_tracked = detect_config.get('min_tracked', 0.75)
+        self.schedules = {}
+        self.sizer = InputSizeController(config)
+        self.last_input_sizes = {}
+        # Running averages of one model call and one flow step (ms)
+        self.detect_ms = None
+        self.flow_ms = None
+        self.grabbers = {}
+        self.trackers = {}
+        # camera -> (viewport, target_id), replaced whole by set_roi on the MQTT thread;
+        # the sweep / lost bookkeeping in rois is only touched by the inference thread
+        self.ptz_targets = {}
+        self.rois = {}
+        self.last_crops = {}
+        self.last_detected = {}
+        self.new_frame = threading.Event()
+        self.model = None
+        self.inference_ms = registry.histogram("inference_ms")
+        self.batch_size = registry.gauge("batch_size")
+        self.propagated_total = {}
+
+        # load=False defers loading to load(), e.g. to overlap it with connecting at startup
+        if load:
+            self.load()
 
-        # Load the YOLO model
-        print(f"Loading YOLO model from {self.model_path}")
-        self.model = YOLO(self.model_path)
+    def load(self):
+        # Load the YOLO model (converted for ai.backend / ai.precision if configured)
+        self.model = load_model(self.config)
 
-    def start(self, source):
-        return self.model.track(
-            source,
-            stream=True,
-            conf=self.conf_threshold,
+    def warmup(self, batch_size=1):
+        """
+        Run the model once on blank frames of the stream size (and on an ROI crop if ROI
+        mode is on), so the first real frames don't pay for kernel selection or graph
+        compilation. Returns the time taken in ms.
+        """
+        width, height = self.config['video']['resolution']
+        shapes = [((height, width, 3), size) for size in (self.sizer.sizes if self.sizer.enabled else [self.input_size])]
+        if self.roi_enabled:
+            shapes.append(((self.roi_input_size, self.roi_input_size, 3), self.roi_input_size))
+        start = time.perf_counter()
+        for shape, imgsz in shapes:
+            self.predict([np.zeros(shape, np.uint8)] * batch_size, imgsz)
+        return (time.perf_counter() - start) * 1000
+
+    def predict(self, images, imgsz=None, conf=None):
+        return self.model.predict(
+            images,
+            conf=conf or self.conf_threshold,
             classes=[0],
-            persist=True,
-            imgsz=self.input_size,
-            verbose=False)
\ No newline at end of file
+            imgsz=imgsz or self.input_size,
+            verbose=False)
+
+    def camera_tracker(self, camera_id):
+        if camera_id not in self.trackers:
+            cfg = IterableSimpleNamespace(**YAML.load(check_yaml(self.tracker_config)))
+            self.trackers[camera_id] = TRACKER_MAP[cfg.tracker_type](args=cfg)
+        return self.trackers[camera_id]
+
+    def update_tracks(self, camera_id, result):
+        """Run the camera's tracker on one result (same steps as Ultralytics' track callback)."""
+        tracker = self.camera_tracker(camera_id)
+        tracks = tracker.update(result.boxes.cpu().numpy(), result.orig_img)
+        if len(tracks) == 0:
+            # Hide new tracks until they are confirmed
+            if any(not t.is_activated for t in tracker.tracked_stracks):
+                return result[:0]
+            return result
+        result = result[tracks[:, -1].astype(int)]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1], device=result.boxes.data.device))
+        return result
+
+    def set_roi(self, camera_id, ptz_state):
+        """Latest PTZ state of a camera (viewport and locked target) for ROI inference."""
+        # One assignment, so a reader never pairs one message's viewport with another's target
+        viewport = (ptz_state.get('x'), ptz_state.get('y'), ptz_state.get('w'), ptz_state.get('h'))
+        self.ptz_targets[camera_id] = (viewport, ptz_state.get('target_id'))
+
+    def plan_roi(self, camera_id, image):
+        """Crop (x1, y1, x2, y2) to search in this frame, or None for a full-frame sweep."""
+        ptz_target = self.ptz_targets.get(camera_id)
+        if not self.roi_enabled or ptz_target is None:
+            return None
+        viewport, target_id = ptz_target
+        roi = self.rois.setdefault(camera_id, {"since_sweep": 0, "lost": True})
+        if target_id is None or roi["lost"] or None in viewport or roi["since_sweep"] >= self.roi_sweep_every:
+            roi["since_sweep"] = 0
+            return None
+        roi["since_sweep"] += 1
+
+        # Square crop around the viewport, expanded to absorb motion since it was computed
+        H, W = image.shape[:2]
+        x, y, w, h = viewport
+        side = min(max(w, h) * self.roi_margin, W, H)
+        x1 = int(min(max(0, x + w / 2 - side / 2), W - side))
+        y1 = int(min(max(0, y + h / 2 - side / 2), H - side))
+        return x1, y1, x1 + int(side), y1 + int(side)
+
+    def update_roi_status(self, camera_id, result):
+        roi = self.rois.get(camera_id)
+        _, target_id = self.ptz_targets.get(camera_id, (None, None))
+        if roi is None or target_id is None:
+            return
+        ids = result.boxes.id
+        roi["lost"] = ids is None or target_id not in ids.int().tolist()
+
+    def predict_crops(self, images, crops):
+        """Predict on crops at the ROI input size and map the boxes back to full-frame results."""
+        results = self.predict([img[y1:y2, x1:x2] for img, (x1, y1, x2, y2) in zip(images, crops)],
+                               self.roi_input_size)
+        mapped = []
+        for image, (x1, y1, _, _), r in zip(images, crops, results):
+            data = r.boxes.data.clone()
+            data[:, [0, 2]] += x1
+            data[:, [1, 3]] += y1
+            mapped.append(Results(image, path=r.path, names=r.names, boxes=data, speed=r.speed))
+        return mapped
+
+    @staticmethod
+    def ewma(average, value, alpha=0.2):
+        return value if average is None else average + alpha * (value - average)
+
+    def detect_interval(self, schedule):
+        """Frames per detection so that (detect + (N - 1) * flow) / N fits the frame interval."""
+        interval = schedule["frame_ms"]
+        if not self.detect_enabled:
+            return 1
+        if interval is None or self.detect_ms is None:
+            return self.max_interval if self.min_interval == self.max_interval else self.min_interval
+        flow_ms = self.flow_ms or 0.0
+        if interval <= flow_ms:
+            return self.max_interval
+        n = int(np.ceil((self.detect_ms - flow_ms) / (interval - flow_ms)))
+        return int(np.clip(n, self.min_interval, self.max_interval))
+
+    def needs_detection(self, camera_id, stamp=None):
+        schedule = self.schedules.setdefault(camera_id, {
+            "flow": FlowPropagator(), "result": None, "since_detect": 0, "force": True,
+            "frame_ms": None, "last_stamp": None})
+        if stamp is not None:
+            # Source frame interval from (seq, capture_ts): skipped frames don't inflate it
+            last = schedule["last_stamp"]
+            if last is not None and stamp[0] > last[0]:
+                schedule["frame_ms"] = self.ewma(schedule["frame_ms"], (stamp[1] - last[1]) * 1000 / (stamp[0] - last[0]))
+            schedule["last_stamp"] = stamp
+        if not self.detect_enabled or schedule["force"] or schedule["result"] is None:
+            return True
+        return schedule["since_detect"] + 1 >= self.detect_interval(schedule)
+
+    def propagate(self, camera_id, image):
+        """Last tracked result of the camera moved onto image by optical flow."""
+        schedule = self.schedules[camera_id]
+        last = schedule["result"]
+        boxes, ok = schedule["flow"].propagate(image)
+        data = last.boxes.data.clone()
+        data[:, :4] = torch.as_tensor(boxes, dtype=data.dtype, device=data.device)
+        schedule["since_detect"] += 1
+        schedule["force"] = len(ok) > 0 and ok.mean() < self.min_tracked
+        return Results(image, path=last.path, names=last.names, boxes=data)
+
+    def track_batch(self, images, camera_ids, stamps=None):
+        """
+        Track one frame per camera. stamps (optional) holds each frame's (seq, capture_ts) and
+        lets detect-every-N adapt to the source frame rate.
+        """
+        stamps = stamps or [None] * len(images)
+        detect = [self.needs_detection(cid, stamp) for cid, stamp in zip(camera_ids, stamps)]
+        results = [None] * len(images)
+        crops = [None] * len(images)
+
+        det = [i for i, d in enumerate(detect) if d]
+        if det:
+            start = time.perf_counter()
+            tracked, det_crops = self.detect_batch([images[i] for i in det], [camera_ids[i] for i in det])
+            self.detect_ms = self.ewma(self.detect_ms, (time.perf_counter() - start) * 1000)
+            for i, r, crop in zip(det, tracked, det_crops):
+                results[i], crops[i] = r, crop
+                schedule = self.schedules[camera_ids[i]]
+                schedule["flow"].reset(images[i], r.boxes.xyxy.cpu().numpy())
+                schedule.update(result=r, since_detect=0, force=False)
+
+        for i, d in enumerate(detect):
+            if not d:
+                start = time.perf_counter()
+                results[i] = self.propagate(camera_ids[i], images[i])
+                self.flow_ms = self.ewma(self.flow_ms, (time.perf_counter() - start) * 1000)
+
+        self.last_crops = dict(zip(camera_ids, crops))
+        self.last_detected = dict(zip(camera_ids, detect))
+        return results
+
+    def detect_batch(self, images, camera_ids):
+        """Run the model (full frame or ROI crop per camera) and the trackers; returns (results, crops)."""
+        crops = [self.plan_roi(cid, img) for cid, img in zip(camera_ids, images)]
+        results = [None] * len(images)
+
+        # Full-frame sweeps and ROI crops use different input sizes: one batched call each
+        full = [i for i, c in enumerate(crops) if c is None]
+        roi = [i for i, c in enumerate(crops) if c is not None]
+        size = self.sizer.size if self.sizer.enabled else self.input_size
+        if full:
+            start = time.perf_counter()
+            for i, r in zip(full, self.predict([images[i] for i in full], size,
+                                               self.sizer.conf if self.sizer.enabled else None)):
+                results[i] = r
+            full_ms = (time.perf_counter() - start) * 1000
+        if roi:
+            for i, r in zip(roi, self.predict_crops([images[i] for i in roi], [crops[i] for i in roi])):
+                results[i] = r
+
+        tracked = []
+        for cid, r, crop in zip(camera_ids, results, crops):
+            r = self.update_tracks(cid, r)
+            self.update_roi_status(cid, r)
+            tracked.append(r)
+            self.last_input_sizes[cid] = size if crop is None else self.roi_input_size
+        if full and self.sizer.enabled:
+            self.sizer.observe(full_ms, *self.target_height([camera_ids[i] for i in full], [tracked[i] for i in full]))
+        return tracked, crops
+
+    def target_height(self, camera_ids, results):
+        """
+        Smallest PTZ target height among these cameras' results and the longer frame side,
+        for the input size controller; (None, None) if a camera has no target in view.
+        """
+        heights = []
+        for cid, r in zip(camera_ids, results):
+            _, target_id = self.ptz_targets.get(cid, (None, None))
+            ids = r.boxes.id
+            if target_id is None or ids is None:
+                return None, None
+            match = (ids.int() == target_id).nonzero()
+            if not len(match):
+                return None, None
+            x1, y1, x2, y2 = r.boxes.xyxy[match[0, 0]].tolist()
+            heights.append(y2 - y1)
+        if not heights:
+            return None, None
+        return min(heights), max(results[0].orig_shape)
+
+    def track(self, image, camera_id=None, stamp=None):
+        return self.track_batch([image], [camera_id], [stamp])[0]
+
+    def start(self, sources, realtime=None, drop=True):
+        """
+        Decode each source on a dedicated capture thread and track the freshest frame of every
+        camera each time the model is free. sources maps camera ID -> URL/file (a plain string
+        is a single camera without ID). Yields (camera_id, frame_info, result); frames decoded
+        while the model was busy are dropped and counted in frame_info['dropped'].
+        realtime / drop are passed to the frame grabbers (offline replay: realtime=False, drop=False).
+        """
+        if isinstance(sources, str):
+            sources = {None: sources}
+        for camera_id, source in sources.items():
+            grabber = make_grabber(self.config, source, self.capture_buffer, realtime, self.new_frame, drop)
+            grabber.start()
+            self.grabbers[camera_id] = grabber
+            self.propagated_total[camera_id] = registry.counter("frames_propagated_total", camera=camera_id)
+        return self.track_streams()
+
+    def track_streams(self):
+        while True:
+            self.new_frame.clear()
+            batch = []
+            for camera_id, grabber in self.grabbers.items():
+                frame = grabber.poll()
+                if frame is not None:
+                    batch.append((camera_id, frame))
+
+            if not batch:
+                if all(g.finished for g in self.grabbers.values()):
+                    return
+                self.new_frame.wait(0.1)
+                continue
+
+            start = time.time()
+            results = self.track_batch([f["image"] for _, f in batch], [cid for cid, _ in batch],
+                                       [(f["seq"], f["capture_ts"]) for _, f in batch])
+            inference_ms = (time.time() - start) * 1000
+            self.inference_ms.observe(inference_ms)
+            self.batch_size.set(len(batch))
+            for (camera_id, frame), result in zip(batch, results):
+                if not self.last_detected.get(camera_id, True):
+                    self.propagated_total[camera_id].inc()
+                frame_info = {
+                    "seq": frame["seq"],
+                    "capture_ts": frame["capture_ts"],
+                    "decode_ms": frame["decode_ms"],
+                    "inference_ms": inference_ms,
+                    "batch_size": len(batch),
+                    "roi": self.last_crops.get(camera_id),
+                    "detected": self.last_detected.get(camera_id, True),
+                    "dropped": self.grabbers[camera_id].dropped,
+                }
+                if self.sizer.enabled:
+                    frame_info["input_size"] = self.last_input_sizes.get(camera_id, self.sizer.size)
+                yield camera_id, frame_info, result
+
+    def stop(self):
+        for grabber in self.grabbers.values():
+            grabber.stop()
@@ -0,0 +1,156 @@
+import fcntl
+import struct
+import termios
+import threading
+import time
+
+def send_queue_bytes(sock):
+    """Bytes written to a TCP socket but not yet acknowledged by the peer (Linux TIOCOUTQ)."""
+    try:
+        return struct.unpack("i", fcntl.ioctl(sock.fileno(), termios.TIOCOUTQ, b"\0\0\0\0"))[0]
+    except OSError:
+        return 0
+
+class BitrateController:
+    """
+    Adapts the encoder to the link from viewer backpressure.
+    Each send reports how much video is queued for its viewer (kernel send queue plus frames
+    waiting in the ring, in milliseconds of video), how long the send blocked and how many
+    bytes the viewer has acknowledged so far. Once per interval the worst viewer decides:
+      * congested (above high_queue_ms): bitrate drops by step_down, or to 85% of the rate
+        the viewer actually received if that is lower, keyframes are spread out, and below
+        min_bitrate the next lower resolution is used; no further cut while the queue is
+        draining or the viewer receives at least the current bitrate
+      * clear (below low_queue_ms for up_after intervals): bitrate creeps back up, and at the
+        current resolution's ceiling the next higher resolution is tried
+    Resolution changes restart the camera, so they are held for at least resolution_hold_s.
+    """
+
+    def __init__(self, config, on_change=None):
+        video = config['video']
+        adaptive = video.get('adaptive', {})
+        self.enabled = adaptive.get('enabled', False)
+        self.min_bitrate = adaptive.get('min_bitrate', 250000)
+        self.max_bitrate = adaptive.get('max_bitrate', 4000000)
+        self.high_ms = adaptive.get('high_queue_ms', 200)
+        self.low_ms = adaptive.get('low_queue_ms', 50)
+        self.interval = adaptive.get('interval_s', 1.0)
+        self.step_down = adaptive.get('step_down', 0.7)
+        self.step_up = adaptive.get('step_up', 1.1)
+        self.up_after = adaptive.get('up_after', 3)
+        self.resolution_hold = adaptive.get('resolution_hold_s', 10.0)
+        self.fps = video.get('fps', 30)
+        self.base_keyframe_interval = video.get('keyframe_interval', 30)
+
+        # Resolution ladder, largest first; starts at the configured resolution
+        ladder = [tuple(r) for r in adaptive.get('resolutions', [video['resolution']])]
+        if tuple(video['resolution']) not in ladder:
+            ladder.append(tuple(video['resolution']))
+        self.ladder = sorted(ladder, key=lambda r: r[0] * r[1], reverse=True)
+        self.rung = self.ladder.index(tuple(video['resolution']))
+
+        self.params = {
+            "bitrate": video.get('bitrate', 1000000),
+            "resolution": list(self.ladder[self.rung]),
+            "keyframe_interval": self.base_keyframe_interval,
+            "version": 0,
+        }
+        self.on_change = on_change
+        self.lock = threading.Lock()
+        self.worst_ms = 0.0
+        self.last_worst_ms = 0.0
+        # viewer -> (time, acknowledged bytes) at the start and end of the current interval
+        self.delivery = {}
+        self.clear_intervals = 0
+        self.last_decision = time.monotonic()
+        self.last_resolution_change = 0.0
+
+    def rung_ceiling(self, rung):
+        """Bitrate ceiling of a ladder rung, scaled by its pixel count."""
+        W, H = self.ladder[rung]
+        W0, H0 = self.ladder[0]
+        return self.max_bitrate * (W * H) / (W0 * H0)
+
+    def observe(self, viewer, sent_bytes, queued_bytes, send_ms, frames_behind=0):
+        """Backpressure sample from one viewer send (sent_bytes: total written to its socket)."""
+        if not self.enabled:
+            return
+        queue_ms = queued_bytes * 8 / self.params["bitrate"] * 1000 + frames_behind * 1000 / self.fps
+        sample = (time.monotonic(), sent_bytes - queued_bytes)
+        with self.lock:
+            self.worst_ms = max(self.worst_ms, queue_ms, send_ms)
+            first, _ = self.delivery.get(viewer, (sample, None))
+            self.delivery[viewer] = (first, sample)
+        self.tick()
+
+    def delivered_rate(self, now):
+        """Lowest bits/s received by a viewer over the last interval (None if unknown)."""
+        rates = []
+        for (t0, acked0), (t1, acked1) in self.delivery.values():
+            if t1 - t0 >= self.interval / 2:
+                rates.append((acked1 - acked0) * 8 / (t1 - t0))
+        # The next interval starts where this one ended; viewers that went quiet are forgotten
+        self.delivery = {v: (last, last) for v, (_, last) in self.delivery.items() if now - last[0] < 2 * self.interval}
+        return min(rates) if rates else None
+
+    def tick(self, now=None):
+        """Make a decision if an interval has passed; returns the new params if they changed."""
+        now = now or time.monotonic()
+        with self.lock:
+            if not self.enabled or now - self.last_decision < self.interval:
+                return None
+            self.last_decision = now
+            worst, self.worst_ms = self.worst_ms, 0.0
+            params = self.decide(worst, now, self.delivered_rate(now))
+            self.last_worst_ms = worst
+        if params and self.on_change:
+            self.on_change(dict(params))
+        return params
+
+    def decide(self, worst_ms, now, delivered=None):
+        bitrate, rung = self.params["bitrate"], self.rung
+        keyframe_interval = self.base_keyframe_interval
+        can_switch = now - self.last_resolution_change >= self.resolution_hold
+
+        if worst_ms > self.high_ms:
+            self.clear_intervals = 0
+            if worst_ms < self.last_worst_ms * 0.8 or (delivered and delivered >= bitrate):
+                # The link already carries the current bitrate and the queue is draining:
+                # give it time instead of cutting again
+                return None
+            # Cut at least by step_down, and below what actually got through
+            bitrate *= self.step_down
+            if delivered:
+                bitrate = min(bitrate, delivered * 0.85)
+            keyframe_interval = self.base_keyframe_interval * 2
+            if bitrate < self.min_bitrate:
+                bitrate = self.min_bitrate
+                if can_switch and rung < len(self.ladder) - 1:
+                    rung += 1
+        elif worst_ms < self.low_ms:
+            self.clear_intervals += 1
+            if self.clear_intervals < self.up_after:
+                return None
+            self.clear_intervals = 0
+            ceiling = self.rung_ceiling(rung)
+            if bitrate >= ceiling and can_switch and rung > 0:
+                rung -= 1
+            bitrate = min(bitrate * self.step_up, self.rung_ceiling(rung))
+        else:
+            # In between: hold
+            self.clear_intervals = 0
+            return None
+
+        bitrate = int(max(self.min_bitrate, min(bitrate, self.max_bitrate)))
+        if rung != self.rung:
+            self.last_resolution_change = now
+            self.rung = rung
+        params = {
+            "bitrate": bitrate,
+            "resolution": list(self.ladder[rung]),
+            "keyframe_interval": keyframe_interval,
+        }
+        if all(self.params[k] == v for k, v in params.items()):
+            return None
+        self.params = dict(params, version=self.params["version"] + 1)
+        return self.params
@@ -1,78 +1,238 @@
-import time
 import socket
 import threading
+import time
+from collections import deque
+
+from bitrate_controller import BitrateController, send_queue_bytes
+from h264_source import make_source, split_nals, nal_type, NAL_IDR, NAL_SPS, NAL_PPS
+from metrics import registry
+
+class StreamFanout:
+    """
+    Ring buffer of encoded frames shared by all viewers.
+    The encoder appends without ever waiting on a socket; each viewer reads at its own cursor
+    (absolute frame index) and is dropped once the ring has overwritten frames it hasn't sent.
+    The latest SPS/PPS and keyframe position are kept so late joiners start on a decodable frame,
+    and a lagging viewer can jump to it instead of catching up on stale video.
+    """
+
+    def __init__(self, capacity=120, max_lag=None):
+        self.frames = deque(maxlen=max(2, int(capacity)))
+        # A viewer further behind than max_lag frames skips ahead to the newest keyframe
+        self.max_lag = max_lag
+        self.first = 0
+        self.keyframe = None
+        self.headers = {}
+        self.cond = threading.Condition()
+        self.closed = False
+        self.written = 0
+        self.frames_total = registry.counter("stream_frames_total")
+        self.bytes_total = registry.counter("stream_encoded_bytes_total")
+
+    @property
+    def end(self):
+        return self.first + len(self.frames)
+
+    def write(self, data):
+        """Append one encoded frame (called from the encoder thread)."""
+        keyframe = False
+        for nal in split_nals(data):
+            t = nal_type(nal)
+            if t in (NAL_SPS, NAL_PPS):
+                self.headers[t] = nal
+            elif t == NAL_IDR:
+                keyframe = True
+        with self.cond:
+            if len(self.frames) == self.frames.maxlen:
+                self.first += 1
+                if self.keyframe is not None and self.keyframe < self.first:
+                    self.keyframe = None
+            self.frames.append(data)
+            if keyframe:
+                self.keyframe = self.end - 1
+            self.written += 1
+            self.cond.notify_all()
+        self.frames_total.inc()
+        self.bytes_total.inc(len(data))
+
+    def join(self):
+        """Stream headers (SPS + PPS) and start cursor for a new viewer: the latest keyframe, or None to wait for one."""
+        with self.cond:
+            headers = b"".join(self.headers[t] for t in (NAL_SPS, NAL_PPS) if t in self.headers)
+            return headers, self.keyframe
 
-from picamera2 import Picamera2
-from picamera2.encoders import H264Encoder
-from picamera2.outputs import FileOutput
+    def read(self, cursor, timeout=1.0):
+        """
+        Frames from cursor to the newest one, and the new cursor. Returns ([], cursor) on
+        timeout and (None, cursor) if the viewer fell behind the ring (or the fanout closed).
+        """
+        with self.cond:
+            if cursor is None:
+                # Late joiner that arrived before any keyframe: wait for the next one
+                if not self.cond.wait_for(lambda: self.keyframe is not None or self.closed, timeout):
+                    return [], None
+                cursor = self.keyframe
+            if not self.cond.wait_for(lambda: cursor < self.end or self.closed, timeout):
+                return [], cursor
+            if self.closed or cursor < self.first:
+                return None, cursor
+            if self.max_lag and self.end - cursor > self.max_lag and self.keyframe is not None and self.keyframe > cursor:
+                cursor = self.keyframe
+            return list(self.frames)[cursor - self.first:], self.end
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
 
 class CameraStream:
-    def __init__(self, config):
+    """
+    TCP server broadcasting one H.264 encode to any number of viewers (PC, recorders...).
+    Viewers can connect, disconnect and reconnect at any time; a viewer that can't keep up
+    is disconnected instead of stalling the encoder or the other viewers.
+    Backpressure from the viewers drives the adaptive bitrate controller; on_encoding (if set)
+    is called with the new encoding params after the source has been reconfigured.
+    start(encode=False) only opens the server; the encoder starts with start_encoder(), e.g.
+    once the PC has announced it is ready.
+    """
+
+    def __init__(self, config, source=None, on_encoding=None):
         self.host = config['video']['host']
         self.port = config['video']['port']
-        self.resolution = tuple(config['video']['resolution'])
+        self.send_timeout = config['video'].get('send_timeout', 2.0)
+        # Small kernel send buffer: a stalled viewer is noticed quickly instead of queueing seconds of video
+        self.send_buffer = config['video'].get('send_buffer', 262144)
+        self.source = source or make_source(config)
+        self.fanout = StreamFanout(config['video'].get('ring_frames', 120), config['video'].get('max_viewer_lag', 15))
+        self.controller = BitrateController(config, on_change=self.apply_encoding)
+        self.on_encoding = on_encoding
 
         self.running = False
+        self.encoding_started = False
+        self.encoder_lock = threading.Lock()
         self.thread = None
         self.server_socket = None
-        self.client_socket = None
+        self.clients = {}
+        self.clients_lock = threading.Lock()
+        self.dropped_clients = 0
+        self.viewers_gauge = registry.gauge("stream_viewers")
+        self.viewers_dropped = registry.counter("stream_viewers_dropped_total")
+        self.bytes_sent = registry.counter("stream_bytes_sent_total")
 
-    def start(self):
+    def start(self, encode=True):
         self.running = True
+        # Bind before returning so viewers can connect as soon as start() is done
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen()
+        self.port = self.server_socket.getsockname()[1]
         self.thread = threading.Thread(target=self.stream_loop)
         self.thread.daemon = True
         self.thread.start()
+        if encode:
+            self.start_encoder()
+
+    def start_encoder(self):
+        """Start encoding (beginning with a keyframe), or force a fresh keyframe if already encoding."""
+        with self.encoder_lock:
+            if not self.running:
+                return
+            if self.encoding_started:
+                self.source.request_keyframe()
+                return
+            self.encoding_started = True
+            self.source.start(self.fanout.write)
 
     def stop(self):
-        self.running = False
+        with self.encoder_lock:
+            self.running = False
+        if self.server_socket:
+            # Wakes the blocking accept() in stream_loop
+            try:
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.source.stop()
+        self.fanout.close()
         if self.thread:
             self.thread.join()
+        with self.clients_lock:
+            clients = list(self.clients.values())
+        for thread in clients:
+            thread.join()
+
+    @property
+    def encoding(self):
+        return dict(self.controller.params)
+
+    def apply_encoding(self, params):
+        print(f"Encoding: {params['resolution'][0]}x{params['resolution'][1]} @ {params['bitrate'] / 1e6:.2f} Mbps, "
+              f"keyframe every {params['keyframe_interval']}")
+        self.source.reconfigure(params)
+        if self.on_encoding:
+            self.on_encoding(params)
 
     def stream_loop(self):
         print(f"Starting video stream on {self.host}:{self.port}")
-        
-        picam2 = Picamera2()
         try:
-            video_config = picam2.create_video_configuration({"size": self.resolution})
-            picam2.configure(video_config)
-            encoder = H264Encoder(1000000)
-
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen()
-            
-            print("Waiting for stream connection...")
-            self.server_socket.settimeout(1.0)
-            
             while self.running:
                 try:
-                    self.client_socket, addr = self.server_socket.accept()
-                    print(f"Connection from {addr}")
-                    break
-                except socket.timeout:
-                    continue
-            
-            if not self.running:
-                return
-
-            picam2.encoders = encoder
-            stream = self.client_socket.makefile("wb")
-            encoder.output = FileOutput(stream)
-            
-            picam2.start_encoder(encoder)
-            picam2.start()
-            
-            while self.running:
-                time.sleep(0.1)
-                
-            picam2.stop()
-            picam2.stop_encoder()
-            
+                    conn, addr = self.server_socket.accept()
+                except OSError:
+                    if not self.running:
+                        break
+                    raise
+                print(f"Connection from {addr}")
+                thread = threading.Thread(target=self.serve_client, args=(conn, addr))
+                thread.daemon = True
+                with self.clients_lock:
+                    self.clients[addr] = thread
+                    self.viewers_gauge.set(len(self.clients))
+                thread.start()
         except Exception as e:
             print(f"Streaming error: {e}")
         finally:
-            if self.client_socket:
-                self.client_socket.close()
-            if self.server_socket:
-                self.server_socket.close()
\ No newline at end of file
+            self.server_socket.close()
+
+    def serve_client(self, conn, addr):
+        conn.settimeout(self.send_timeout)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        headers, cursor = self.fanout.join()
+        try:
+            sent_headers = False
+            sent = 0
+            while self.running:
+                frames, cursor = self.fanout.read(cursor)
+                if frames is None:
+                    if self.running:
+                        print(f"Dropping slow viewer {addr}")
+                        self.dropped_clients += 1
+                        self.viewers_dropped.inc()
+                    break
+                if not frames:
+                    continue
+                if not sent_headers:
+                    if not headers:
+                        headers = self.fanout.join()[0]
+                    frames = [headers] + frames
+                    sent_headers = True
+                start = time.monotonic()
+                data = b"".join(frames)
+                conn.sendall(data)
+                sent += len(data)
+                self.bytes_sent.inc(len(data))
+                self.controller.observe(addr, sent, send_queue_bytes(conn), (time.monotonic() - start) * 1000,
+                                        len(frames) - 1)
+        except socket.timeout:
+            print(f"Dropping stalled viewer {addr}")
+            self.dropped_clients += 1
+            self.viewers_dropped.inc()
+        except OSError as e:
+            print(f"Viewer {addr} disconnected: {e}")
+        finally:
+            conn.close()
+            with self.clients_lock:
+                self.clients.pop(addr, None)
+                self.viewers_gauge.set(len(self.clients))
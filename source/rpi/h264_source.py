@@ -0,0 +1,177 @@
+import threading
+import time
+
+try:
+    from picamera2 import Picamera2
+    from picamera2.encoders import H264Encoder
+    from picamera2.outputs import FileOutput
+except ImportError:
+    # Not a Pi: only the file-backed source is available
+    Picamera2 = None
+
+NAL_IDR = 5
+NAL_SPS = 7
+NAL_PPS = 8
+VCL_TYPES = (1, 5)
+
+def split_nals(data):
+    """Split an Annex-B chunk into NAL units, each keeping its start code."""
+    starts = []
+    pos = data.find(b"\x00\x00\x01")
+    while pos >= 0:
+        # 4-byte start code: the unit begins at the leading zero
+        starts.append(pos - 1 if pos > 0 and data[pos - 1] == 0 else pos)
+        pos = data.find(b"\x00\x00\x01", pos + 3)
+    return [data[s:e] for s, e in zip(starts, starts[1:] + [len(data)])]
+
+def nal_type(nal):
+    return nal[nal.index(b"\x00\x01") + 2] & 0x1F
+
+def access_units(data):
+    """Group the NAL units of a raw H.264 stream into access units (one per frame, one slice per frame)."""
+    unit, has_vcl = [], False
+    for nal in split_nals(data):
+        is_vcl = nal_type(nal) in VCL_TYPES
+        if unit and has_vcl:
+            # A non-VCL unit after a slice, or a second slice, starts the next frame
+            yield b"".join(unit)
+            unit, has_vcl = [], False
+        unit.append(nal)
+        has_vcl = has_vcl or is_vcl
+    if unit:
+        yield b"".join(unit)
+
+class SinkWriter:
+    """File-like adapter handing every encoder write (one encoded frame) to a callback."""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def write(self, data):
+        self.sink(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+class PicameraSource:
+    """Camera Module + hardware H.264 encoder, encoded once for all viewers."""
+
+    def __init__(self, config):
+        self.resolution = tuple(config['video']['resolution'])
+        self.bitrate = config['video'].get('bitrate', 1000000)
+        self.keyframe_interval = config['video'].get('keyframe_interval', 30)
+        self.picam2 = None
+        self.encoder = None
+        self.sink = None
+        self.lock = threading.Lock()
+
+    def start(self, sink):
+        if Picamera2 is None:
+            print("picamera2 is not available; set video.source_file to stream an H.264 file instead")
+            return
+        self.sink = sink
+        self.picam2 = Picamera2()
+        self.configure_camera()
+        self.start_encoder()
+        self.picam2.start()
+
+    def configure_camera(self):
+        video_config = self.picam2.create_video_configuration({"size": self.resolution})
+        self.picam2.configure(video_config)
+
+    def start_encoder(self):
+        # Short GOP with repeated headers so late joiners don't wait long for a keyframe
+        self.encoder = H264Encoder(self.bitrate, repeat=True, iperiod=self.keyframe_interval)
+        self.encoder.output = FileOutput(SinkWriter(self.sink))
+        self.picam2.start_encoder(self.encoder)
+
+    def reconfigure(self, params):
+        """Apply new encoding params: the encoder restarts, the camera only on a resolution change."""
+        if self.picam2 is None:
+            return
+        with self.lock:
+            resolution = tuple(params.get('resolution', self.resolution))
+            self.bitrate = params.get('bitrate', self.bitrate)
+            self.keyframe_interval = params.get('keyframe_interval', self.keyframe_interval)
+            self.picam2.stop_encoder()
+            if resolution != self.resolution:
+                self.resolution = resolution
+                self.picam2.stop()
+                self.configure_camera()
+                self.start_encoder()
+                self.picam2.start()
+            else:
+                self.start_encoder()
+
+    def request_keyframe(self):
+        """Restart the encoder, which begins with a keyframe (and SPS/PPS)."""
+        if self.picam2 is None:
+            return
+        with self.lock:
+            self.picam2.stop_encoder()
+            self.start_encoder()
+
+    def stop(self):
+        if self.picam2:
+            self.picam2.stop()
+            self.picam2.stop_encoder()
+            self.picam2.close()
+            self.picam2 = None
+
+class FileH264Source:
+    """Raw H.264 (Annex-B) file replayed frame by frame at a fixed fps, for running without a camera."""
+
+    def __init__(self, path, fps=30, loop=True):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.running = False
+        self.restart = False
+        self.thread = None
+
+    def start(self, sink):
+        with open(self.path, "rb") as f:
+            units = list(access_units(f.read()))
+        self.running = True
+        self.thread = threading.Thread(target=self.play_loop, args=(units, sink))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def play_loop(self, units, sink):
+        period = 1.0 / self.fps
+        next_due = time.monotonic()
+        while self.running:
+            self.restart = False
+            for unit in units:
+                if not self.running:
+                    return
+                if self.restart:
+                    break
+                wait = next_due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                next_due += period
+                sink(unit)
+            else:
+                if not self.loop:
+                    return
+
+    def reconfigure(self, params):
+        # Pre-encoded: nothing to change
+        pass
+
+    def request_keyframe(self):
+        # The file starts with a keyframe: play it again from the start
+        self.restart = True
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+def make_source(config):
+    path = config['video'].get('source_file')
+    if path:
+        return FileH264Source(path, config['video'].get('fps', 30))
+    return PicameraSource(config)
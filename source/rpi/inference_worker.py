@@ -0,0 +1,131 @@
+import threading
+import time
+
+import numpy as np
+
+from metrics import registry
+
+class LatestMailbox:
+    """Holds only the newest item; an item replaced before it was taken counts as dropped."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.closed = False
+        self.dropped = 0
+        self.coalesced_total = registry.counter("inference_coalesced_total")
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                self.dropped += 1
+                self.coalesced_total.inc()
+            self.item = item
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Newest item, or None after timeout or once closed."""
+        with self.cond:
+            if self.item is None and not self.closed:
+                self.cond.wait(timeout)
+            item, self.item = self.item, None
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+class InferenceWorker:
+    """
+    Handles inference messages on its own thread so the MQTT network thread only drops them
+    into a mailbox. Messages that arrive while one is being handled are coalesced: only the
+    newest is handled next. on_idle runs when no message came in for idle_interval seconds.
+    """
+
+    def __init__(self, handler, on_idle=None, idle_interval=0.05):
+        self.handler = handler
+        self.on_idle = on_idle
+        self.idle_interval = idle_interval
+        self.mailbox = LatestMailbox()
+        self.running = False
+        self.thread = None
+        self.processed = 0
+        self.handler_ms = registry.histogram("inference_handler_ms")
+        self.messages_total = registry.counter("inference_messages_total")
+
+    @property
+    def dropped(self):
+        return self.mailbox.dropped
+
+    def submit(self, payload, received_ts=None):
+        # Stamped on arrival so latency estimates don't depend on how long the message waited
+        self.messages_total.inc()
+        self.mailbox.put((payload, received_ts or time.time()))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.work_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def work_loop(self):
+        while self.running:
+            item = self.mailbox.get(self.idle_interval)
+            if item is None:
+                if self.running and self.on_idle:
+                    self.on_idle()
+                continue
+            start = time.perf_counter()
+            try:
+                self.handler(*item)
+            except Exception as e:
+                print(f"Failed to handle inference message: {e}")
+            self.handler_ms.observe((time.perf_counter() - start) * 1000)
+            self.processed += 1
+
+    def stop(self):
+        self.running = False
+        self.mailbox.close()
+        if self.thread:
+            self.thread.join()
+
+class PTZDeadBand:
+    """
+    Suppresses PTZ publishes whose viewport moved less than dead_band_px (center and size)
+    since the last one sent. Target and coasting changes always go out, and
+    keepalive_s bounds how long a still viewport stays silent. In multi-target mode every
+    viewport is compared (position and size) and a change in the set of targets goes out.
+    """
+
+    def __init__(self, config):
+        ptz_config = config.get('ptz', {})
+        self.dead_band = ptz_config.get('dead_band_px', 0)
+        self.keepalive = ptz_config.get('keepalive_s', 1.0)
+        self.last = None
+        self.last_sent = 0.0
+        self.suppressed = 0
+        self.suppressed_total = registry.counter("ptz_publishes_suppressed_total")
+
+    def should_publish(self, ptz_cmd, now=None):
+        now = now or time.time()
+        last = self.last
+        if last is not None and now - self.last_sent < self.keepalive \
+                and ptz_cmd['target_id'] == last['target_id'] and ptz_cmd['coasting'] == last['coasting']:
+            moved = max(abs((ptz_cmd['x'] + ptz_cmd['w'] / 2) - (last['x'] + last['w'] / 2)),
+                        abs((ptz_cmd['y'] + ptz_cmd['h'] / 2) - (last['y'] + last['h'] / 2)),
+                        abs(ptz_cmd['w'] - last['w']), abs(ptz_cmd['h'] - last['h']))
+            if moved < self.dead_band and 'viewports' in ptz_cmd:
+                # Multi-target: the other viewports must be still as well
+                viewports, last_viewports = ptz_cmd['viewports'], last.get('viewports') or {}
+                if viewports['ids'] != last_viewports.get('ids') or viewports['coasting'] != last_viewports.get('coasting'):
+                    moved = self.dead_band
+                elif viewports['ids']:
+                    moved = np.abs(np.subtract(viewports['boxes'], last_viewports['boxes'])).max()
+            if moved < self.dead_band:
+                self.suppressed += 1
+                self.suppressed_total.inc()
+                return False
+        self.last = ptz_cmd
+        self.last_sent = now
+        return True
@@ -1,52 +1,150 @@
+import asyncio
+import threading
 import time
 
 from camera_stream import CameraStream
 from virtual_ptz import VirtualPTZ
 from sense_hat_interface import SenseHatInterface
 from mqtt_client import MQTTClient
+from inference_worker import InferenceWorker, PTZDeadBand
+from metrics import MetricsExporter
+from runtime import RPiRuntime
 from utils import load_config
 
-def main():
-    print("Starting RPi Virtual PTZ system...")
-    
-    config = load_config()
-    if not config:
-        return
+def process_inference(payload, ptz, sense_hat, mqtt, received_ts=None, dead_band=None):
+    """
+    Compute PTZ for one inference message and publish it, echoing the frame identity.
+    received_ts defaults to now (a replay passes the recorded arrival time). With a
+    PTZDeadBand, viewports that barely moved are not published.
+    """
+    received_ts = received_ts or time.time()
+    detections = payload.get('detections', [])
 
-    # Initialize components
-    camera = CameraStream(config)
-    ptz = VirtualPTZ(config)
-    sense_hat = SenseHatInterface(config)
-    mqtt = MQTTClient(config)
+    # Answer even with no detections so the PC can match frames to viewports
+    ptz_cmd = ptz.update(detections, payload.get('capture_ts'), payload.get('sent_ts'), received_ts)
+    if not ptz_cmd:
+        return None
+    # Every message, so the radar also clears when everyone has left (unchanged frames cost nothing)
+    sense_hat.update_display(detections, ptz_cmd['target_id'])
+
+    # Frame correlation and latency tracing fields
+    ptz_cmd['seq'] = payload.get('seq')
+    ptz_cmd['capture_ts'] = payload.get('capture_ts')
+    ptz_cmd['inference_sent_ts'] = payload.get('sent_ts')
+    ptz_cmd['received_ts'] = received_ts
+    ptz_cmd['sent_ts'] = time.time()
+    if dead_band is None or dead_band.should_publish(ptz_cmd):
+        mqtt.publish_ptz(ptz_cmd)
+    return ptz_cmd
+
+def display_inference(payload, sense_hat):
+    """Local PTZ mode: the PC computes the PTZ and sends the target with the detections; only the radar runs here."""
+    sense_hat.update_display(payload.get('detections', []), payload.get('target_id'))
+
+def handle_ready(payload, camera):
+    """PC readiness (retained): start encoding once its model is warm, or send a fresh keyframe if already encoding."""
+    if payload.get('ready'):
+        print("PC is ready, starting the video stream" if not camera.encoding_started else "PC is ready, sending a keyframe")
+        camera.start_encoder()
+
+def encoding_handler(ptz, sense_hat, mqtt):
+    """Keep box mapping in step with the frame size the encoder actually produces."""
+    def on_encoding(params):
+        ptz.resolution = list(params['resolution'])
+        sense_hat.resolution = list(params['resolution'])
+        mqtt.publish_encoding(params)
+    return on_encoding
+
+def inference_handler(config, ptz, sense_hat, mqtt, dead_band=None):
+    """Handler for one inference message: PTZ and radar, or only the radar in local PTZ mode."""
+    if config.get('ptz', {}).get('local', False):
+        print("Local PTZ mode: PTZ runs on the PC, joystick input is forwarded over MQTT")
+        return lambda payload, received_ts: display_inference(payload, sense_hat)
+    return lambda payload, received_ts: process_inference(payload, ptz, sense_hat, mqtt, received_ts, dead_band)
+
+def run_asyncio(config, camera, ptz, sense_hat, mqtt):
+    """Event-driven node (rpi.runtime "asyncio", see runtime.py), until SIGINT/SIGTERM."""
+    dead_band = PTZDeadBand(config)
+    runtime = RPiRuntime(config, camera, ptz, sense_hat, mqtt, inference_handler(config, ptz, sense_hat, mqtt, dead_band),
+                         on_ready=lambda payload: handle_ready(payload, camera))
+    asyncio.run(runtime.run())
+    if dead_band.suppressed:
+        print(f"PTZ publishes suppressed: {dead_band.suppressed}")
+
+def run_threads(config, camera, ptz, sense_hat, mqtt, stop=None):
+    """
+    Thread-based node (rpi.runtime "threads"): inference worker thread and a 10 ms joystick
+    polling loop, until stop (threading.Event) is set or Ctrl+C.
+    """
+    stop = stop or threading.Event()
+    dead_band = PTZDeadBand(config)
+    local_ptz = config.get('ptz', {}).get('local', False)
+    # Inference results are handled off the MQTT network thread, newest first; the worker
+    # also shows a radar update the display rate limit held back
+    worker = InferenceWorker(inference_handler(config, ptz, sense_hat, mqtt, dead_band), on_idle=sense_hat.refresh)
+    exporter = MetricsExporter(config, mqtt.publish_stats)
+    # Hold the encoder until the PC's model is warm (or until the timeout, for other viewers)
+    startup = config.get('startup', {})
+    wait_ready = startup.get('wait_for_ready', True) and 'ready' in mqtt.topics
+    ready_deadline = time.monotonic() + startup.get('ready_timeout_s', 30.0)
 
     def on_mqtt_message(topic, payload):
-        if topic == config['mqtt']['topics']['inference']:
-            # Process inference results
-            detections = payload.get('detections', [])
-            if detections:
-                ptz_cmd = ptz.update(detections)
-                if ptz_cmd:
-                    sense_hat.update_display(detections, ptz_cmd['target_id'])
-                    mqtt.publish_ptz(ptz_cmd)
+        if topic == mqtt.topics['inference']:
+            worker.submit(payload)
+        elif topic == mqtt.topics.get('ready'):
+            handle_ready(payload, camera)
 
     mqtt.set_callback(on_mqtt_message)
 
     try:
-        camera.start()
+        camera.start(encode=not wait_ready)
+        worker.start()
         mqtt.start()
-        
-        while True:
+        mqtt.publish_encoding(camera.encoding)
+        exporter.start()
+
+        while not stop.is_set():
             # Main loop tasks (e.g., check joystick)
             event = sense_hat.get_joystick_event()
             if event:
-                ptz.handle_input(event)
+                if local_ptz:
+                    mqtt.publish_control(event)
+                else:
+                    ptz.handle_input(event)
+            if not camera.encoding_started and time.monotonic() > ready_deadline:
+                print("No ready message from the PC, starting the video stream anyway")
+                camera.start_encoder()
             time.sleep(0.01)
 
     except KeyboardInterrupt:
         print("\nStopping...")
     finally:
+        exporter.stop()
         camera.stop()
         mqtt.stop()
+        worker.stop()
+        if worker.dropped or dead_band.suppressed:
+            print(f"Inference messages handled: {worker.processed}, coalesced: {worker.dropped}, "
+                  f"PTZ publishes suppressed: {dead_band.suppressed}")
+
+def main():
+    print("Starting RPi Virtual PTZ system...")
+
+    config = load_config()
+    if not config:
+        return
+
+    # Initialize components
+    camera = CameraStream(config)
+    ptz = VirtualPTZ(config)
+    sense_hat = SenseHatInterface(config)
+    mqtt = MQTTClient(config)
+    camera.on_encoding = encoding_handler(ptz, sense_hat, mqtt)
+
+    if config.get('rpi', {}).get('runtime', "asyncio") == "asyncio":
+        run_asyncio(config, camera, ptz, sense_hat, mqtt)
+    else:
+        run_threads(config, camera, ptz, sense_hat, mqtt)
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,17 @@
 import json
 import paho.mqtt.client as mqtt
 
+import payload_codec
+from utils import camera_topics
+
 class MQTTClient:
-    def __init__(self, config):
+    def __init__(self, config, client=None):
         self.broker = "localhost"
         self.port = config['mqtt']['port']
-        self.topics = config['mqtt']['topics']
-        self.client = mqtt.Client()
+        # Topic namespace of this Pi when one PC serves several cameras
+        self.topics = camera_topics(config, config.get('rpi', {}).get('camera_id'))
+        # A paho-compatible client can be injected (e.g. a local broker stand-in)
+        self.client = client or mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.message_callback = None
@@ -15,14 +20,20 @@ class MQTTClient:
     def on_connect(self, client, userdata, flags, rc):
         print(f"Connected to MQTT Broker with result code {rc}")
         client.subscribe(self.topics['inference'])
+        if 'ready' in self.topics:
+            client.subscribe(self.topics['ready'])
 
     def on_message(self, client, userdata, msg):
         if self.message_callback:
             try:
-                payload = json.loads(msg.payload.decode())
+                if msg.topic == self.topics['inference']:
+                    # Inference results may be JSON or packed binary (see payload_codec)
+                    payload = payload_codec.decode(msg.payload)
+                else:
+                    payload = json.loads(msg.payload.decode())
                 self.message_callback(msg.topic, payload)
-            except json.JSONDecodeError:
-                print(f"Failed to decode JSON from {msg.topic}")
+            except (json.JSONDecodeError, ValueError) as e:
+                print(f"Failed to decode payload from {msg.topic}: {e}")
 
     def set_callback(self, callback):
         self.message_callback = callback
@@ -30,6 +41,22 @@ class MQTTClient:
     def publish_ptz(self, ptz_data):
         self.client.publish(self.topics['ptz'], json.dumps(ptz_data))
 
+    def publish_encoding(self, params):
+        # Retained so a PC that connects later still learns the current frame size
+        if 'encoding' in self.topics:
+            self.client.publish(self.topics['encoding'], json.dumps(params), retain=True)
+
+    def publish_control(self, event):
+        """Joystick event for the PC, which runs the PTZ in local PTZ mode."""
+        if 'control' in self.topics:
+            self.client.publish(self.topics['control'], json.dumps(
+                {"direction": event.direction, "action": event.action, "timestamp": event.timestamp}))
+
+    def publish_stats(self, stats_json):
+        """Periodic metrics snapshot (see metrics.MetricsExporter)."""
+        if self.running and 'stats' in self.topics:
+            self.client.publish(f"{self.topics['stats']}/rpi", stats_json)
+
     def start(self):
         if not self.running:
             try:
@@ -41,6 +68,7 @@ class MQTTClient:
 
     def stop(self):
         if self.running:
-            self.client.loop_stop()
+            # Disconnecting first wakes the network loop, so loop_stop() returns at once
             self.client.disconnect()
+            self.client.loop_stop()
             self.running = False
@@ -0,0 +1,163 @@
+import asyncio
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import MetricsExporter, registry
+
+# Joystick events waiting to be applied; the reader waits when it is full, so none are lost
+CONTROL_QUEUE_SIZE = 32
+# How long a blocking joystick read waits before checking for shutdown
+JOYSTICK_WAIT_S = 0.25
+
+class RPiRuntime:
+    """
+    Event-driven RPi node on one asyncio loop; nothing wakes up on a polling timer.
+    * MQTT messages arrive on paho's network thread and are handed to the loop. Inference
+      results go into a one-slot queue: a newer message replaces one not yet handled
+      (coalesced, as in InferenceWorker). Ready messages are handled as they come.
+    * Joystick events are read with a blocking wait in an executor thread and queued in
+      arrival order; a second task applies them one by one.
+    * PTZ updates and joystick input both run on the loop, so they never race on the
+      VirtualPTZ state.
+    * A radar update held back by the Sense HAT rate limit is written by a timer set for
+      when it is due, and the metrics endpoint is served on the loop as well.
+    stop() (also on SIGINT/SIGTERM) cancels the tasks and shuts the components down.
+    """
+
+    def __init__(self, config, camera, ptz, sense_hat, mqtt, handler, on_ready=None):
+        self.config = config
+        self.camera = camera
+        self.ptz = ptz
+        self.sense_hat = sense_hat
+        self.mqtt = mqtt
+        self.handler = handler
+        self.on_ready = on_ready
+        self.local_ptz = config.get('ptz', {}).get('local', False)
+        startup = config.get('startup', {})
+        self.wait_ready = startup.get('wait_for_ready', True) and 'ready' in mqtt.topics
+        self.ready_timeout = startup.get('ready_timeout_s', 30.0)
+        self.exporter = MetricsExporter(config, mqtt.publish_stats)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="joystick")
+        self.loop = None
+        self.inference = None
+        self.controls = None
+        self.stopping = None
+        self.refresh_timer = None
+        self.processed = 0
+        self.coalesced = 0
+        self.controls_applied = 0
+        self.handler_ms = registry.histogram("inference_handler_ms")
+        self.input_ms = registry.histogram("joystick_input_ms")
+        self.messages_total = registry.counter("inference_messages_total")
+        self.coalesced_total = registry.counter("inference_coalesced_total")
+
+    def on_message(self, topic, payload):
+        # paho network thread -> loop
+        received_ts = time.time()
+        if topic == self.mqtt.topics['inference']:
+            self.messages_total.inc()
+        self.loop.call_soon_threadsafe(self.dispatch, topic, payload, received_ts)
+
+    def dispatch(self, topic, payload, received_ts):
+        if topic == self.mqtt.topics['inference']:
+            if self.inference.full():
+                self.inference.get_nowait()
+                self.coalesced += 1
+                self.coalesced_total.inc()
+            self.inference.put_nowait((payload, received_ts))
+        elif topic == self.mqtt.topics.get('ready') and self.on_ready:
+            self.on_ready(payload)
+
+    def on_encoding(self, handler):
+        # Called from the stream's viewer threads; the new frame size is applied on the loop
+        return lambda params: self.loop.call_soon_threadsafe(handler, params)
+
+    async def handle_inference(self):
+        while True:
+            payload, received_ts = await self.inference.get()
+            start = time.perf_counter()
+            try:
+                self.handler(payload, received_ts)
+            except Exception as e:
+                print(f"Failed to handle inference message: {e}")
+            self.handler_ms.observe((time.perf_counter() - start) * 1000)
+            self.processed += 1
+            self.schedule_refresh()
+
+    def schedule_refresh(self):
+        due = self.sense_hat.refresh_due
+        if due is None or self.refresh_timer is not None:
+            return
+        self.refresh_timer = self.loop.call_later(max(0.0, due - time.monotonic()), self.refresh_display)
+
+    def refresh_display(self):
+        self.refresh_timer = None
+        self.sense_hat.refresh()
+        self.schedule_refresh()
+
+    async def read_joystick(self):
+        while True:
+            events = await self.loop.run_in_executor(self.executor, self.sense_hat.wait_joystick_events, JOYSTICK_WAIT_S)
+            for event in events:
+                await self.controls.put(event)
+
+    async def apply_controls(self):
+        while True:
+            event = await self.controls.get()
+            if self.local_ptz:
+                self.mqtt.publish_control(event)
+            else:
+                self.ptz.handle_input(event)
+            self.controls_applied += 1
+            if event.timestamp:
+                self.input_ms.observe((time.time() - event.timestamp) * 1000)
+
+    async def ready_timeout_task(self):
+        await asyncio.sleep(self.ready_timeout)
+        if not self.camera.encoding_started:
+            print("No ready message from the PC, starting the video stream anyway")
+            self.camera.start_encoder()
+
+    def stop(self):
+        """Stop the runtime; safe to call from any thread."""
+        if self.loop and self.stopping:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.inference = asyncio.Queue(maxsize=1)
+        self.controls = asyncio.Queue(maxsize=CONTROL_QUEUE_SIZE)
+        self.stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.stopping.set)
+            except (ValueError, RuntimeError):
+                # Not the main thread (e.g. a benchmark): stop() only
+                pass
+
+        self.mqtt.set_callback(self.on_message)
+        if self.camera.on_encoding:
+            self.camera.on_encoding = self.on_encoding(self.camera.on_encoding)
+        self.camera.start(encode=not self.wait_ready)
+        self.mqtt.start()
+        self.mqtt.publish_encoding(self.camera.encoding)
+
+        tasks = [asyncio.create_task(coro) for coro in (
+            self.handle_inference(), self.read_joystick(), self.apply_controls(), self.exporter.serve())]
+        if self.wait_ready:
+            tasks.append(asyncio.create_task(self.ready_timeout_task()))
+        try:
+            await self.stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.refresh_timer:
+                self.refresh_timer.cancel()
+            # The joystick reader returns within JOYSTICK_WAIT_S
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.mqtt.stop()
+            self.camera.stop()
+            print(f"Inference messages handled: {self.processed}, coalesced: {self.coalesced}, "
+                  f"joystick events: {self.controls_applied}")
@@ -1,9 +1,25 @@
+import time
+from collections import deque
+
+import numpy as np
 from sense_hat import SenseHat
 
+from metrics import registry, timed
+
+RED = (255, 0, 0)
+WHITE = (255, 255, 255)
+
 class SenseHatInterface:
     def __init__(self, config):
         self.config = config
         self.resolution = config['video']['resolution']
+        self.refresh_interval = 1.0 / config.get('sense_hat', {}).get('max_fps', 10)
+        self.image = np.zeros((8, 8, 3), dtype=np.uint8)
+        self.shown = None
+        self.pending = False
+        self.last_write = float("-inf")
+        self.writes_total = registry.counter("sense_hat_writes_total")
+        self.joystick_events = deque()
         if SenseHat:
             self.sense = SenseHat()
             self.sense.clear()
@@ -11,48 +27,81 @@ class SenseHatInterface:
             self.sense = None
             print("Sense HAT not detected, running in mock mode.")
 
-    def update_display(self, detections, active_target_id):
+    def render(self, detections, active_target_id):
         """
-        Map detections to 8x8 LED matrix.
+        Map detections to an 8x8 RGB image.
         Red pixel = Active Target, White pixels = Other targets, Black pixels = Background.
         """
+        image = np.zeros((8, 8, 3), dtype=np.uint8)
+        if detections is None or not len(detections):
+            return image
+        W, H = self.resolution
+        boxes = detections.boxes
+        # Box centers mapped to 0-7 and clamped to the matrix boundaries
+        ix = np.clip(((boxes[:, 0] + boxes[:, 2]) / 2 / W * 8).astype(int), 0, 7)
+        iy = np.clip(((boxes[:, 1] + boxes[:, 3]) / 2 / H * 8).astype(int), 0, 7)
+        image[iy, ix] = WHITE
+        if detections.ids is not None and active_target_id is not None:
+            target = detections.ids == active_target_id
+            # Drawn last so the target stays visible when it shares a pixel with another person
+            image[iy[target], ix[target]] = RED
+        return image
+
+    @timed("sense_hat_update_ms")
+    def update_display(self, detections, active_target_id, now=None):
+        """Compose the radar image; it is only written to the matrix if it changed (see refresh)."""
         if not self.sense:
             return
+        self.image = self.render(detections, active_target_id)
+        self.pending = self.shown is None or not np.array_equal(self.image, self.shown)
+        self.refresh(now)
 
-        self.sense.clear()
-        
-        W, H = self.resolution
+    def refresh(self, now=None):
+        """
+        Push the pending radar image with one set_pixels call, at most max_fps times per second.
+        Call periodically so an update held back by the rate limit is shown once it is due.
+        """
+        if not self.sense or not self.pending:
+            return False
+        now = now if now is not None else time.monotonic()
+        if now - self.last_write < self.refresh_interval:
+            return False
+        self.sense.set_pixels(self.image.reshape(64, 3).tolist())
+        self.writes_total.inc()
+        self.shown = self.image
+        self.pending = False
+        self.last_write = now
+        return True
 
-        for d in detections:
-            x1, y1, x2, y2 = d['box']
-            cx = (x1 + x2) / 2
-            cy = (y1 + y2) / 2
-            
-            # Map to 0-7
-            ix = int((cx / W) * 8)
-            iy = int((cy / H) * 8)
-            
-            # Clamp to matrix boundaries
-            ix = max(0, min(ix, 7))
-            iy = max(0, min(iy, 7))
-            
-            if d.get('id') == active_target_id:
-                color = (255, 0, 0) # Red
-            else:
-                color = (255, 255, 255) # White
-            
-            self.sense.set_pixel(ix, iy, color)
+    @property
+    def refresh_due(self):
+        """Monotonic time the pending image can be written, or None if nothing is pending."""
+        if not self.sense or not self.pending:
+            return None
+        return self.last_write + self.refresh_interval
 
     def get_joystick_event(self):
         """
-        Check for joystick input.
+        Next joystick event in arrival order, or None (non-blocking).
         """
         if not self.sense:
             return None
-        
-        # get_events returns a list of events since last call
-        events = self.sense.stick.get_events()
-        if events:
-            # For simplicity, just return the first one
-            return events[0]
-        return None
+        # get_events returns every event since the last call; the rest wait for the next calls
+        if not self.joystick_events:
+            self.joystick_events.extend(self.sense.stick.get_events())
+        return self.joystick_events.popleft() if self.joystick_events else None
+
+    def wait_joystick_events(self, timeout=0.25):
+        """
+        Block until joystick input arrives (at most timeout seconds) and return every pending
+        event in arrival order, [] on timeout. Meant to run in an executor thread.
+        """
+        if not self.sense:
+            time.sleep(timeout)
+            return []
+        stick = self.sense.stick
+        # select() on the joystick device; the public wait_for_event() can't time out,
+        # which would keep shutdown waiting for the next key press
+        if stick._wait(timeout):
+            return stick.get_events()
+        return []
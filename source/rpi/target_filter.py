@@ -0,0 +1,120 @@
+import numpy as np
+
+class AlphaBetaFilter:
+    """
+    Constant-velocity alpha-beta filter over a target's center and height (cx, cy, h).
+    update() corrects the state with a measured box; predict() extrapolates it to any time.
+    """
+
+    def __init__(self, box, timestamp, alpha=0.5, beta=0.1):
+        self.alpha = alpha
+        self.beta = beta
+        self.state = self.measure(box)
+        self.velocity = np.zeros(3)
+        self.timestamp = timestamp
+        self.last_seen = timestamp
+
+    @staticmethod
+    def measure(box):
+        x1, y1, x2, y2 = (float(v) for v in box)
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, y2 - y1])
+
+    def update(self, box, timestamp):
+        dt = timestamp - self.timestamp
+        measurement = self.measure(box)
+        if dt <= 0:
+            # Same frame (or clock went backwards): just blend the measurement in
+            self.state += self.alpha * (measurement - self.state)
+            self.last_seen = max(self.last_seen, timestamp)
+            return
+        predicted = self.state + self.velocity * dt
+        residual = measurement - predicted
+        self.state = predicted + self.alpha * residual
+        self.velocity = self.velocity + self.beta * residual / dt
+        self.timestamp = timestamp
+        self.last_seen = timestamp
+
+    def predict(self, timestamp, horizon=None):
+        """Extrapolate to timestamp, at most horizon seconds past the last measurement (then hold)."""
+        dt = max(0.0, timestamp - self.timestamp)
+        if horizon is not None:
+            dt = min(dt, horizon)
+        cx, cy, h = self.state + self.velocity * dt
+        return cx, cy, max(h, 1.0)
+
+class TrackBank:
+    """
+    The AlphaBetaFilter of every track held as rows of contiguous arrays, sorted by track ID,
+    so all tracks are updated and predicted in one NumPy pass. Rows also carry a smoothed
+    zoom per track for the multi-target viewports.
+    """
+
+    def __init__(self, alpha=0.5, beta=0.1):
+        self.alpha = alpha
+        self.beta = beta
+        self.ids = np.zeros(0, np.int64)
+        self.state = np.zeros((0, 3))
+        self.velocity = np.zeros((0, 3))
+        self.timestamp = np.zeros(0)
+        self.last_seen = np.zeros(0)
+        self.zoom = np.zeros(0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def update(self, ids, boxes, timestamp, coast_time):
+        """
+        Correct the tracks measured in this frame, add new ones and release those unseen
+        for longer than coast_time. Returns a mask of the rows measured in this frame.
+        """
+        ids, first = np.unique(np.asarray(ids, np.int64), return_index=True)
+        boxes = np.asarray(boxes, np.float64)[first]
+        measurement = np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                                       boxes[:, 3] - boxes[:, 1]))
+        rows = np.searchsorted(self.ids, ids)
+        known = rows < len(self.ids)
+        known[known] = self.ids[rows[known]] == ids[known]
+
+        rows = rows[known]
+        dt = timestamp - self.timestamp[rows]
+        # dt <= 0 (same frame, or clock went backwards): just blend the measurement in
+        predicted = self.state[rows] + self.velocity[rows] * np.maximum(dt, 0.0)[:, None]
+        residual = measurement[known] - predicted
+        self.state[rows] = predicted + self.alpha * residual
+        moving = dt > 0
+        self.velocity[rows[moving]] += self.beta * residual[moving] / dt[moving, None]
+        self.timestamp[rows[moving]] = timestamp
+        self.last_seen[rows] = np.maximum(self.last_seen[rows], timestamp)
+        seen = np.zeros(len(self.ids), bool)
+        seen[rows] = True
+
+        new = ~known
+        if new.any():
+            n = int(new.sum())
+            self.ids = np.concatenate((self.ids, ids[new]))
+            self.state = np.concatenate((self.state, measurement[new]))
+            self.velocity = np.concatenate((self.velocity, np.zeros((n, 3))))
+            self.timestamp = np.concatenate((self.timestamp, np.full(n, timestamp)))
+            self.last_seen = np.concatenate((self.last_seen, np.full(n, timestamp)))
+            self.zoom = np.concatenate((self.zoom, np.ones(n)))
+            order = np.argsort(self.ids, kind="stable")
+            self._keep(order)
+            seen = np.concatenate((seen, np.ones(n, bool)))[order]
+
+        keep = timestamp - self.last_seen <= coast_time
+        if not keep.all():
+            self._keep(keep)
+        return seen[keep]
+
+    def _keep(self, index):
+        for name in ("ids", "state", "velocity", "timestamp", "last_seen", "zoom"):
+            setattr(self, name, getattr(self, name)[index])
+
+    def predict(self, timestamp, horizon=None):
+        """(cx, cy, h) of every row extrapolated to timestamp, as in AlphaBetaFilter.predict."""
+        dt = np.maximum(timestamp - self.timestamp, 0.0)
+        if horizon is not None:
+            dt = np.minimum(dt, horizon)
+        predicted = self.state + self.velocity * dt[:, None]
+        predicted[:, 2] = np.maximum(predicted[:, 2], 1.0)
+        return predicted
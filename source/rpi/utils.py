@@ -8,3 +8,17 @@ def load_config(config_path="config/settings.json"):
     except FileNotFoundError:
         print(f"Config file not found at {config_path}")
         return {}
+
+def camera_topics(config, camera_id=None):
+    """
+    MQTT topics for one camera. Without an ID the configured (global) topics are used;
+    with one, the ID is inserted before the last topic level, e.g. rpi-ptz/cam1/inference.
+    """
+    topics = config['mqtt']['topics']
+    if camera_id is None:
+        return dict(topics)
+    namespaced = {}
+    for key, topic in topics.items():
+        prefix, _, leaf = topic.rpartition('/')
+        namespaced[key] = f"{prefix}/{camera_id}/{leaf}" if prefix else f"{camera_id}/{leaf}"
+    return namespaced